@@ -0,0 +1,389 @@
+import time
+import asyncio
+import threading
+import functools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from backend.ai.orchestrator import Orchestrator
+from backend.ai.load_router import LoadRouter
+from backend.services.response_cache import ResponseCache
+
+
+class OrchestratorBusy(Exception):
+    pass
+
+
+class AsyncRuntime:
+    """Event loop on a daemon thread, so Qt workers can submit coroutines to it."""
+
+    def __init__(self, name="omni-async"):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self):
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+
+
+class AsyncOrchestrator:
+    """
+    Coroutine version of the Orchestrator flows.
+
+    Each turn is a single coroutine (`await retrieve`, `await generate`,
+    `await tool`) instead of a chain of generationFinished/toolSignal hops.
+    Blocking work runs in a thread pool; LLMEngine serializes calls per
+    model, so one chat's thinking pass can overlap another chat's answer.
+
+    Backpressure: at most `max_concurrent` turns run at once (ai_tasks),
+    and at most `max_pending` more may wait for a slot (ai_queue) before
+    run_turn raises OrchestratorBusy.
+    """
+
+    def __init__(self, orchestrator: Orchestrator, chat_service, executor=None, max_concurrent=None, max_pending=None):
+        self.orchestrator = orchestrator
+        self.chat_service = chat_service
+        self.llm = orchestrator.llm
+        self.settings = orchestrator.settings
+
+        max_tasks = self.settings.get_settings()["max_tasks"]
+        self.max_concurrent = max_concurrent or max_tasks.get("ai_tasks", 3)
+        self.max_pending = max_pending or max_tasks.get("ai_queue", 16)
+
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=self.max_concurrent + 2,
+            thread_name_prefix="omni-flow"
+        )
+        self._slots = asyncio.Semaphore(self.max_concurrent)
+        self.pending = 0
+        self.active = 0
+        self.last_activity = time.monotonic()
+        # FollowUpQueue shared with the chat service; turns preempt it
+        self.follow_ups = None
+
+        self.load_router = LoadRouter(self.llm, self.settings)
+        self.response_cache = None
+        if orchestrator.user_db is not None:
+            self.response_cache = ResponseCache(
+                orchestrator.user_db,
+                lambda text: orchestrator.rag.embedding_engine.embed(text)[0],
+                self.settings
+            )
+        # Callable: turns queued in front of this core (BackendBridge.ai_queue)
+        self.queue_depth = None
+        self.thinking = 0
+        self.turns = deque(maxlen=200)
+
+        # Embed the router's exemplars now instead of inside the first turn
+        if self.settings.get_settings()["generate_settings"].get("router", "embedding") == "embedding":
+            self.executor.submit(self._warm_router)
+
+    def _warm_router(self):
+        try:
+            self.orchestrator.intent_router.centroids()
+        except Exception as e:
+            print(f"⚠️  Intent router warm-up failed: {e}")
+
+    def idle_seconds(self):
+        """0 while a turn runs or waits, else seconds since the last one ended."""
+        if self.active or self.pending:
+            return 0.0
+        return time.monotonic() - self.last_activity
+
+    async def _call(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
+    # ============================================================
+    #                    AWAITABLE STEPS
+    # ============================================================
+    async def retrieve(self, query: str):
+        if not self.settings.get_settings()["rag_settings"].get("enabled", True):
+            return []
+        return await self._call(self.orchestrator.retrieve_context, query)
+
+    async def search_memories(self, query: str):
+        return await self._call(self.orchestrator.search_memories, query)
+
+    async def prefill(self, model_name, messages, system_prompt=""):
+        return await self._call(self.llm.prefill, model_name, messages, system_prompt)
+
+    async def generate(self, model_name, messages, system_prompt, chat_id, phase="instruct", tool_choice="auto", on_token=None, reuse_prefix=False):
+        use_stream = self.settings.get_settings()["generate_settings"].get("streamer", True)
+        return await self._call(
+            self.llm.complete,
+            model_name=model_name,
+            messages=messages,
+            system_prompt=system_prompt,
+            chat_id=chat_id,
+            phase=phase,
+            tool_choice=tool_choice,
+            stream=bool(on_token) and use_stream and phase != "thinking",
+            on_token=on_token,
+            reuse_prefix=reuse_prefix
+        )
+
+    async def cached(self, flow, prompt, context, chat_id, generate):
+        """
+        `await generate()` unless the response cache has an answer for
+        `prompt` in `context`; a hit comes back as a finished, unstreamed
+        generation.
+        """
+        if not self._caching(prompt):
+            return await generate()
+        cache = self.response_cache
+
+        context_key = cache.context_key({"flow": flow, **context})
+        try:
+            hit, probe = await self._call(cache.lookup, prompt, context_key, flow)
+        except Exception as e:
+            print(f"⚠️  Response cache lookup failed: {e}")
+            return await generate()
+
+        if hit is not None:
+            print(f"♻️  Chat {chat_id}: cached answer (similarity {hit['similarity']:.3f})")
+            completion_tokens = self.llm.estimate_tokens(hit["text"])
+            return {
+                "success": True,
+                "text": hit["text"],
+                "prompt_tokens": 0,
+                "completion_tokens": completion_tokens,
+                "total_tokens": completion_tokens,
+                "use_stream": False,
+                "cached": True
+            }
+
+        results = await generate()
+        if results.get("success") and results.get("text") and not results.get("tool_calls"):
+            try:
+                await self._call(cache.store, probe, context_key, results["text"], flow)
+            except Exception as e:
+                print(f"⚠️  Response not cached: {e}")
+        return results
+
+    def _caching(self, prompt):
+        cache = self.response_cache
+        return cache is not None and cache.enabled() and cache.cacheable(prompt)
+
+    @staticmethod
+    def _history_key(messages):
+        return [(m["role"], m["content"]) for m in messages]
+
+    async def tools(self, tool_calls):
+        """Every call of one response at once, each under its own timeout."""
+        return await self._call(self.orchestrator.run_tools, tool_calls)
+
+    # ============================================================
+    #                    TURNS
+    # ============================================================
+    async def run_turn(self, chat_id, prompt, on_token=None, on_chat=None):
+        """
+        Store the prompt, run the selected flow and cache the reply.
+
+        Returns the same dict AIWorker.finished has always emitted.
+        `on_token(phase, token, chat_id)` is called from a worker thread;
+        `on_chat(chat_id, title)` fires on the loop when a chat is created.
+        """
+        if self.pending >= self.max_pending:
+            raise OrchestratorBusy(f"{self.pending} turns already waiting")
+
+        self.pending += 1
+        self.last_activity = time.monotonic()
+        if self.follow_ups is not None:
+            self.follow_ups.preempt()
+        waiting = True
+        try:
+            async with self._slots:
+                self.pending -= 1
+                waiting = False
+                self.active += 1
+                try:
+                    return await self._run_turn(chat_id, prompt, on_token, on_chat)
+                finally:
+                    self.active -= 1
+                    self.last_activity = time.monotonic()
+        finally:
+            if waiting:
+                self.pending -= 1
+
+    def turns_ahead(self):
+        """Turns running or waiting besides the caller's, including any queued outside the core."""
+        outside = self.queue_depth() if self.queue_depth is not None else 0
+        return max(self.active - 1, 0) + self.pending + outside
+
+    async def _run_turn(self, chat_id, prompt, on_token, on_chat):
+        started = time.perf_counter()
+        new_chat = not chat_id or chat_id <= 0
+        chat_id, history = await self._call(self.chat_service.prepare_turn, chat_id, prompt)
+        if new_chat and on_chat:
+            on_chat(chat_id, prompt[:25])
+
+        results = await self.run(prompt, history, chat_id, on_token)
+        self._record_turn(chat_id, results, started)
+        if not results["success"]:
+            return {**results, "chat_id": chat_id}
+
+        await self._call(self.chat_service.cache_response, results["text"], {"chat_id": chat_id}, False)
+        # Background queue when there is one; otherwise the caller waits for these
+        if not await self._call(self.chat_service.queue_follow_ups, chat_id):
+            await self.summarize(chat_id)
+            await self.title(chat_id)
+
+        return {
+            "success": True,
+            "chat_id": chat_id,
+            "text": results["text"],
+            "prompt_tokens": results["prompt_tokens"],
+            "completion_tokens": results["completion_tokens"],
+            "total_tokens": results["total_tokens"],
+            "use_stream": results["use_stream"],
+            "route": results["route"]
+        }
+
+    async def run(self, prompt: str, cached_history: list, chat_id: int, on_token=None):
+        messages = self.orchestrator.to_messages(cached_history)
+        # Routing embeds the prompt; keep the forward pass off the loop
+        flow, system_prompt = await self._call(self.orchestrator.select_flow, prompt)
+
+        route = self.load_router.decide(flow, self.turns_ahead(), self.thinking)
+        if route["flow"] != flow:
+            print(f"⚖️  Chat {chat_id}: {flow} -> {route['flow']} ({route['reason']})")
+            flow = route["flow"]
+            system_prompt = self.orchestrator.flow_prompt(flow)
+
+        if flow == "tool":
+            results = await self._tool_flow(messages, chat_id, on_token)
+        elif flow == "thinking":
+            results = await self._thinking_flow(messages, chat_id, system_prompt, on_token)
+        else:
+            results = await self._fast_flow(messages, chat_id, system_prompt, on_token)
+        return {**results, "route": route}
+
+    # ============================================================
+    #                    FLOWS
+    # ============================================================
+    async def _fast_flow(self, messages, chat_id, system_prompt, on_token):
+        identity_text = self.orchestrator.identity.get_identity()
+        recent = self.orchestrator.recent_messages(messages)
+        context = {
+            "system": identity_text + "\n" + system_prompt,
+            "history": self._history_key(recent[:-1])
+        }
+        return await self.cached("fast", recent[-1]["content"], context, chat_id, lambda: self.generate(
+            "instruct", recent, identity_text + "\n" + system_prompt, chat_id, on_token=on_token
+        ))
+
+    async def _thinking_flow(self, messages, chat_id, system_prompt, on_token):
+        self.thinking += 1
+        try:
+            return await self._think_and_answer(messages, chat_id, system_prompt, on_token)
+        finally:
+            self.thinking -= 1
+
+    async def _think_and_answer(self, messages, chat_id, system_prompt, on_token):
+        query = messages[-1]["content"]
+        pipelined = self.orchestrator.pipeline_prefill()
+
+        # Keyed on the document and memory sets rather than what was
+        # retrieved, so a hit skips retrieval and prefill
+        context = None
+        if self._caching(query):
+            user_db = self.orchestrator.user_db
+            documents, memories = await self._call(lambda: (user_db.documents_version(), user_db.memories_version()))
+            context = {
+                "identity": self.orchestrator.identity.get_identity(),
+                "system": system_prompt,
+                "history": self._history_key(messages[:-1]),
+                "documents": documents,
+                "memories": memories
+            }
+
+        async def reason_and_answer():
+            steps = [self.retrieve(query), self.search_memories(query)]
+            if pipelined:
+                prefix = self.orchestrator.build_thinking_prefix(messages)
+                steps.append(self.prefill("thinking", prefix, system_prompt))
+            retrieved, memories, *_ = await asyncio.gather(*steps)
+
+            final_messages = self.orchestrator.build_thinking_messages(
+                messages, retrieved, memories, context_last=pipelined
+            )
+
+            reasoning = await self.generate(
+                "thinking", final_messages, system_prompt, chat_id, phase="thinking", reuse_prefix=pipelined
+            )
+            if not reasoning["success"]:
+                return reasoning
+
+            answer_messages = self.orchestrator.build_answer_messages(messages, reasoning["text"])
+            return await self.generate("instruct", answer_messages, "", chat_id, on_token=on_token)
+
+        return await self.cached("thinking", query, context, chat_id, reason_and_answer)
+
+    async def _tool_flow(self, messages, chat_id, on_token):
+        identity_text = self.orchestrator.identity.get_identity()
+        recent = self.orchestrator.recent_messages(messages)
+        results = await self.generate(
+            "instruct", recent, identity_text, chat_id, tool_choice="required", on_token=on_token
+        )
+        if not results.get("tool_calls"):
+            return results
+
+        tool_calls = results["tool_calls"]
+        tool_results = await self.tools(tool_calls)
+        if not any(result["success"] for result in tool_results):
+            return {"success": False, "error": "; ".join(result["error"] for result in tool_results)}
+        # Failed calls are recorded as errors; the model answers from the rest
+        recorded = await self._call(self.orchestrator.record_tool_results, chat_id, tool_calls, tool_results)
+
+        # Same window as the call itself; the calls and results follow it whole
+        return await self.generate("instruct", recent + recorded, identity_text, chat_id, on_token=on_token)
+
+    # ============================================================
+    #                    METRICS
+    # ============================================================
+    def _record_turn(self, chat_id, results, started):
+        route = results.get("route") or {}
+        self.turns.append({
+            "chat_id": chat_id,
+            "flow": route.get("flow"),
+            "requested": route.get("requested"),
+            "reason": route.get("reason"),
+            "estimated_ms": route.get("estimated_ms"),
+            "ms": round((time.perf_counter() - started) * 1000, 1),
+            "success": results["success"],
+            "cached": results.get("cached", False)
+        })
+
+    def turn_stats(self):
+        turns = list(self.turns)
+        by_flow = {}
+        for turn in turns:
+            by_flow.setdefault(turn["flow"], []).append(turn["ms"])
+        return {
+            "recent": len(turns),
+            "degraded": sum(1 for t in turns if t["flow"] != t["requested"]),
+            "degraded_total": self.load_router.degraded,
+            "cached": sum(1 for t in turns if t["cached"]),
+            "avg_ms": {flow: round(sum(ms) / len(ms), 1) for flow, ms in by_flow.items()},
+            "last": turns[-1] if turns else None,
+            "models": self.llm.throughput_stats()
+        }
+
+    # ============================================================
+    #                    FOLLOW-UPS
+    # ============================================================
+    async def summarize(self, chat_id):
+        await self._call(self.chat_service.summarize, chat_id)
+
+    async def title(self, chat_id):
+        if await self._call(self.chat_service.needs_title, chat_id):
+            await self._call(self.chat_service.title, chat_id)
@@ -1,5 +1,7 @@
 from PySide6.QtCore import QObject, Slot
 from sentence_transformers import SentenceTransformer
+from collections import OrderedDict
+import threading
 import numpy as np
 
 class EmbeddingEngine(QObject):
@@ -7,14 +9,30 @@ class EmbeddingEngine(QObject):
         model_path = config.get("model")
 
         if isinstance(model_path, str):
+            self.model_name = model_path
             self.model = SentenceTransformer(model_path)
         else:
             raise ValueError(f"Expected a string path, go {type(model_path)}")
 
+        # A turn embeds its prompt for routing, RAG and memory search; encode it once
+        self._recent = OrderedDict()
+        self._recent_lock = threading.Lock()
+        self.recent_size = 8
+
     @Slot(str)
     def embed(self, texts):
         if isinstance(texts, str):
-            texts = [texts]
-            
+            with self._recent_lock:
+                if texts in self._recent:
+                    self._recent.move_to_end(texts)
+                    return self._recent[texts].copy()
+
+            vectors = np.array(self.model.encode([texts], normalize_embeddings=True))
+            with self._recent_lock:
+                self._recent[texts] = vectors
+                while len(self._recent) > self.recent_size:
+                    self._recent.popitem(last=False)
+            return vectors.copy()
+
         vectors = self.model.encode(texts, normalize_embeddings=True)
-        return np.array(vectors)
\ No newline at end of file
+        return np.array(vectors)
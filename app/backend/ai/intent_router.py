@@ -0,0 +1,162 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import numpy as np
+
+# Labeled examples per flow; each flow is routed by the mean of its embeddings
+EXEMPLARS = {
+    "fast": [
+        "hi", "hello there", "thanks!", "thank you, that helped", "good morning",
+        "what's your name?", "what time is it?", "who are you?",
+        "what is the capital of France?", "what does HTTP stand for?",
+        "translate 'good night' to Spanish", "give me a synonym for happy",
+        "can you tell me a joke?", "how do you spell necessary?",
+        "what's 15% of 80?", "define photosynthesis in one sentence",
+        "remind me what we talked about", "ok sounds good", "can you say that shorter?",
+        "what day of the week was yesterday?", "recommend a movie for tonight",
+        "write a haiku about rain", "convert 5 miles to kilometers",
+        "what is a noun?", "how are you doing today?",
+    ],
+    "thinking": [
+        "compare PostgreSQL and MongoDB for an analytics workload and recommend one",
+        "design a caching strategy for a read-heavy API with frequent invalidations",
+        "debug this: my Python script deadlocks when two threads share a queue",
+        "why does my React component re-render on every keystroke and how do I fix it?",
+        "analyze the trade-offs between microservices and a monolith for a small team",
+        "walk me through proving that the square root of 2 is irrational",
+        "plan a 12-week training schedule to run a half marathon",
+        "explain step by step how TLS establishes a secure connection",
+        "what are the pros and cons of renting versus buying a house right now?",
+        "optimize this SQL query that joins three large tables and runs slowly",
+        "help me structure a business plan for a small coffee roastery",
+        "predict how raising interest rates affects housing prices and why",
+        "write a detailed essay outline on the causes of World War I",
+        "figure out why my model's validation loss increases while training loss drops",
+        "solve: a train leaves at 3pm going 60 mph, another at 4pm going 80 mph; when do they meet?",
+        "refactor this class so it is easier to test and explain each change",
+        "how should I architect an offline-first mobile app with sync conflicts?",
+        "evaluate these three job offers given my priorities and tell me which to take",
+        "derive the time complexity of this recursive algorithm",
+        "what would happen to the ecosystem if bees went extinct? reason it out",
+    ],
+    "tool": [
+        "search my files for the tax return from 2023",
+        "find the PDF called invoice_march",
+        "look for any document mentioning the project budget",
+        "open my notes file about the meeting",
+        "where is the file I saved with the wifi password?",
+        "search the web for today's weather in Berlin",
+        "look up the latest news about the Mars mission",
+        "find all spreadsheets in my documents folder",
+        "search for photos from last summer",
+        "locate the config file for my server",
+        "find the resume I edited last week",
+        "search online for the best price on a standing desk",
+        "which of my files mention kubernetes?",
+        "look through my downloads for the installer",
+        "search my computer for README files",
+        "find the email attachment I saved about the lease",
+        "browse the web for reviews of the Framework laptop",
+        "search files named report",
+    ],
+}
+
+
+class IntentRouter:
+    """
+    Picks a flow (fast / thinking / tool) for a prompt by nearest centroid.
+
+    Each flow's exemplars are embedded once with the already-loaded
+    EmbeddingEngine and averaged into a unit centroid; routing is then
+    one embedding plus a (flows x dim) dot product. Centroids are cached
+    in memory and, with `cache_path`, on disk keyed by the exemplars and
+    the embedding model, so a restart doesn't re-embed them.
+
+    `margins` is added to a flow's similarity before the argmax; a
+    negative margin on "thinking" keeps borderline prompts on the cheap
+    fast flow.
+    """
+
+    def __init__(self, embedding_engine, exemplars=None, cache_path=None, margins=None):
+        self.embedding_engine = embedding_engine
+        self.exemplars = exemplars or EXEMPLARS
+        self.cache_path = cache_path
+        self.margins = margins or {}
+
+        self.labels = sorted(self.exemplars)
+        self._centroids = None
+        self._lock = threading.Lock()
+
+        self.routed = {label: 0 for label in self.labels}
+        self.route_ms = 0.0
+
+    def _fingerprint(self):
+        model = getattr(self.embedding_engine, "model_name", None) or type(self.embedding_engine).__name__
+        payload = json.dumps({"model": str(model), "exemplars": self.exemplars}, sort_keys=True)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def centroids(self):
+        """(labels x dim) unit centroids, embedded on first use."""
+        if self._centroids is not None:
+            return self._centroids
+
+        with self._lock:
+            if self._centroids is not None:
+                return self._centroids
+
+            fingerprint = self._fingerprint()
+            if self.cache_path and os.path.exists(self.cache_path):
+                try:
+                    cached = np.load(self.cache_path)
+                    if str(cached["fingerprint"]) == fingerprint and list(cached["labels"]) == self.labels:
+                        self._centroids = cached["centroids"]
+                        return self._centroids
+                except (OSError, KeyError, ValueError):
+                    pass
+
+            rows = []
+            for label in self.labels:
+                vectors = np.asarray(self.embedding_engine.embed(self.exemplars[label]), dtype=np.float32)
+                vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+                centroid = vectors.mean(axis=0)
+                rows.append(centroid / max(np.linalg.norm(centroid), 1e-12))
+            self._centroids = np.vstack(rows).astype(np.float32)
+
+            if self.cache_path:
+                try:
+                    os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+                    with open(self.cache_path, "wb") as f:
+                        np.savez(f, fingerprint=fingerprint, labels=np.array(self.labels), centroids=self._centroids)
+                except OSError as e:
+                    print(f"⚠️  Intent centroids not cached: {e}")
+            return self._centroids
+
+    def scores(self, embedding, margins=None):
+        """{flow: margin-adjusted cosine} for a prompt embedding."""
+        margins = self.margins if margins is None else margins
+        embedding = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        embedding = embedding / max(float(np.linalg.norm(embedding)), 1e-12)
+        similarities = self.centroids() @ embedding
+        return {
+            label: float(similarities[i]) + margins.get(label, 0.0)
+            for i, label in enumerate(self.labels)
+        }
+
+    def route(self, prompt: str, embedding=None, margins=None):
+        if embedding is None:
+            embedding = self.embedding_engine.embed(prompt)[0]
+        started = time.perf_counter()
+        scores = self.scores(embedding, margins)
+        label = max(scores, key=scores.get)
+        self.route_ms += (time.perf_counter() - started) * 1000
+        self.routed[label] += 1
+        return label
+
+    def stats(self):
+        total = sum(self.routed.values())
+        return {
+            "routed": dict(self.routed),
+            "avg_route_ms": round(self.route_ms / total, 4) if total else None
+        }
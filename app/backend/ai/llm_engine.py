@@ -1,3 +1,5 @@
+import time
+import threading
 from PySide6.QtCore import QObject, Signal
 from backend.ai.model_manager import ModelManager
 from backend.settings import Settings
@@ -19,22 +21,21 @@ class LLMEngine(QObject):
         self.model_manager = model_manager
         self.settings = settings
 
-    def generate(self, model_name: str, messages: list, system_prompt: str, chat_id: int,  source: str, phase="instruct", past_transfer = None, tool_choice="auto"):
+        self._model_locks = {}
+        self._locks_guard = threading.Lock()
+        # Recent generation speed per model (EMAs), for load-aware routing
+        self.throughput = {}
+
+    def generate(self, model_name: str, messages: list, system_prompt: str, chat_id: int,  source: str, phase="instruct", past_transfer = None, tool_choice="auto", reuse_prefix=False):
         # Label Signals
         if source == "tool": self.modelTooling.emit(chat_id)
         elif phase == "thinking": self.modelThinking.emit(chat_id)
 
-        # Model Configurations
-        model = self.model_manager.get_model(model_name)
-        model_settings = self.settings.get_settings()["model_settings"][model_name]
         generate_settings = self.settings.get_settings()["generate_settings"]
         use_stream = generate_settings.get("streamer", True)
 
         # Prompt Trimming
-        if system_prompt:
-            messages = [{"role": "system", "content": system_prompt}] + messages
-
-        messages = self.trim_messages_to_budget(messages, model_name)
+        messages = self.prepare_messages(messages, system_prompt, model_name)
 
         transfer = {
             "chat_id": chat_id,
@@ -45,87 +46,164 @@ class LLMEngine(QObject):
         if past_transfer:
             transfer = past_transfer
 
-        # No Model Error Handling
-        if not model:
-            if source == "chat":
-                self.generationFinished.emit(phase, {
-                    "success": False, 
-                    "error": "Model not loaded"
-                }, transfer)
-            elif source == "title":
-                self.titleSignal.emit({
-                    "success": False, 
-                    "error": "Model not loaded"
-                }, chat_id)
-            elif source == "summary":
-                self.generationFinished.emit({
-                    "success": False, 
-                    "error": "Model not loaded"
-                }, transfer)
-            else:
-                print("Model not loaded from unknown source: ", source)
+        # Streaming Prompt. Exclused Non-Chat Prompts
+        results = self.complete(
+            model_name=model_name,
+            messages=messages,
+            system_prompt="",
+            chat_id=chat_id,
+            phase=phase,
+            tool_choice=tool_choice,
+            stream=use_stream and source in ("chat", "tool") and phase != "thinking",
+            on_token=self.tokenGenerated.emit,
+            reuse_prefix=reuse_prefix
+        )
+
+        if results.get("tool_calls"):
+            self.toolSignal.emit(chat_id, results["tool_calls"])
             return
-        
+
+        # Result Designations
+        if source == "chat":
+            self.generationFinished.emit(phase, results, transfer)
+        elif source == "title":
+            self.titleSignal.emit(results, chat_id)
+        elif source == "summary":
+            self.generationFinished.emit(source, results, transfer)
+        elif source == "tool":
+            self.generationFinished.emit(source, results, transfer)
+        else:
+            print("UNKNOWN SOURCE: ", source)
+
+    def complete(self, model_name: str, messages: list, system_prompt: str, chat_id: int, phase="instruct", tool_choice="auto", stream=False, on_token=None, reuse_prefix=False):
+        """
+        Run one generation and return its results instead of emitting them.
+
+        Safe to call from any thread: each model is guarded by its own lock,
+        so different models can generate at the same time. When the model
+        answers with tool calls, results["tool_calls"] holds them and no
+        text is returned. `on_token(phase, token, chat_id)` is called from
+        the generating thread for every streamed token. With reuse_prefix
+        the model keeps its KV cache, so a prompt that starts with what
+        prefill() evaluated only pays for the new tail.
+        """
+        model = self.model_manager.get_model(model_name)
+        if not model:
+            return {
+                "success": False,
+                "error": "Model not loaded"
+            }
+
+        model_settings = self.settings.get_settings()["model_settings"][model_name]
+        messages = self.prepare_messages(messages, system_prompt, model_name)
+
         try:
-            model.reset() # Model Reset For Multiple Prompts
-            
-            # Streaming Prompt. Exclused Non-Chat Prompts
-            if use_stream and source in ("chat", "tool") and phase != "thinking":
-                full_response = self._streaming_generation(
-                    model=model, 
-                    model_settings=model_settings, 
-                    messages=messages, 
-                    phase=phase, 
-                    chat_id=chat_id, 
-                    tool_choice=tool_choice
-                )
-            else:
-                full_response = self._default_generation(
-                    model=model, 
-                    model_settings=model_settings, 
-                    messages=messages,  
-                    chat_id=chat_id, 
-                    tool_choice=tool_choice
-                )
-
-            if full_response is None:
-                return
+            with self.model_lock(model_name):
+                started = time.perf_counter()
+                if not reuse_prefix:
+                    model.reset() # Model Reset For Multiple Prompts
+
+                if stream:
+                    full_response, tool_calls = self._streaming_generation(
+                        model=model,
+                        model_settings=model_settings,
+                        messages=messages,
+                        phase=phase,
+                        chat_id=chat_id,
+                        tool_choice=tool_choice,
+                        on_token=on_token
+                    )
+                else:
+                    full_response, tool_calls = self._default_generation(
+                        model=model,
+                        model_settings=model_settings,
+                        messages=messages,
+                        chat_id=chat_id,
+                        tool_choice=tool_choice
+                    )
+                elapsed = time.perf_counter() - started
+
+            if tool_calls:
+                return {
+                    "success": True,
+                    "tool_calls": tool_calls
+                }
 
             prompt_text = "".join(m["content"] for m in messages)
             prompt_tokens = self.estimate_tokens(prompt_text)
             completion_tokens = self.estimate_tokens(full_response)
+            self._record_throughput(model_name, elapsed, completion_tokens)
 
-            results = {
+            return {
                 "success": True,
                 "text": full_response.strip() if phase != "tool" else "Results: " + full_response.strip(),
                 "prompt_tokens": prompt_tokens,
                 "completion_tokens": completion_tokens,
                 "total_tokens": prompt_tokens + completion_tokens,
-                "use_stream": use_stream
+                "use_stream": stream
             }
 
         except Exception as e:
-            results = {
+            return {
                 "success": False,
                 "error": str(e)
             }
 
-        # Result Designations
-        if source == "chat":
-            self.generationFinished.emit(phase, results, transfer)
-        elif source == "title":
-            self.titleSignal.emit(results, chat_id)
-        elif source == "summary":
-            self.generationFinished.emit(source, results, transfer)
-        elif source == "tool":
-            self.generationFinished.emit(source, results, transfer)
-        else:
-            print("UNKNOWN SOURCE: ", source)
+    def prefill(self, model_name: str, messages: list, system_prompt: str = ""):
+        """Evaluate a prompt prefix into the model's KV cache ahead of the real call."""
+        model = self.model_manager.get_model(model_name)
+        if not model:
+            return False
+
+        messages = self.prepare_messages(messages, system_prompt, model_name)
+        try:
+            with self.model_lock(model_name):
+                model.reset()
+                model.create_chat_completion(messages=messages, max_tokens=1, stream=False)
+            return True
+        except Exception as e:
+            print(f"Prefill skipped for {model_name}: {e}")
+            return False
+
+    def model_available(self, model_name: str) -> bool:
+        return self.model_manager.get_model(model_name) is not None
+
+    def _record_throughput(self, model_name, seconds, tokens, alpha=0.3):
+        with self._locks_guard:
+            stats = self.throughput.get(model_name)
+            tokens_per_s = tokens / seconds if seconds > 0 else 0.0
+            if stats is None:
+                self.throughput[model_name] = {"calls": 1, "ms": seconds * 1000, "tokens_per_s": tokens_per_s}
+                return
+            stats["calls"] += 1
+            stats["ms"] += alpha * (seconds * 1000 - stats["ms"])
+            stats["tokens_per_s"] += alpha * (tokens_per_s - stats["tokens_per_s"])
+
+    def expected_ms(self, model_name: str):
+        """Recent time one generation holds the model, or None before the first."""
+        stats = self.throughput.get(model_name)
+        return stats["ms"] if stats else None
+
+    def throughput_stats(self):
+        with self._locks_guard:
+            return {
+                name: {"calls": s["calls"], "ms": round(s["ms"], 1), "tokens_per_s": round(s["tokens_per_s"], 2)}
+                for name, s in self.throughput.items()
+            }
+
+    def model_lock(self, model_name: str):
+        with self._locks_guard:
+            return self._model_locks.setdefault(model_name, threading.Lock())
+
+    def prepare_messages(self, messages: list, system_prompt: str, model_name: str):
+        if system_prompt:
+            messages = [{"role": "system", "content": system_prompt}] + messages
+        return self.trim_messages_to_budget(messages, model_name)
 
     # ============================================================
     #                    LLM GENERATION FUNCTIONS
     # ============================================================
-    def _streaming_generation(self, model, model_settings, messages, phase, chat_id, tool_choice):
+    def _streaming_generation(self, model, model_settings, messages, phase, chat_id, tool_choice, on_token=None):
         full_response = ""
         tool_calls_buffer = {}
 
@@ -149,7 +227,8 @@ class LLMEngine(QObject):
                 token = delta["content"]
                 full_response += token
                 print(f"\nSTREAMING, PHASE:{phase}, TOKEN:{token}, CHAT ID:{chat_id}")
-                self.tokenGenerated.emit(phase, token, chat_id)
+                if on_token:
+                    on_token(phase, token, chat_id)
 
             if "tool_calls" in delta:
                 for tool_delta in delta["tool_calls"]:
@@ -174,9 +253,8 @@ class LLMEngine(QObject):
         if tool_calls_buffer:
             tool_calls = list(tool_calls_buffer.values())
             print("\n\n\n\n\nTOOL CALLED: ", tool_calls, "\n\n\n\n\n")
-            self.toolSignal.emit(chat_id, tool_calls)
-            return None
-        return full_response
+            return None, tool_calls
+        return full_response, None
     
     def _default_generation(self, model, model_settings, messages, chat_id, tool_choice):
         output = model.create_chat_completion(
@@ -195,14 +273,13 @@ class LLMEngine(QObject):
         
         message = output["choices"][0]["message"]
         # If Tool Call
-        if "tool_calls" in message:
+        if message.get("tool_calls"):
             tool_calls = message["tool_calls"]
             print("\n\n\n\n\nTOOL CALLED: ", tool_calls, "\n\n\n\n\n")
-            self.toolSignal.emit(chat_id, tool_calls)
-            return None
+            return None, tool_calls
 
         full_response = message["content"]
-        return full_response
+        return full_response, None
         
     # ============================================================
     #                    TOKEN HANDLING
@@ -0,0 +1,55 @@
+class LoadRouter:
+    """
+    Second opinion on the prompt's flow, from how busy the machine is.
+
+    The thinking flow is two sequential generations, so under load it is
+    what pushes turns past the latency target. Only thinking is ever
+    changed, and only to fast:
+
+        thinking model not loaded        -> fast
+        estimated latency > slo_ms       -> fast
+
+    The estimate uses LLMEngine's recent per-model generation times,
+    which already stretch when generations compete for the CPU. Each
+    model serves one generation at a time, so a thinking turn waits for
+    the thinking passes already in flight, and its answer waits for one
+    instruct generation per other turn running or queued (in the async
+    core and in BackendBridge). Until both models have been timed
+    nothing is degraded.
+    """
+
+    def __init__(self, llm, settings):
+        self.llm = llm
+        self.settings = settings
+        self.degraded = 0
+
+    def decide(self, flow: str, ahead: int = 0, thinking_ahead: int = 0):
+        """
+        {flow, requested, reason, estimated_ms} for a turn with `ahead`
+        turns in front of it, `thinking_ahead` of them in a thinking pass.
+        """
+        decision = {"flow": flow, "requested": flow, "reason": None, "estimated_ms": None}
+        generate_settings = self.settings.get_settings()["generate_settings"]
+        if flow != "thinking" or not generate_settings.get("adaptive_routing", True):
+            return decision
+
+        if not self.llm.model_available("thinking"):
+            return self._degrade(decision, "thinking model not loaded")
+
+        thinking_ms = self.llm.expected_ms("thinking")
+        instruct_ms = self.llm.expected_ms("instruct")
+        if thinking_ms is None or instruct_ms is None:
+            return decision
+
+        reasoned_ms = (thinking_ahead + 1) * thinking_ms
+        estimated_ms = max(reasoned_ms, ahead * instruct_ms) + instruct_ms
+        decision["estimated_ms"] = round(estimated_ms, 1)
+        if estimated_ms > generate_settings.get("latency_slo_ms", 30000):
+            return self._degrade(decision, "latency slo")
+        return decision
+
+    def _degrade(self, decision, reason):
+        self.degraded += 1
+        decision["flow"] = "fast"
+        decision["reason"] = reason
+        return decision
@@ -34,6 +34,9 @@ class ModelManager:
         elif model_type == "embedding":
             from sentence_transformers import SentenceTransformer
             model = SentenceTransformer(path)
+        elif model_type == "reranker":
+            from sentence_transformers import CrossEncoder
+            model = CrossEncoder(path)
         else:
             raise ValueError("Unknown model type:", {name, model_type, path})
         
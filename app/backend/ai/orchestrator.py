@@ -1,4 +1,7 @@
+import os
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from PySide6.QtCore import Signal, QObject
 from backend.ai.llm_engine import LLMEngine
 from backend.ai.rag_pipeline import RAGPipeline
@@ -6,8 +9,14 @@ from backend.settings import Settings
 from backend.databases.user_db import UserDatabase
 from backend.ai.prompt_builder import PromptBuilder
 from backend.ai.identity_manager import IdentityManager
+from backend.ai.intent_router import IntentRouter
 from backend.tools.search_files import search_files
 
+TITLE_PROMPT = """
+    In 5-20 words, create a summary of the chat so for.
+    Add emoji(s) to the front of summary that best fit summary 
+"""
+
 class Orchestrator(QObject):
     def __init__(self, llm_engine: LLMEngine, rag_pipeline: RAGPipeline, settings: Settings, user_db: UserDatabase, chat_service):
         super().__init__()
@@ -18,6 +27,17 @@ class Orchestrator(QObject):
         self.chat_service = chat_service
 
         self.identity = IdentityManager()
+        self.intent_router = IntentRouter(
+            self.rag.embedding_engine,
+            cache_path=os.path.join(user_db.APP_DIR, "intent_centroids.npz") if user_db is not None else None
+        )
+        self._context_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="omni-context")
+        # FileIndex shared with the command router; search_files walks without one
+        self.file_index = None
+        self._tool_pool = ThreadPoolExecutor(
+            max_workers=self.settings.get_settings().get("tool_settings", {}).get("max_parallel", 4),
+            thread_name_prefix="omni-tool"
+        )
 
         self.llm.toolSignal.connect(self.execute_tool)
 
@@ -48,23 +68,61 @@ class Orchestrator(QObject):
         tool_triggers = ["search", "find", "look for", "open", "web", "file"]
         return any(word in prompt.lower() for word in tool_triggers)
     
-    def run(self, prompt: str, cached_history: list, chat_id: int):
-        system_tokens = self.llm.compute_budget("thinking")["system"]
+    def route(self, prompt: str) -> str:
+        """fast, thinking or tool: by embedding intent, or the keyword lists above."""
+        generate_settings = self.settings.get_settings()["generate_settings"]
+        if generate_settings.get("router", "embedding") == "embedding":
+            try:
+                return self.intent_router.route(prompt, margins=generate_settings.get("router_margins", {}))
+            except Exception as e:
+                print(f"⚠️  Intent router failed, using keywords: {e}")
+
+        if self.tool_needed(prompt):
+            return "tool"
+        elif self.need_thinking(prompt):
+            return "thinking"
+        return "fast"
+
+    def flow_prompt(self, flow: str) -> str:
+        if flow in ("tool", "thinking"):
+            system_tokens = self.llm.compute_budget("thinking")["system"]
+            return f"Think step by step in under {system_tokens} tokens."
         chat_tokens = self.llm.compute_budget("instruct")["chat"]
+        return f"Provide a clear and helpful message under {chat_tokens} tokens."
+
+    def select_flow(self, prompt: str):
+        flow = self.route(prompt)
+        if flow not in ("tool", "thinking"):
+            flow = "fast"
+        return flow, self.flow_prompt(flow)
 
+    def to_messages(self, cached_history: list):
         messages = []
         for msg in cached_history:
             messages.append({
                 "role": msg["role"],
                 "content": msg["content"],
-                "created_at": msg["created_at"]
+                "created_at": msg.get("created_at")
             })
-        if self.tool_needed(prompt):
-            return self._tool_flow(messages, system_prompt=f"Think step by step in under {system_tokens} tokens.", chat_id=chat_id)
-        elif self.need_thinking(prompt):
-            return self._thinking_flow(messages, system_prompt=f"Think step by step in under {system_tokens} tokens.", chat_id=chat_id)
+        return messages
+
+    def recent_messages(self, messages: list, count: int = 6):
+        """The last `count` messages, behind the rolling summaries that lead a summarized chat."""
+        summaries = 0
+        while summaries < len(messages) and messages[summaries]["role"] == "system":
+            summaries += 1
+        return messages[:summaries] + messages[summaries:][-count:]
+
+    def run(self, prompt: str, cached_history: list, chat_id: int):
+        messages = self.to_messages(cached_history)
+        flow, system_prompt = self.select_flow(prompt)
+
+        if flow == "tool":
+            return self._tool_flow(messages, chat_id=chat_id)
+        elif flow == "thinking":
+            return self._thinking_flow(messages, system_prompt=system_prompt, chat_id=chat_id)
         else: 
-            return self._fast_flow(messages, system_prompt=f"Provide a clear and helpful message under {chat_tokens} tokens.", chat_id=chat_id) 
+            return self._fast_flow(messages, system_prompt=system_prompt, chat_id=chat_id) 
         
 
     # ============================================================
@@ -75,52 +133,34 @@ class Orchestrator(QObject):
         self.llm.generate(
             chat_id=chat_id,
             model_name="instruct",
-            messages=messages[-6:],
+            messages=self.recent_messages(messages),
             system_prompt=identity_text + "\n" + system_prompt,
             source=source
         )
     
     def _thinking_flow(self, messages: list, chat_id: int, system_prompt: str = "Think step by step before answering", system_prompt2: str = "Provide a clear structure answer.", source="chat"):
-        builder = PromptBuilder(self.llm, "instruct", identity_text=self.identity.get_identity())
-        builder.set_system_instructions(
-            f"Provide a clear, structured answer in under "
-            f"{self.settings.get_settings()['model_settings']['instruct']['max_tokens']} tokens."
-            f"Do not hallucinate."
-        )
+        query = messages[-1]["content"]
+        pipelined = self.pipeline_prefill()
 
-        # Chat history
-        builder.add_chat_history(messages[:-1])
+        if pipelined:
+            # Retrieval and memory lookups run in the pool while the thinking
+            # model evaluates identity + history on this thread.
+            retrieved_future = self._context_pool.submit(self.retrieve_context, query)
+            memories_future = self._context_pool.submit(self.search_memories, query)
+            self.llm.prefill("thinking", self.build_thinking_prefix(messages), system_prompt)
+            retrieved = retrieved_future.result()
+            memories = memories_future.result()
+        else:
+            retrieved = self.retrieve_context(query)
+            memories = self.search_memories(query)
 
-        # RAG
-        retrieved = self.rag.retrieve(messages)
-        if retrieved:
-            builder.add_rag([chunk["text"] for chunk in retrieved])
-
-        # Memory
-        query_embedding = self.rag.embedding_engine.embed(
-            messages[-1]["content"]
-        )
-        summary_memories = self.user_db.search_memory_by_embedding(
-            query_embedding,
-            limit=2,
-            type_filter="summary"
-        )
-        fact_memories = self.user_db.search_memory_by_embedding(
-            query_embedding,
-            limit=3,
-            type_filter="fact"
-        )
-        builder.add_memory([m["content"] for m in summary_memories + fact_memories])
-
-        final_messages = builder.build(
-            user_message=messages[-1]["content"]
-        )
+        final_messages = self.build_thinking_messages(messages, retrieved, memories, context_last=pipelined)
 
         transferToInstruct = {
             "chat_id": chat_id,
             "messages": messages,
             "system_prompt": system_prompt2,
-            "user_prompt": messages[-1]["content"]
+            "user_prompt": query
         }
         
         self.llm.generate(
@@ -130,14 +170,15 @@ class Orchestrator(QObject):
             system_prompt=system_prompt,
             phase="thinking",
             source=source,
-            past_transfer=transferToInstruct
+            past_transfer=transferToInstruct,
+            reuse_prefix=pipelined
         )
 
     def _tool_flow(self, messages, chat_id: int):
         self.llm.generate(
             chat_id=chat_id,
             model_name="instruct",
-            messages=messages[-6:],
+            messages=self.recent_messages(messages),
             system_prompt=self.identity.get_identity(),
             source="chat",
             phase="instruct",
@@ -145,59 +186,153 @@ class Orchestrator(QObject):
         )
 
     def handle_thinking_prompt(self, results, transfer):
-        reasoning_text = results["text"]
+        final_messages = self.build_answer_messages(
+            transfer["messages"], results["text"], transfer["system_prompt"]
+        )
+
+        self.llm.generate(
+            chat_id=transfer["chat_id"],
+            model_name="instruct",
+            messages=final_messages,
+            system_prompt="",
+            source="chat"
+        )
+
+    # ============================================================
+    #                    CONTEXT + PROMPT BUILDING
+    # ============================================================
+    def retrieve_context(self, query: str):
+        return self.rag.retrieve(query)
+
+    def search_memories(self, query: str):
+        query_embedding = self.rag.embedding_engine.embed(query)[0]
+        summary_memories = self.user_db.search_memory_by_embedding(
+            query_embedding,
+            limit=2,
+            type_filter="summary"
+        )
+        fact_memories = self.user_db.search_memory_by_embedding(
+            query_embedding,
+            limit=3,
+            type_filter="fact"
+        )
+        memories = summary_memories + fact_memories
+        # Boosts are batched; the maintenance scheduler writes them
+        self.user_db.record_access(m["id"] for m in memories)
+        return memories
+
+    def pipeline_prefill(self):
+        return self.settings.get_settings()["generate_settings"].get("pipeline_prefill", False)
+
+    def _thinking_builder(self, messages: list):
+        builder = PromptBuilder(self.llm, "instruct", identity_text=self.identity.get_identity())
+        builder.set_system_instructions(
+            f"Provide a clear, structured answer in under "
+            f"{self.settings.get_settings()['model_settings']['instruct']['max_tokens']} tokens."
+            f"Do not hallucinate."
+        )
+
+        # Chat history
+        builder.add_chat_history(messages[:-1])
+        return builder
+
+    def build_thinking_prefix(self, messages: list):
+        return self._thinking_builder(messages).build_prefix()
+
+    def build_thinking_messages(self, messages: list, retrieved: list, memories: list, context_last: bool = False):
+        builder = self._thinking_builder(messages)
+
+        # RAG
+        if retrieved:
+            builder.add_rag([chunk["content"] for chunk in retrieved])
+
+        # Memory
+        builder.add_memory([m["content"] for m in memories])
+
+        return builder.build(
+            user_message=messages[-1]["content"],
+            context_last=context_last
+        )
+
+    def build_answer_messages(self, messages: list, reasoning_text: str, system_prompt: str = "Provide a clear structure answer."):
         builder = PromptBuilder(self.llm, "instruct", identity_text=self.identity.get_identity())
         builder.set_system_instructions(
             f"Provide a clear, structured answer in under "
             f"{self.settings.get_settings()['model_settings']['instruct']['max_tokens']} tokens."
-            f"Do not hallucinate. {transfer['system_prompt']}"
+            f"Do not hallucinate. {system_prompt}"
         )
             # Chat history
-        builder.add_chat_history(transfer["messages"][:-1], no_reverse=True)
+        builder.add_chat_history(messages[:-1], no_reverse=True)
 
         # Reasoning
         builder.set_reasoning(reasoning_text)
 
-        final_messages = builder.build(
-            user_message=transfer["user_prompt"]
+        return builder.build(
+            user_message=messages[-1]["content"]
         )
 
-        self.llm.generate(
-            chat_id=transfer["chat_id"],
-            model_name="instruct",
-            messages=final_messages,
-            system_prompt="",
-            source="chat"
+    def build_summary_messages(self, messages_to_summarize: list, previous_summary: str = None):
+        builder = PromptBuilder(self.llm, "instruct")
+        builder.set_system_instructions("""
+            Summarize the following conversation clearly and concisely.
+            Preserve important facts, goals, decisions, and constraints.
+            Do not invent information.
+        """)
+        builder.add_chat_history(messages_to_summarize)
+        if not previous_summary:
+            return builder.build(
+                user_message="Create a memory summary of the above conversation"
+            )
+        return builder.build(
+            user_message=(
+                f"Summary of the conversation before these messages:\n{previous_summary}\n\n"
+                "Rewrite that summary so it also covers the above messages."
+            )
         )
 
+    def build_condense_messages(self, older: str, newer: str, max_tokens: int):
+        """Fold two consecutive summaries of one chat into one, for the level above."""
+        builder = PromptBuilder(self.llm, "instruct")
+        builder.set_system_instructions(f"""
+            Combine two consecutive summaries of the same conversation into one
+            summary of under {max_tokens} tokens. Keep facts, goals, decisions and
+            constraints that still matter; drop detail that later parts made obsolete.
+            Do not invent information.
+        """)
+        parts = [f"Earlier summary:\n{older}"] if older else []
+        parts.append(f"Later summary:\n{newer}")
+        return builder.build(user_message="\n\n".join(parts))
+
+    def merge_memory_text(self, contents: list):
+        """One memory written from several near-duplicates; None when the model fails."""
+        builder = PromptBuilder(self.llm, "instruct")
+        builder.set_system_instructions("""
+            Merge the following memories into a single memory.
+            Keep every distinct fact, goal, decision and constraint once.
+            Do not invent information. Reply with the merged memory only.
+        """)
+        messages = builder.build(
+            user_message="\n\n".join(f"Memory {n}:\n{text}" for n, text in enumerate(contents, 1))
+        )
+        results = self.llm.complete("instruct", messages, "", -1)
+        if not results["success"] or not results.get("text"):
+            return None
+        return results["text"]
+
     # ============================================================
     #                    INTERNAL FINISHED PROMPTS
     # ============================================================
     def generate_title(self, messages, chat_id):
-        system_prompt="""
-            In 5-20 words, create a summary of the chat so for.
-            Add emoji(s) to the front of summary that best fit summary 
-        """
         self.llm.generate(
             chat_id=chat_id,
             model_name="instruct",
             messages=messages,
-            system_prompt=system_prompt,
+            system_prompt=TITLE_PROMPT,
             source="title"
         )
 
-    def generate_summary(self, messages_to_summarize: list, transfer):
-        from backend.ai.prompt_builder import PromptBuilder
-        builder = PromptBuilder(self.llm, "instruct")
-        builder.set_system_instructions("""
-            Summarize the following conversation clearly and concisely.
-            Preserve important facts, goals, decisions, and constraints.
-            Do not invent information.
-        """)
-        builder.add_chat_history(messages_to_summarize)
-        final_messages = builder.build(
-            user_message="Create a memory summary of the above conversation"
-        )
+    def generate_summary(self, messages_to_summarize: list, transfer, final_messages: list = None):
+        final_messages = final_messages or self.build_summary_messages(messages_to_summarize)
         self.llm.generate(
             chat_id=transfer["chat_id"],
             model_name="instruct",
@@ -210,49 +345,110 @@ class Orchestrator(QObject):
     # ============================================================
     #                    TOOL CALLING
     # ============================================================
-    def execute_tool(self, chat_id, tool_calls):
-        for tool_call in tool_calls:
-            name = tool_call["function"]["name"]
-            arguments = json.loads(tool_call["function"]["arguments"])
-
-            if name == "search_files":
-                search = search_files(arguments["query"], self.settings)
-                if search["success"]:
-                    data = search["data"]
-                    results = ", ".join(data)
-
-                    self.chat_service.append_message(
-                        chat_id, {
-                            "role": "assistant",
-                            "content": "[Tool Call: search_files]",
-                            "tool_calls": [tool_call],
-                    })
-                    self.chat_service.append_message(
-                        chat_id, {
-                            "role": "tool",
-                            "content": results,
-                            "tool_call_id": tool_call["id"]
-                    })
-                    messages = self.chat_service.get_messages(chat_id)
-
-                    self.llm.generate(
-                        model_name="instruct",
-                        messages=messages,
-                        system_prompt=self.identity.get_identity(),
-                        source="tool",
-                        chat_id=chat_id
-                    )
+    def run_tool(self, tool_call):
+        name = tool_call["function"]["name"]
+        arguments = json.loads(tool_call["function"]["arguments"] or "{}")
+
+        if name == "search_files":
+            search = search_files(arguments["query"], self.settings, self.file_index)
+            if search["success"]:
+                snippets = search.get("snippets") or {}
+                if not snippets:
+                    return {"success": True, "content": ", ".join(search["data"])}
+                lines = [f"{path} — {snippets[path]}" if path in snippets else path for path in search["data"]]
+                return {"success": True, "content": "\n".join(lines)}
+            return {"success": False, "error": "File search failed"}
+
+        if name == "search_history":
+            hits = self.chat_service.system_db.search_history(
+                arguments["query"], limit=min(int(arguments.get("limit") or 8), 20)
+            )
+            if not hits:
+                return {"success": True, "content": "No matching messages or notes."}
+            lines = []
+            for hit in hits:
+                if hit["type"] == "message":
+                    lines.append(f"[chat \"{hit['chat_title']}\", {hit['role']}, {hit['created_at']}] {hit['snippet']}")
                 else:
-                    self.llm.generationFinished.emit("tool", {
-                        "success": False,
-                        "error": "File search failed"
-                    }, {
-                        "chat_id": chat_id,
-                        "phase": "tool",
-                        "source": "tool",
-                        "messages": self.chat_service.get_messages(chat_id)
-                    })
-
-            if name == "web_search":
-                return
-        
+                    lines.append(f"[note \"{hit['title']}\"] {hit['snippet']}")
+            return {"success": True, "content": "\n".join(lines)}
+
+        return {"success": False, "error": f"Tool not available: {name}"}
+
+    def tool_timeout(self, name: str) -> float:
+        tool_settings = self.settings.get_settings().get("tool_settings", {})
+        return tool_settings.get(name, {}).get("timeout_s", tool_settings.get("timeout_s", 10))
+
+    def run_tools(self, tool_calls: list):
+        """
+        Run every tool call of one response at once on the tool pool.
+
+        Returns a result per call, in order. A call that raises or
+        outlives its timeout (tool_settings.<name>.timeout_s, else
+        tool_settings.timeout_s) gets {"success": False, "error": ...};
+        a timed-out tool keeps its pool thread until it returns, but
+        nobody waits for it.
+        """
+        started = time.monotonic()
+        futures = [self._tool_pool.submit(self.run_tool, tool_call) for tool_call in tool_calls]
+
+        results = []
+        for tool_call, future in zip(tool_calls, futures):
+            name = tool_call["function"]["name"]
+            timeout = self.tool_timeout(name)
+            try:
+                results.append(future.result(timeout=max(started + timeout - time.monotonic(), 0)))
+            except TimeoutError:
+                future.cancel()
+                print(f"⚠️  Tool {name} timed out after {timeout}s")
+                results.append({"success": False, "error": f"{name} timed out after {timeout}s"})
+            except Exception as e:
+                results.append({"success": False, "error": f"{name} failed: {e}"})
+        return results
+
+    def record_tool_result(self, chat_id, tool_call, result):
+        self.record_tool_results(chat_id, [tool_call], [result])
+
+    def record_tool_results(self, chat_id, tool_calls, results):
+        """One assistant message carrying every call, then a tool message per result; returns them."""
+        names = ", ".join(tool_call["function"]["name"] for tool_call in tool_calls)
+        recorded = [{
+            "role": "assistant",
+            "content": f"[Tool Call: {names}]",
+            "tool_calls": tool_calls,
+        }]
+        for tool_call, result in zip(tool_calls, results):
+            recorded.append({
+                "role": "tool",
+                "content": result["content"] if result["success"] else f"Error: {result['error']}",
+                "tool_call_id": tool_call["id"]
+            })
+        for message in recorded:
+            self.chat_service.append_message(chat_id, message)
+        return recorded
+
+    def execute_tool(self, chat_id, tool_calls):
+        results = self.run_tools(tool_calls)
+        if not any(result["success"] for result in results):
+            self.llm.generationFinished.emit("tool", {
+                "success": False,
+                "error": "; ".join(result["error"] for result in results)
+            }, {
+                "chat_id": chat_id,
+                "phase": "tool",
+                "source": "tool",
+                "messages": self.chat_service.get_messages(chat_id)
+            })
+            return
+
+        # Same window as the call itself (and as AsyncOrchestrator._tool_flow), read before the results land
+        recent = self.recent_messages(self.to_messages(self.chat_service.get_messages(chat_id)))
+        # Failed calls are recorded as errors; the model answers from the rest
+        recorded = self.record_tool_results(chat_id, tool_calls, results)
+        self.llm.generate(
+            model_name="instruct",
+            messages=recent + recorded,
+            system_prompt=self.identity.get_identity(),
+            source="tool",
+            chat_id=chat_id
+        )
@@ -79,22 +79,37 @@ class PromptBuilder:
     # ============================================================
     #                    BUILD
     # ============================================================
-    def build(self, user_message: str):
+    def build(self, user_message: str, context_last: bool = False):
+        """
+        context_last keeps memory/RAG out of the leading system message and
+        sends it right before the user turn instead, so everything up to the
+        end of the chat history matches build_prefix() and can be prefilled.
+        """
+        messages = self.build_prefix(include_context=not context_last)
+
+        context_text = self._context_text()
+        if context_last and context_text:
+            messages.append({
+                "role": "system",
+                "content": context_text
+            })
+
+        messages.append({
+            "role": "user",
+            "content": user_message
+        })
+
+        return messages
+
+    def build_prefix(self, include_context: bool = False):
         system_sections = []
 
         if self.identity_text:
             system_sections.append(self.identity_text)
 
-        if self._memory_blocks:
-            system_sections.append(
-                "Long-Term Memory:\n" +
-                "\n".join(f"- {m}" for m in self._memory_blocks)
-            )
-        if self._rag_blocks:
-            system_sections.append(
-                "Relevant Context:\n" +
-                "\n".join(self._rag_blocks)
-            )
+        if include_context and self._context_text():
+            system_sections.append(self._context_text())
+
         if self._reasoning:
             system_sections.append(
                 "Internal Reasoning:\n" + self._reasoning
@@ -111,9 +126,19 @@ class PromptBuilder:
                 "content": system_text.strip()
             })
         messages.extend(self._chat_messages)
-        messages.append({
-            "role": "user",
-            "content": user_message
-        })
 
         return messages
+
+    def _context_text(self):
+        sections = []
+        if self._memory_blocks:
+            sections.append(
+                "Long-Term Memory:\n" +
+                "\n".join(f"- {m}" for m in self._memory_blocks)
+            )
+        if self._rag_blocks:
+            sections.append(
+                "Relevant Context:\n" +
+                "\n".join(self._rag_blocks)
+            )
+        return "\n\n".join(sections)
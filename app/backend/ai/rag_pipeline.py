@@ -1,14 +1,14 @@
-import numpy as np
 from PySide6.QtCore import QObject
 from backend.ai.embeddings_engine import EmbeddingEngine
 from backend.settings import Settings
 
 class RAGPipeline(QObject):
-    def __init__(self, db, embedding_engine: EmbeddingEngine, settings: Settings):
+    def __init__(self, db, embedding_engine: EmbeddingEngine, settings: Settings, reranker=None):
         super().__init__()
         self.db = db
         self.embedding_engine = embedding_engine
         self.settings = settings
+        self.reranker = reranker
 
     def chunk_text(self, text):
         words = text.split()
@@ -27,29 +27,65 @@ class RAGPipeline(QObject):
         return chunks
 
     def retrieve(self, query):
-        query_embedding = self.embedding_engine.embed(query)[0]
-        chunks = self.db.get_all_chunks()
-
-        if not chunks:
-            return []
-
+        """
+        Top chunks for a query.
+
+        Dense cosine ranking is fused with the BM25 ranking from the
+        chunks_fts index by weighted reciprocal rank fusion:
+            score = weight / (k + dense_rank) + (1 - weight) / (k + bm25_rank)
+        Chunks whose cosine is below min_score get no dense share, so they
+        only come back when they match the query's words.
+
+        With rag_settings.rerank, the best `rerank_candidates` are handed
+        to the Reranker, which picks the final top_k.
+
+        Dense ranking runs in the database (vector_codec), so quantized
+        embeddings are scored in their compact form and only the top of
+        the ranking is ever decoded.
+        """
         embedding_settings = self.settings.get_settings().get("embedding_settings", {})
         top_k = embedding_settings.get("top_k", 5)
 
-        similarities = []
-
-        query_norm = np.linalg.norm(query_embedding)
+        rag_settings = self.settings.get_settings().get("rag_settings", {})
+        min_score = rag_settings.get("min_score", 0.0)
 
-        for chunk in chunks:
-            emb = chunk["embedding"]
-            emb_norm = np.linalg.norm(emb)
+        rerank = self.reranker is not None and rag_settings.get("rerank", False)
+        fetch = max(rag_settings.get("rerank_candidates", 20), top_k) if rerank else top_k
 
-            if emb_norm == 0 or query_norm == 0:
-                continue
-
-            score = np.dot(query_embedding, emb) / (query_norm * emb_norm)
-            similarities.append((score, chunk))
-
-        similarities.sort(key=lambda x: x[0], reverse=True)
+        query_embedding = self.embedding_engine.embed(query)[0]
 
-        return [c[1] for c in similarities[:top_k]]
\ No newline at end of file
+        if not rag_settings.get("hybrid", True):
+            dense = self.db.search_chunks_by_embedding(query_embedding, limit=fetch)
+            candidates = [chunk for score, chunk in dense if score >= min_score]
+        else:
+            depth = max(fetch * 10, 50)
+            dense = self.db.search_chunks_by_embedding(query_embedding, limit=depth)
+            lexical = self.db.search_chunks(query, limit=depth)
+            candidates = self._fuse(dense, lexical, rag_settings)[:fetch]
+
+        if rerank:
+            return self.reranker.rerank(query, query_embedding, candidates, top_k)
+        return candidates
+
+    def _fuse(self, dense, lexical, rag_settings):
+        weight = rag_settings.get("weight", 0.7)
+        k = rag_settings.get("rrf_k", 60)
+        min_score = rag_settings.get("min_score", 0.0)
+
+        by_id = {chunk["id"]: chunk for _, chunk in dense}
+        # Lexical hits outside the dense window still need their chunk
+        missing = [hit["id"] for hit in lexical if hit["id"] not in by_id]
+        by_id.update({chunk["id"]: chunk for chunk in self.db.get_chunks(missing)})
+        fused = {}
+
+        for rank, (score, chunk) in enumerate(dense, start=1):
+            if score < min_score:
+                break
+            fused[chunk["id"]] = weight / (k + rank)
+
+        for rank, hit in enumerate(lexical, start=1):
+            if hit["id"] in by_id:
+                fused[hit["id"]] = fused.get(hit["id"], 0.0) + (1 - weight) / (k + rank)
+
+        ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+        return [{**by_id[chunk_id], "score": score} for chunk_id, score in ranked]
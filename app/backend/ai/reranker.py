@@ -0,0 +1,133 @@
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+from backend.settings import Settings
+
+
+class Reranker:
+    """
+    Second-stage ordering for RAG candidates.
+
+    With a `reranker` backend model loaded (a sentence-transformers
+    CrossEncoder), (query, chunk) pairs are scored in batches, best fused
+    candidates first; scores are cached per (query, chunk id). Without
+    one, candidates are reordered by MMR over their embeddings so the
+    context isn't five near-copies of the same passage.
+
+    Both stop at `rerank_budget_ms`: whatever wasn't scored in time keeps
+    its first-stage order after the scored candidates.
+    """
+
+    def __init__(self, settings: Settings, model=None, cache_size=4096):
+        self.settings = settings
+        self.model = model
+
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.budget_cutoffs = 0
+        self._batch_seconds = 0.0 # Moving average, so a batch isn't started that would overrun
+
+    # ============================================================
+    #                    RERANKING
+    # ============================================================
+    def method(self):
+        method = self.settings.get_settings()["rag_settings"].get("rerank_method", "auto")
+        if method == "auto":
+            return "cross_encoder" if self.model is not None else "mmr"
+        if method == "cross_encoder" and self.model is None:
+            return "mmr"
+        return method
+
+    def rerank(self, query, query_embedding, candidates, top_k):
+        if len(candidates) <= 1:
+            return candidates[:top_k]
+
+        rag_settings = self.settings.get_settings()["rag_settings"]
+        deadline = time.perf_counter() + rag_settings.get("rerank_budget_ms", 150) / 1000
+
+        if self.method() == "cross_encoder":
+            return self._cross_encode(query, candidates, top_k, deadline, rag_settings.get("rerank_batch_size", 16))
+        return self._mmr(query_embedding, candidates, top_k, deadline, rag_settings.get("mmr_lambda", 0.7))
+
+    def _cross_encode(self, query, candidates, top_k, deadline, batch_size):
+        scores = {}
+        pending = []
+        with self._lock:
+            for chunk in candidates:
+                key = (query, chunk["id"])
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    scores[chunk["id"]] = self._cache[key]
+                    self.hits += 1
+                else:
+                    pending.append(chunk)
+                    self.misses += 1
+
+        for i in range(0, len(pending), batch_size):
+            if time.perf_counter() + self._batch_seconds >= deadline:
+                self.budget_cutoffs += 1
+                break
+            batch = pending[i:i + batch_size]
+            started = time.perf_counter()
+            batch_scores = self.model.predict([(query, chunk["content"]) for chunk in batch])
+            elapsed = time.perf_counter() - started
+            self._batch_seconds = elapsed if not self._batch_seconds else 0.8 * self._batch_seconds + 0.2 * elapsed
+            with self._lock:
+                for chunk, score in zip(batch, batch_scores):
+                    scores[chunk["id"]] = float(score)
+                    self._cache[(query, chunk["id"])] = float(score)
+                while len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+
+        scored = sorted(
+            (chunk for chunk in candidates if chunk["id"] in scores),
+            key=lambda chunk: scores[chunk["id"]],
+            reverse=True
+        )
+        unscored = [chunk for chunk in candidates if chunk["id"] not in scores]
+        return [
+            {**chunk, "rerank_score": scores.get(chunk["id"])}
+            for chunk in scored + unscored
+        ][:top_k]
+
+    def _mmr(self, query_embedding, candidates, top_k, deadline, lambda_):
+        matrix = np.vstack([chunk["embedding"] for chunk in candidates]).astype(np.float32)
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        query = query_embedding / max(np.linalg.norm(query_embedding), 1e-12)
+
+        relevance = matrix @ query
+        similarity = matrix @ matrix.T
+
+        selected = []
+        remaining = list(range(len(candidates)))
+        redundancy = np.zeros(len(candidates), dtype=np.float32)
+
+        while remaining and len(selected) < top_k:
+            if selected and time.perf_counter() >= deadline:
+                self.budget_cutoffs += 1
+                break
+            mmr = lambda_ * relevance[remaining] - (1 - lambda_) * redundancy[remaining]
+            best = remaining[int(np.argmax(mmr))]
+            selected.append(best)
+            remaining.remove(best)
+            redundancy = np.maximum(redundancy, similarity[best])
+
+        order = selected + remaining
+        return [candidates[i] for i in order][:top_k]
+
+    # ============================================================
+    #                    METRICS
+    # ============================================================
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "method": self.method(),
+            "cache_entries": len(self._cache),
+            "cache_hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "budget_cutoffs": self.budget_cutoffs
+        }
@@ -3,6 +3,7 @@ import json
 from collections import deque
 from PySide6.QtCore import QObject, Slot, Signal, QThread
 from backend.command_router import CommandRouter
+from backend.services.file_index import FileIndex
 # from backend.services.app_services import AppServices
 
 
@@ -10,9 +11,9 @@ class SystemWorker(QObject):
     finished = Signal(str)
     started = Signal()
 
-    def __init__(self):
+    def __init__(self, settings=None, file_index=None):
         super().__init__()
-        self.router = CommandRouter()
+        self.router = CommandRouter(settings, file_index)
 
     @Slot(str)
     def process(self, text):
@@ -31,25 +32,37 @@ class AIWorker(QObject):
     chatData = Signal(list)
     chatActionFinished = Signal()
 
-    messageData = Signal(list)
+    messageData = Signal(dict)
     messageActionFinished = Signal()
 
-    def __init__(self, system_db, user_db, settings, model_manager, rag_pipeline):
+    searchData = Signal(dict)
+
+    def __init__(self, system_db, user_db, settings, model_manager, rag_pipeline, queue_depth=None, file_index=None):
         super().__init__()
         self.system_db = system_db
         self.user_db = user_db
         self.settings = settings
         self.model_manager = model_manager
         self.rag_pipeline = rag_pipeline
+        self.queue_depth = queue_depth
+        self.file_index = file_index
 
         self.chat_service = None
         self.orchestrator = None
+        self.core = None
+        self.runtime = None
+        self.maintenance = None
+        self.follow_ups = None
 
     @Slot()
     def initialize(self):
         from backend.ai.llm_engine import LLMEngine
         from backend.ai.orchestrator import Orchestrator
+        from backend.ai.async_orchestrator import AsyncOrchestrator, AsyncRuntime
         from backend.services.chat_service import ChatService
+        from backend.services.maintenance import MaintenanceScheduler
+        from backend.services.memory_consolidation import MemoryConsolidator
+        from backend.services.follow_up_queue import FollowUpQueue
 
         llm = LLMEngine(self.model_manager, self.settings)
         orchestrator = Orchestrator(
@@ -65,8 +78,31 @@ class AIWorker(QObject):
         )
 
         orchestrator.chat_service = chat_service
+        orchestrator.file_index = self.file_index
         self.chat_service = chat_service
         self.orchestrator = orchestrator
+        self.core = AsyncOrchestrator(orchestrator, chat_service)
+        self.core.queue_depth = self.queue_depth
+        if self.file_index is not None:
+            self.file_index.idle_seconds = self.core.idle_seconds
+        self.runtime = AsyncRuntime()
+
+        generate_settings = self.settings.get_settings()["generate_settings"]
+        if generate_settings.get("background_follow_ups", True):
+            self.follow_ups = FollowUpQueue(self.core.idle_seconds, generate_settings.get("follow_up_idle_s", 1.0))
+            chat_service.follow_ups = self.follow_ups
+            self.core.follow_ups = self.follow_ups
+            self.follow_ups.start()
+
+        consolidator = MemoryConsolidator(
+            self.user_db,
+            orchestrator.merge_memory_text,
+            lambda text: self.rag_pipeline.embedding_engine.embed(text)[0]
+        )
+        self.maintenance = MaintenanceScheduler(
+            self.settings, self.system_db, self.user_db, self.core.idle_seconds, consolidator
+        )
+        self.maintenance.start()
 
         llm.tokenGenerated.connect(self.tokenGenerated)
         llm.generationFinished.connect(self._handle_finished)
@@ -80,7 +116,29 @@ class AIWorker(QObject):
         self.started.emit()
         chat_id, prompt = request
         # print(f'CHAT ID: {chat_id} PROMPT: {prompt}')
-        self.chat_service.send_message(chat_id, prompt)
+        # Turns run as coroutines on the runtime loop; this thread stays free
+        future = self.runtime.submit(
+            self.core.run_turn(chat_id, prompt, on_token=self.tokenGenerated.emit)
+        )
+        future.add_done_callback(self._on_turn_done)
+
+    def _on_turn_done(self, future):
+        try:
+            results = future.result()
+        except Exception as e:
+            results = {"success": False, "error": str(e)}
+        self.finished.emit(results)
+
+    def shutdown(self):
+        if self.runtime is not None:
+            self.runtime.stop()
+            self.runtime = None
+        if self.follow_ups is not None:
+            self.follow_ups.stop()
+            self.follow_ups = None
+        if self.maintenance is not None:
+            self.maintenance.stop()
+            self.maintenance = None
 
     def _handle_finished(self, phase, results, transfer):
         if not results["success"]:
@@ -89,19 +147,7 @@ class AIWorker(QObject):
         
         # ================== INTERNAL FINISHED PROMPTS ==================
         if phase == "summary":
-            summary_text = results["text"]
-            if summary_text and summary_text.strip():
-                self.chat_service.add_summary(summary_text, transfer)
-                embedding = self.rag_pipeline.embedding_engine.embed(summary_text)
-                self.user_db.add_memory_with_embedding(
-                    type="summary",
-                    category="conversation",
-                    content=summary_text,
-                    embedding=embedding,
-                    source="ai",
-                    importance=2,
-                    confidence=0.9
-                )
+            self.chat_service.store_summary(results["text"], transfer)
             return
         
         elif phase == "thinking":
@@ -147,7 +193,7 @@ class AIWorker(QObject):
                 title = data[:25]
             else:
                 title = data
-            self.system_db.edit_chat_title(title, id, has_title=True)
+            self.chat_service.rename_chat(id, title, has_title=True)
             self.chatActionFinished.emit()
             return
         
@@ -161,8 +207,12 @@ class AIWorker(QObject):
         if id is None:
             return
         if action == "get":
-            messages = self._get_messages(id)
-            self.messageData.emit(messages)
+            self.messageData.emit(self._get_messages_page(id))
+            return
+
+        elif action == "page":
+            data = data or {}
+            self.messageData.emit(self._get_messages_page(id, data.get("before_id"), data.get("limit")))
             return
         
         elif data is None:
@@ -184,11 +234,35 @@ class AIWorker(QObject):
         print("MESSAGES BRIDGE", messages, f"CHAT ID:", chat_id)
         return messages
 
+    def _get_messages_page(self, chat_id, before_id=None, limit=None):
+        """Newest window of a chat (before_id None) or the page just above `before_id`."""
+        limit = limit or self.settings.get_settings()["ui"].get("message_page_size", 50)
+        # One extra row tells QML whether there is anything left to scroll back to
+        messages = self.chat_service.system_db.get_messages_page(chat_id, before_id, limit + 1)
+        has_more = len(messages) > limit
+        if has_more:
+            messages = messages[1:]
+        print("MESSAGES PAGE BRIDGE", {"chat_id": chat_id, "before_id": before_id, "count": len(messages), "has_more": has_more})
+        return {
+            "chat_id": chat_id,
+            "before_id": before_id or 0,
+            "messages": messages,
+            "has_more": has_more
+        }
+
     # @Slot(int)
     def _remove_chat(self, chat_id):
-        removed_chat = self.chat_service.system_db.delete_chat(chat_id)
+        removed_chat = self.chat_service.delete_chat(chat_id)
         print(f"\n\n\nREMOVED CHAT: {removed_chat} CHAT ID: {chat_id}\n\n\n")
 
+    # ============================================================
+    #                    SEARCH
+    # ============================================================
+    def handle_search(self, search_tuple):
+        query, limit = search_tuple
+        results = self.system_db.search_history(query, limit=limit)
+        self.searchData.emit({"query": query, "results": results})
+
 
 
 class BackendBridge(QObject):
@@ -212,9 +286,12 @@ class BackendBridge(QObject):
     chatActionsFinished = Signal()
 
     messageAction = Signal(tuple)
-    messagesData = Signal(list)
+    messagesData = Signal(dict)
     messageActionsFinished = Signal()
 
+    searchAction = Signal(tuple)
+    searchResults = Signal(dict)
+
     settingsChanged = Signal()
     unsavedChanges = Signal(bool)
 
@@ -234,15 +311,20 @@ class BackendBridge(QObject):
         self.system_thread = QThread()
         self.ai_thread = QThread()
 
+        # ================== FILE INDEX ==================
+        self.file_index = FileIndex(os.path.join(self.user_db.APP_DIR, "files.db"), self.settings)
+
         # ================== WORKERS ==================
-        self.system_worker = SystemWorker()
+        self.system_worker = SystemWorker(self.settings, self.file_index)
 
         self.ai_worker = AIWorker(
             self.system_db,
             self.user_db,
             self.settings,
             self.model_manager,
-            self.rag_pipeline
+            self.rag_pipeline,
+            lambda: len(self.ai_queue),
+            self.file_index
         )
 
         # ================== QUEUES ==================
@@ -277,18 +359,26 @@ class BackendBridge(QObject):
         self.ai_worker.messageData.connect(self.messagesData)
         self.ai_worker.messageActionFinished.connect(self.messageActionsFinished)
 
+        self.searchAction.connect(self.ai_worker.handle_search)
+        self.ai_worker.searchData.connect(self.searchResults)
+
         self.settings.settingsChanged.connect(self.settingsChanged)
         self.settings.unsavedChanges.connect(self.unsavedChanges)
 
         # ================== START THREADS ==================
         self.system_thread.start()
         self.ai_thread.start()
+        self.file_index.start()
 
     def shutdown(self):
+        self.file_index.close()
+        self.ai_worker.shutdown()
         self.ai_thread.quit()
         self.ai_thread.wait()
         self.system_thread.quit()
         self.system_thread.wait()
+        self.user_db.close()
+        self.system_db.close()
 
         # Delete workers explicitly
         self.system_worker.deleteLater()
@@ -370,9 +460,16 @@ class BackendBridge(QObject):
     @Slot(str, int, dict)
     def messageActions(self, action, id=None, data=None):
         print("\n\nACTION RECEIVED", {action, id, data})
-        if action in ("get", "regenerate"):
+        if action in ("get", "page", "regenerate"):
             print("forwarding message action...")
             self.messageAction.emit((action, id, data))
+
+    @Slot(str)
+    @Slot(str, int)
+    def searchHistory(self, query, limit=20):
+        """Full-text search over chats and notes; results arrive on searchResults."""
+        if query.strip():
+            self.searchAction.emit((query, limit))
     
     # ============================================================
     #                    SETTINGS PROCESSES
@@ -2,7 +2,9 @@ from backend.tools.search_files import search_files
 from backend.tools.discover_apps import find_app
 
 class CommandRouter:
-    def __init__(self):
+    def __init__(self, settings=None, file_index=None):
+        self.settings = settings
+        self.file_index = file_index
         self.commands = {
             "echo": self.echo,
             "help": self.help_command,
@@ -38,12 +40,13 @@ class CommandRouter:
         return "Available commands: " + ", ".join(self.commands.keys())
     
     def search(self, arg: str) -> str:
-        results = search_files(arg)
+        results = search_files(arg, self.settings, self.file_index)
         return {
             "type": "files",
             "success": results["success"],
             "message": results["message"],
-            "data": results.get("data", {})
+            "data": results.get("data", {}),
+            "snippets": results.get("snippets", {})
         }
     
     def open_app(self, arg: str) -> str:
@@ -0,0 +1,176 @@
+"""
+Generational online backups of a pooled SQLite database.
+
+Backups are taken with the SQLite online backup API a few hundred pages
+per step, so readers and the write-behind queue keep running while the
+copy is made. A write from another connection restarts the copy; after
+`max_restarts` the remainder is copied in one step under the pool's
+writer lock (queued writes just wait for it).
+
+Every copy is quick_check'ed before it is kept as
+    <dir>/<name>-YYYYmmdd-HHMMSS.db
+Retention keeps the newest `keep_last` backups plus the newest backup of
+each of the last `keep_daily` days and `keep_weekly` ISO weeks.
+"""
+import os
+import time
+import sqlite3
+from datetime import datetime
+
+STAMP = "%Y%m%d-%H%M%S"
+
+
+class BackupRestarted(Exception):
+    pass
+
+
+class BackupManager:
+    def __init__(self, pool, directory, name, keep_last=3, keep_daily=7, keep_weekly=4):
+        self.pool = pool
+        self.directory = directory
+        self.name = name
+        self.keep_last = keep_last
+        self.keep_daily = keep_daily
+        self.keep_weekly = keep_weekly
+
+        os.makedirs(directory, exist_ok=True)
+
+        self.last_duration = None
+        self.last_restarts = 0
+
+    # ============================================================
+    #                    GENERATIONS
+    # ============================================================
+    def generations(self):
+        """[(taken_at, path)] newest first."""
+        found = []
+        prefix = f"{self.name}-"
+        for entry in os.listdir(self.directory):
+            if not (entry.startswith(prefix) and entry.endswith(".db")):
+                continue
+            try:
+                taken_at = datetime.strptime(entry[len(prefix):-3], STAMP)
+            except ValueError:
+                continue
+            found.append((taken_at, os.path.join(self.directory, entry)))
+        return sorted(found, reverse=True)
+
+    def latest(self):
+        generations = self.generations()
+        return generations[0][1] if generations else None
+
+    def age(self):
+        """Seconds since the newest backup, or None if there is none."""
+        generations = self.generations()
+        if not generations:
+            return None
+        return max(0.0, (datetime.now() - generations[0][0]).total_seconds())
+
+    def prune(self):
+        keep = set()
+        days, weeks = set(), set()
+        for index, (taken_at, path) in enumerate(self.generations()):
+            day = taken_at.date()
+            week = taken_at.isocalendar()[:2]
+            if index < self.keep_last:
+                keep.add(path)
+            if day not in days and len(days) < self.keep_daily:
+                days.add(day)
+                keep.add(path)
+            if week not in weeks and len(weeks) < self.keep_weekly:
+                weeks.add(week)
+                keep.add(path)
+
+        removed = 0
+        for _, path in self.generations():
+            if path not in keep:
+                os.remove(path)
+                removed += 1
+        return removed
+
+    # ============================================================
+    #                    BACKUP
+    # ============================================================
+    def run(self, pages_per_step=256, sleep=0.005, max_restarts=3):
+        """Take one backup generation; returns its path."""
+        started = time.perf_counter()
+        target = os.path.join(self.directory, f"{self.name}-{datetime.now().strftime(STAMP)}.db")
+        partial = target + ".partial"
+        if os.path.exists(partial):
+            os.remove(partial)
+
+        restarts = 0
+        last_remaining = None
+
+        def progress(status, remaining, total):
+            nonlocal restarts, last_remaining
+            if last_remaining is not None and remaining > last_remaining:
+                restarts += 1
+                if restarts >= max_restarts:
+                    raise BackupRestarted()
+            last_remaining = remaining
+
+        source = self.pool.connect()
+        destination = sqlite3.connect(partial)
+        try:
+            try:
+                source.backup(destination, pages=pages_per_step, progress=progress, sleep=sleep)
+            except BackupRestarted:
+                # Keep this process's writes out and copy the rest at once
+                with self.pool.exclusive():
+                    source.backup(destination, pages=-1)
+
+            result = destination.execute("PRAGMA quick_check").fetchone()[0]
+            if result != "ok":
+                raise sqlite3.DatabaseError(f"Backup failed quick_check: {result}")
+        except BaseException:
+            destination.close()
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        finally:
+            source.close()
+
+        destination.close()
+        os.replace(partial, target)
+
+        self.last_duration = time.perf_counter() - started
+        self.last_restarts = restarts
+        self.prune()
+        return target
+
+    def restore(self, path):
+        """
+        Copy the newest generation that passes quick_check over `path`
+        (which must not be open). Returns the generation used, or None.
+        """
+        for _, backup in self.generations():
+            try:
+                conn = sqlite3.connect(f"file:{backup}?mode=ro", uri=True)
+                ok = conn.execute("PRAGMA quick_check").fetchone()[0] == "ok"
+                conn.close()
+            except sqlite3.DatabaseError:
+                ok = False
+            if not ok:
+                continue
+
+            source = sqlite3.connect(f"file:{backup}?mode=ro", uri=True)
+            destination = sqlite3.connect(path)
+            try:
+                source.backup(destination)
+            finally:
+                source.close()
+                destination.close()
+            return backup
+        return None
+
+    def stats(self):
+        generations = self.generations()
+        return {
+            "generations": len(generations),
+            "latest": os.path.basename(generations[0][1]) if generations else None,
+            "age_s": round(self.age(), 3) if generations else None,
+            "bytes": sum(os.path.getsize(path) for _, path in generations),
+            "last_duration_ms": round(self.last_duration * 1000, 3) if self.last_duration is not None else None,
+            "last_restarts": self.last_restarts
+        }
@@ -0,0 +1,168 @@
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class ConnectionPool:
+    """
+    One reader connection per thread plus a single shared writer.
+
+    In WAL mode readers never wait on the writer, so the UI thread, the
+    Qt worker threads and the flow pool can all read while a write is
+    in flight. Writes take the writer lock, run in one BEGIN IMMEDIATE
+    transaction and commit (or roll back) when the block exits.
+
+    Reader connections are only ever used by the thread that opened them;
+    ones left behind by finished threads are closed on the next open.
+    """
+
+    def __init__(self, path, configure=None):
+        self.path = path
+        self._configure = configure
+
+        self._local = threading.local()
+        self._readers = {}
+        self._readers_lock = threading.Lock()
+
+        self._writer = None
+        self._write_lock = threading.Lock()
+        self._closed = False
+
+        self.readers_opened = 0
+        self.writes = 0
+        self.contended = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.hold_total = 0.0
+
+    # ============================================================
+    #                    CONNECTIONS
+    # ============================================================
+    def connect(self, **kwargs):
+        """Open a configured connection that the caller owns."""
+        conn = sqlite3.connect(self.path, check_same_thread=False, **kwargs)
+        conn.row_factory = sqlite3.Row
+        if self._configure:
+            self._configure(conn)
+        return conn
+
+    def reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+
+        conn = self.connect()
+        self._local.conn = conn
+        with self._readers_lock:
+            self._prune_readers()
+            self._readers[threading.current_thread()] = conn
+            self.readers_opened += 1
+        return conn
+
+    @contextmanager
+    def writer(self):
+        start = time.perf_counter()
+        if not self._write_lock.acquire(blocking=False):
+            self._write_lock.acquire()
+            self.contended += 1
+        acquired = time.perf_counter()
+
+        waited = acquired - start
+        self.writes += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+
+        try:
+            if self._closed:
+                raise RuntimeError("Connection pool is closed")
+            if self._writer is None:
+                self._writer = self.connect(isolation_level=None)
+
+            conn = self._writer
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                # executescript() may already have committed
+                if conn.in_transaction:
+                    conn.execute("COMMIT")
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+        finally:
+            self.hold_total += time.perf_counter() - acquired
+            self._write_lock.release()
+
+    @contextmanager
+    def exclusive(self):
+        """
+        The writer connection with the write lock held but no transaction
+        open, for statements that can't run inside one (VACUUM, checkpoints).
+        """
+        with self._write_lock:
+            if self._closed:
+                raise RuntimeError("Connection pool is closed")
+            if self._writer is None:
+                self._writer = self.connect(isolation_level=None)
+            yield self._writer
+
+    def optimize(self, vacuum_free_ratio=0.2):
+        """
+        Refresh planner statistics, VACUUM when at least `vacuum_free_ratio`
+        of the pages are free, and truncate the WAL. Meant for idle time:
+        writers wait for the whole run. Returns what was done.
+        """
+        done = {}
+        with self.exclusive() as conn:
+            started = time.perf_counter()
+            # Bounded ANALYZE: samples each index instead of reading all of it
+            conn.execute("PRAGMA analysis_limit = 1000")
+            conn.execute("ANALYZE")
+            done["analyze_ms"] = round((time.perf_counter() - started) * 1000, 3)
+
+            pages = conn.execute("PRAGMA page_count").fetchone()[0]
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if pages and free / pages >= vacuum_free_ratio:
+                started = time.perf_counter()
+                conn.execute("VACUUM")
+                done["vacuum_ms"] = round((time.perf_counter() - started) * 1000, 3)
+                done["pages_freed"] = free
+
+            busy, wal_pages, _ = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+            done["checkpoint"] = "busy" if busy else f"{wal_pages} pages"
+        return done
+
+    def close(self):
+        with self._write_lock:
+            self._closed = True
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        with self._readers_lock:
+            for conn in self._readers.values():
+                conn.close()
+            self._readers.clear()
+
+    # ============================================================
+    #                    METRICS
+    # ============================================================
+    def stats(self):
+        with self._readers_lock:
+            readers_open = len(self._readers)
+        return {
+            "readers_open": readers_open,
+            "readers_opened": self.readers_opened,
+            "writes": self.writes,
+            "writes_contended": self.contended,
+            "contention_rate": round(self.contended / self.writes, 4) if self.writes else 0.0,
+            "write_wait_ms_total": round(self.wait_total * 1000, 3),
+            "write_wait_ms_max": round(self.wait_max * 1000, 3),
+            "write_hold_ms_total": round(self.hold_total * 1000, 3)
+        }
+
+    def _prune_readers(self):
+        for thread in [t for t in self._readers if not t.is_alive()]:
+            self._readers.pop(thread).close()
@@ -0,0 +1,277 @@
+"""
+Versioned schema migrations, tracked with PRAGMA user_version.
+
+Each database keeps an ordered list of (version, description, steps).
+A step is a SQL statement or a callable taking the connection. Every
+pending migration runs in its own writer transaction together with its
+user_version bump, so a failed migration leaves the previous version
+intact and is retried on the next start.
+
+Append new migrations to the end of a list; never edit or renumber one
+that has shipped.
+"""
+
+SYSTEM_MIGRATIONS = [
+    (1, "Index hot chat, message and log queries", [
+        "CREATE INDEX IF NOT EXISTS idx_messages_chat_created ON messages(chat_id, created_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_chats_created ON chats(created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_logs_level_created ON logs(level, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_logs_created ON logs(created_at)",
+    ]),
+    (2, "Full-text search over messages and notes", [
+        # External-content tables: the text lives once, in messages/notes
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+            content,
+            content='messages', content_rowid='id',
+            tokenize='porter unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+            INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages BEGIN
+            INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+            INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+        END
+        """,
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+            title, content,
+            content='notes', content_rowid='id',
+            tokenize='porter unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS notes_fts_insert AFTER INSERT ON notes BEGIN
+            INSERT INTO notes_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS notes_fts_delete AFTER DELETE ON notes BEGIN
+            INSERT INTO notes_fts(notes_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS notes_fts_update AFTER UPDATE OF title, content ON notes BEGIN
+            INSERT INTO notes_fts(notes_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+            INSERT INTO notes_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+        END
+        """,
+        # Index whatever was written before this migration
+        "INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')",
+        "INSERT INTO notes_fts(notes_fts) VALUES ('rebuild')",
+    ]),
+    (3, "Rolling chat summaries", [
+        # Level 0 folds in new messages; higher levels hold older, condensed history
+        """
+        CREATE TABLE IF NOT EXISTS chat_summaries (
+            chat_id INTEGER NOT NULL,
+            level INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            through_id INTEGER NOT NULL,
+            tokens INTEGER NOT NULL DEFAULT 0,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (chat_id, level),
+            FOREIGN KEY(chat_id) REFERENCES chats(id) ON DELETE CASCADE
+        )
+        """,
+    ]),
+]
+
+USER_MIGRATIONS = [
+    (1, "Index conversation messages", [
+        "CREATE INDEX IF NOT EXISTS idx_messages_conversation_created ON messages(conversation_id, created_at, id)",
+    ]),
+    (2, "Lexical index over document chunks", [
+        # No stemming: exact identifiers and filenames are what dense search misses
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+            content,
+            content='document_chunks', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS chunks_fts_insert AFTER INSERT ON document_chunks BEGIN
+            INSERT INTO chunks_fts(rowid, content) VALUES (new.id, new.content);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS chunks_fts_delete AFTER DELETE ON document_chunks BEGIN
+            INSERT INTO chunks_fts(chunks_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS chunks_fts_update AFTER UPDATE OF content ON document_chunks BEGIN
+            INSERT INTO chunks_fts(chunks_fts, rowid, content) VALUES ('delete', old.id, old.content);
+            INSERT INTO chunks_fts(rowid, content) VALUES (new.id, new.content);
+        END
+        """,
+        "INSERT INTO chunks_fts(chunks_fts) VALUES ('rebuild')",
+    ]),
+    (3, "Per-row embedding storage format", [
+        # Existing rows are raw float32; see vector_codec for the others
+        "ALTER TABLE memory ADD COLUMN embedding_format TEXT NOT NULL DEFAULT 'float32'",
+        "ALTER TABLE document_chunks ADD COLUMN embedding_format TEXT NOT NULL DEFAULT 'float32'",
+    ]),
+    (4, "Memory decay bookkeeping and archive", [
+        # When decay was last applied, so each run only decays the time since
+        "ALTER TABLE memory ADD COLUMN decayed_at TIMESTAMP",
+        """
+        CREATE TABLE IF NOT EXISTS memory_archive (
+            id INTEGER PRIMARY KEY,
+            type TEXT,
+            category TEXT,
+            content TEXT NOT NULL,
+            embedding BLOB,
+            embedding_format TEXT,
+            source TEXT,
+            importance INTEGER,
+            confidence REAL,
+            decay_score REAL,
+            created_at TIMESTAMP,
+            last_accessed TIMESTAMP,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_memory_type ON memory(type)",
+    ]),
+    (5, "Memory consolidation links", [
+        # Archived duplicates remember the memory they were folded into
+        "ALTER TABLE memory_archive ADD COLUMN merged_into INTEGER",
+        """
+        DELETE FROM memory_links WHERE id NOT IN (
+            SELECT MIN(id) FROM memory_links
+            GROUP BY memory_id_a, memory_id_b, relationship
+        )
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_memory_links_pair ON memory_links(memory_id_a, memory_id_b, relationship)",
+        "CREATE INDEX IF NOT EXISTS idx_memory_links_b ON memory_links(memory_id_b)",
+    ]),
+    (6, "Semantic response cache", [
+        # Times are epoch seconds; context_key hashes what the answer depended on
+        """
+        CREATE TABLE IF NOT EXISTS response_cache (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            context_key TEXT NOT NULL,
+            flow TEXT,
+            prompt TEXT NOT NULL,
+            embedding BLOB NOT NULL,
+            embedding_format TEXT NOT NULL DEFAULT 'float32',
+            response TEXT NOT NULL,
+            bytes INTEGER NOT NULL DEFAULT 0,
+            hits INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            last_used REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_response_cache_context ON response_cache(context_key, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_response_cache_used ON response_cache(last_used)",
+    ]),
+]
+
+FILE_MIGRATIONS = [
+    (1, "File name index", [
+        # One row per directory, so an unchanged directory is skipped on rescans
+        """
+        CREATE TABLE IF NOT EXISTS dirs (
+            id INTEGER PRIMARY KEY,
+            path TEXT NOT NULL UNIQUE,
+            parent_id INTEGER,
+            mtime_ns INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS files (
+            id INTEGER PRIMARY KEY,
+            dir_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            path TEXT NOT NULL UNIQUE,
+            size INTEGER NOT NULL DEFAULT 0,
+            mtime_ns INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_dirs_parent ON dirs(parent_id)",
+        "CREATE INDEX IF NOT EXISTS idx_files_dir ON files(dir_id)",
+        "CREATE INDEX IF NOT EXISTS idx_files_name ON files(name COLLATE NOCASE)",
+        # Trigrams: any substring of 3+ characters is an index lookup
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5(
+            name,
+            content='files', content_rowid='id',
+            tokenize='trigram'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS files_fts_insert AFTER INSERT ON files BEGIN
+            INSERT INTO files_fts(rowid, name) VALUES (new.id, new.name);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS files_fts_delete AFTER DELETE ON files BEGIN
+            INSERT INTO files_fts(files_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        END
+        """,
+    ]),
+    (2, "File content index", [
+        # The mtime the stored text was read at; NULL until the file has been looked at
+        "ALTER TABLE files ADD COLUMN content_mtime_ns INTEGER",
+        "CREATE INDEX IF NOT EXISTS idx_files_content_pending ON files(id) WHERE content_mtime_ns IS NOT mtime_ns",
+        # Rowid is files.id
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS file_contents USING fts5(
+            body,
+            tokenize='porter unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS file_contents_delete AFTER DELETE ON files BEGIN
+            DELETE FROM file_contents WHERE rowid = old.id;
+        END
+        """,
+    ]),
+    (3, "Scan scope", [
+        # The settings the index was built with; widening them forces directories to be re-listed
+        "CREATE TABLE IF NOT EXISTS scan_state (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+    ]),
+]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(pool, migrations, name="database"):
+    """Apply every migration newer than the stored user_version; returns the final version."""
+    current = schema_version(pool.reader())
+
+    for version, description, steps in migrations:
+        if version <= current:
+            continue
+
+        with pool.writer() as conn:
+            # Another process may have migrated while we waited for the lock
+            if schema_version(conn) >= version:
+                current = version
+                continue
+
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+
+        print(f"🗂️  {name} schema v{version}: {description}")
+        current = version
+
+    return current
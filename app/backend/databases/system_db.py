@@ -2,44 +2,102 @@ import os
 import sqlite3
 import shutil
 from datetime import datetime
+from backend.databases.backup import BackupManager
+from backend.databases.connection_pool import ConnectionPool
+from backend.databases.migrations import SYSTEM_MIGRATIONS, migrate
+from backend.databases.write_behind import WriteBehindQueue
 
 # APP_DIR = os.path.expanduser("~/.local/share/omnimanager")
 
 
 class SystemDatabase:
-    def __init__(self, db_path=None):
+    def __init__(self, db_path=None, flush_interval=0.05):
         db_path = db_path or os.path.expanduser("~/.local/share/omnimanager/system.db")
         self.APP_DIR = os.path.dirname(db_path)
         self.SYSTEM_DB_PATH = db_path
-        self.BACKUP_DB_PATH = os.path.join(self.APP_DIR, "system_backup.db")
+        self.BACKUP_DB_PATH = os.path.join(self.APP_DIR, "system_backup.db") # Pre-generations backup
+        self.BACKUP_DIR = os.path.join(self.APP_DIR, "backups")
+        self.CLEAN_SHUTDOWN_PATH = self.SYSTEM_DB_PATH + ".clean"
 
         os.makedirs(self.APP_DIR, exist_ok=True)
 
+        # One reader connection per thread; all writes go through one
+        # writer thread and are group-committed on the pool's writer
+        # (connections open lazily, after the integrity check)
+        self.pool = ConnectionPool(self.SYSTEM_DB_PATH, self._configure)
+        self.backups = BackupManager(self.pool, self.BACKUP_DIR, "system")
+        # None until a full integrity_check has run this session
+        self.integrity_ok = None
+
         self._ensure_integrity()
+        self.initialize()
 
-        self.conn = sqlite3.connect(
-            self.SYSTEM_DB_PATH,
-            check_same_thread=False
-        )
-        self.conn.row_factory = sqlite3.Row
-        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.writer = WriteBehindQueue(self.pool, flush_interval=flush_interval)
 
-        self.initialize()
-        self._create_backup()
+    # =========================
+    # CONFIGURATION
+    # =========================
+
+    def _configure(self, conn):
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA busy_timeout = 5000")
+
+    def _write(self, sql, params=(), wait=False):
+        return self.writer.submit(lambda conn: conn.execute(sql, params), wait=wait)
+
+    def _read(self):
+        # Reads see every write queued before them
+        self.writer.sync()
+        return self.pool.reader().cursor()
+
+    def flush(self):
+        """Durability barrier: block until every queued write is committed."""
+        self.writer.flush()
+
+    def write_stats(self):
+        return self.writer.stats()
+
+    def pool_stats(self):
+        return self.pool.stats()
+
+    def optimize(self, vacuum_free_ratio=0.2):
+        """Idle-time upkeep: planner stats, VACUUM when fragmented, WAL truncate."""
+        self.writer.flush()
+        return self.pool.optimize(vacuum_free_ratio)
+
+    def close(self):
+        self.writer.close()
+        self.pool.close()
+        # Lets the next start skip quick_check; never vouch for a failed check
+        if self.integrity_ok is not False:
+            open(self.CLEAN_SHUTDOWN_PATH, "w").close()
 
     # =========================
     # INTEGRITY + ROLLBACK
     # =========================
 
     def _ensure_integrity(self):
+        """
+        Constant-cost startup check. After a clean shutdown only the header
+        and schema are read; otherwise PRAGMA quick_check runs. The full
+        integrity_check is left to the maintenance scheduler.
+        """
         if not os.path.exists(self.SYSTEM_DB_PATH):
             return
 
+        clean = os.path.exists(self.CLEAN_SHUTDOWN_PATH)
+        if clean:
+            os.remove(self.CLEAN_SHUTDOWN_PATH)
+
         try:
             conn = sqlite3.connect(self.SYSTEM_DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute("PRAGMA integrity_check;")
-            result = cursor.fetchone()[0]
+            if clean:
+                conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+                result = "ok"
+            else:
+                result = conn.execute("PRAGMA quick_check").fetchone()[0]
             conn.close()
 
             if result != "ok":
@@ -48,95 +106,134 @@ class SystemDatabase:
         except Exception:
             print("⚠️ Database corrupted. Attempting rollback...")
 
-            if os.path.exists(self.BACKUP_DB_PATH):
+            # Keep the damaged file; a stale WAL would be replayed on top of the restored one
+            corrupted_name = self.SYSTEM_DB_PATH + ".corrupt_" + datetime.now().strftime("%Y%m%d%H%M%S")
+            shutil.move(self.SYSTEM_DB_PATH, corrupted_name)
+            for suffix in ("-wal", "-shm"):
+                if os.path.exists(self.SYSTEM_DB_PATH + suffix):
+                    os.remove(self.SYSTEM_DB_PATH + suffix)
+
+            restored = self.backups.restore(self.SYSTEM_DB_PATH)
+            if restored:
+                print(f"✅ Restored from backup {os.path.basename(restored)}.")
+            elif os.path.exists(self.BACKUP_DB_PATH):
                 shutil.copy(self.BACKUP_DB_PATH, self.SYSTEM_DB_PATH)
                 print("✅ Restored from backup.")
             else:
-                corrupted_name = self.SYSTEM_DB_PATH + ".corrupt_" + datetime.now().strftime("%Y%m%d%H%M%S")
-                shutil.move(self.SYSTEM_DB_PATH, corrupted_name)
                 print("⚠️ No backup found. Created new DB.")
 
-    def _create_backup(self):
-        if os.path.exists(self.SYSTEM_DB_PATH):
-            shutil.copy(self.SYSTEM_DB_PATH, self.BACKUP_DB_PATH)
+    def integrity_check(self):
+        """Full PRAGMA integrity_check on its own connection; True when ok."""
+        conn = self.pool.connect()
+        try:
+            result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        finally:
+            conn.close()
+
+        self.integrity_ok = result == "ok"
+        self.set_settings("last_integrity_check", datetime.now().isoformat())
+        if not self.integrity_ok:
+            print(f"⚠️ system.db failed integrity_check ({result}); backups paused, will restore on next start")
+        return self.integrity_ok
+
+    def integrity_age(self):
+        """Seconds since the last full integrity_check, or None if never."""
+        last = self.get_setting("last_integrity_check")
+        if not last:
+            return None
+        return max(0.0, (datetime.now() - datetime.fromisoformat(last)).total_seconds())
+
+    def backup(self, pages_per_step=256, keep_last=3, keep_daily=7, keep_weekly=4):
+        """One online backup generation; skipped after a failed integrity_check."""
+        if self.integrity_ok is False:
+            return None
+
+        self.backups.keep_last = keep_last
+        self.backups.keep_daily = keep_daily
+        self.backups.keep_weekly = keep_weekly
+
+        # Back up what has been queued so far, not just what happened to be committed
+        self.writer.flush()
+        return self.backups.run(pages_per_step)
 
     # =========================
     # INITIALIZATION
     # =========================
 
     def initialize(self):
-        cursor = self.conn.cursor()
-
-        cursor.executescript("""
-            CREATE TABLE IF NOT EXISTS chats (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                has_title INTEFER DEFAULT 0,
-                pinned INTEGER DEFAULT 0
-            );
-
-            CREATE TABLE IF NOT EXISTS messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                chat_id INTEGER NOT NULL,
-                role TEXT NOT NULL,
-                content TEXT NOT NULL,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY(chat_id) REFERENCES chats(id) ON DELETE CASCADE
-            );
-
-            CREATE TABLE IF NOT EXISTS notes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                content TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_at DATETIME
-            );
-
-            CREATE TABLE IF NOT EXISTS logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                level TEXT,
-                message TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            );
-
-            CREATE TABLE IF NOT EXISTS settings (
-                key TEXT PRIMARY KEY,
-                value TEXT
-            );
-        """)
-
-        self.conn.commit()
+        with self.pool.writer() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS chats (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    title TEXT NOT NULL,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    has_title INTEFER DEFAULT 0,
+                    pinned INTEGER DEFAULT 0
+                );
+
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    chat_id INTEGER NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY(chat_id) REFERENCES chats(id) ON DELETE CASCADE
+                );
+
+                CREATE TABLE IF NOT EXISTS notes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    title TEXT NOT NULL,
+                    content TEXT,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    updated_at DATETIME
+                );
+
+                CREATE TABLE IF NOT EXISTS logs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    level TEXT,
+                    message TEXT,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                );
+
+                CREATE TABLE IF NOT EXISTS settings (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+            """)
+
+        self.schema_version = migrate(self.pool, SYSTEM_MIGRATIONS, "system.db")
 
     # =========================
     # CHAT METHODS
     # =========================
 
     def get_chats(self):
-        cursor = self.conn.cursor()
+        cursor = self._read()
         cursor.execute("SELECT * FROM chats ORDER BY created_at DESC")
         rows = cursor.fetchall()
         results = [dict(r) for r in rows]
         return results
     
     def get_chat_by_id(self, id):
-        cursor = self.conn.cursor()
+        cursor = self._read()
         cursor.execute("SELECT * FROM chats WHERE id=?", (id,))
         chat = cursor.fetchone()
         return dict(chat) if chat else None
 
     def create_chat(self, title):
-        cursor = self.conn.cursor()
-        cursor.execute(
-            "INSERT INTO chats (title) VALUES (?)",
-            (title,)
-        )
-        self.conn.commit()
-        return cursor.lastrowid
+        return self.insert_chat(title)["id"]
+
+    def insert_chat(self, title):
+        def write(conn):
+            cursor = conn.execute(
+                "INSERT INTO chats (title) VALUES (?) RETURNING *",
+                (title,)
+            )
+            return dict(cursor.fetchone())
+        return self.writer.submit(write, wait=True)
     
     def edit_chat_title(self, title, id, has_title=False):
-        cursor = self.conn.cursor()
-        cursor.execute (
+        self._write(
             """
                 UPDATE chats
                 SET title=?
@@ -144,70 +241,129 @@ class SystemDatabase:
             """, (title, id,)
         )
         if has_title:
-            cursor.execute (
+            self._write(
                 """
                     UPDATE chats
-                    SET has_title
+                    SET has_title=?
                     WHERE id=?
                 """, (True, id,)
             )
-        self.conn.commit()
 
     def delete_chat(self, chat_id):
-        cursor = self.conn.cursor()
-        cursor.execute("DELETE FROM chats WHERE id=?", (chat_id,))
-        self.conn.commit()
+        self._write("DELETE FROM chats WHERE id=?", (chat_id,))
 
     # =========================
     # MESSAGE METHODS
     # =========================
 
     def get_message_by_id(self, id):
-        cursor = self.conn.cursor()
+        cursor = self._read()
         cursor.execute("SELECT * FROM messages WHERE id=?", (id,))
         message = cursor.fetchone()
         return dict(message) if message else None
 
     def get_messages_by_chat(self, chat_id):
-        cursor = self.conn.cursor()
+        cursor = self._read()
         cursor.execute(
-            "SELECT * FROM messages WHERE chat_id=? ORDER BY created_at ASC",
+            "SELECT * FROM messages WHERE chat_id=? ORDER BY created_at ASC, id ASC",
             (chat_id,)
         )
         rows = cursor.fetchall()
         results = [dict(r) for r in rows]
         return results
 
+    def get_messages_page(self, chat_id, before_id=None, limit=50):
+        """
+        Keyset page of a chat: up to `limit` messages older than `before_id`
+        (the newest ones when None), returned oldest first.
+        """
+        cursor = self._read()
+        if before_id is None:
+            cursor.execute(
+                """
+                SELECT * FROM messages
+                WHERE chat_id=?
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+                """,
+                (chat_id, limit)
+            )
+        else:
+            cursor.execute(
+                """
+                SELECT * FROM messages
+                WHERE chat_id=?
+                  AND (created_at, id) < (SELECT created_at, id FROM messages WHERE id=?)
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+                """,
+                (chat_id, before_id, limit)
+            )
+        rows = cursor.fetchall()
+        return [dict(r) for r in reversed(rows)]
+
+    def get_messages_after(self, chat_id, after_id):
+        cursor = self._read()
+        cursor.execute(
+            "SELECT * FROM messages WHERE chat_id=? AND id>? ORDER BY created_at ASC, id ASC",
+            (chat_id, after_id)
+        )
+        return [dict(r) for r in cursor.fetchall()]
+
     def create_message(self, chat_id, role, content):
-        cursor = self.conn.cursor()
+        return self.insert_message(chat_id, role, content)["id"]
+
+    def insert_message(self, chat_id, role, content):
+        """Insert a message and return the stored row in the same round-trip."""
+        def write(conn):
+            cursor = conn.execute(
+                "INSERT INTO messages (chat_id, role, content) VALUES (?, ?, ?) RETURNING *",
+                (chat_id, role, content)
+            )
+            return dict(cursor.fetchone())
+        return self.writer.submit(write, wait=True)
+
+    # =========================
+    # SUMMARY METHODS
+    # =========================
+
+    def get_chat_summaries(self, chat_id):
+        """Every summary level of a chat, highest (oldest history) first."""
+        cursor = self._read()
         cursor.execute(
-            "INSERT INTO messages (chat_id, role, content) VALUES (?, ?, ?)",
-            (chat_id, role, content)
+            "SELECT level, content, through_id, tokens FROM chat_summaries WHERE chat_id=? ORDER BY level DESC",
+            (chat_id,)
         )
-        self.conn.commit()
-        return cursor.lastrowid
+        return [dict(r) for r in cursor.fetchall()]
+
+    def set_chat_summaries(self, chat_id, summaries):
+        """Replace a chat's summary levels with `summaries` in one transaction."""
+        def write(conn):
+            conn.execute("DELETE FROM chat_summaries WHERE chat_id=?", (chat_id,))
+            conn.executemany(
+                "INSERT INTO chat_summaries (chat_id, level, content, through_id, tokens) VALUES (?, ?, ?, ?, ?)",
+                [(chat_id, s["level"], s["content"], s["through_id"], s["tokens"]) for s in summaries]
+            )
+        self.writer.submit(write, wait=True)
 
     # =========================
     # NOTES METHODS
     # =========================
 
     def get_all_notes(self):
-        cursor = self.conn.cursor()
+        cursor = self._read()
         cursor.execute("SELECT * FROM notes ORDER BY updated_at DESC")
         rows = cursor.fetchall()
         return [dict(r) for r in rows]
 
     def create_note(self, title, content=""):
-        cursor = self.conn.cursor()
-        cursor.execute(
+        self._write(
             "INSERT INTO notes (title, content) VALUES (?, ?)",
             (title, content)
         )
-        self.conn.commit()
 
     def update_note(self, note_id, title, content):
-        cursor = self.conn.cursor()
-        cursor.execute(
+        self._write(
             """
             UPDATE notes
             SET title=?, content=?, updated_at=CURRENT_TIMESTAMP
@@ -215,27 +371,86 @@ class SystemDatabase:
             """,
             (title, content, note_id)
         )
-        self.conn.commit()
 
     def delete_note(self, note_id):
-        cursor = self.conn.cursor()
-        cursor.execute("DELETE FROM notes WHERE id=?", (note_id,))
-        self.conn.commit()
+        self._write("DELETE FROM notes WHERE id=?", (note_id,))
+
+    # =========================
+    # SEARCH
+    # =========================
+
+    def search_history(self, query, limit=20, kinds=("message", "note")):
+        """
+        Ranked full-text search over chat messages and notes.
+
+        Each hit carries a snippet with matches wrapped in ** and its bm25
+        score (lower is better); messages and notes are merged on score.
+        """
+        match = self._fts_query(query)
+        if not match:
+            return []
+
+        cursor = self._read()
+        results = []
+
+        if "message" in kinds:
+            cursor.execute(
+                """
+                SELECT m.id, m.chat_id, m.role, m.created_at, c.title AS chat_title,
+                       snippet(messages_fts, 0, '**', '**', '…', 16) AS snippet,
+                       bm25(messages_fts) AS score
+                FROM messages_fts
+                JOIN messages m ON m.id = messages_fts.rowid
+                JOIN chats c ON c.id = m.chat_id
+                WHERE messages_fts MATCH ?
+                ORDER BY score
+                LIMIT ?
+                """,
+                (match, limit)
+            )
+            results += [{"type": "message", **dict(r)} for r in cursor.fetchall()]
+
+        if "note" in kinds:
+            cursor.execute(
+                """
+                SELECT n.id, n.title, n.created_at, n.updated_at,
+                       snippet(notes_fts, -1, '**', '**', '…', 16) AS snippet,
+                       bm25(notes_fts, 2.0, 1.0) AS score
+                FROM notes_fts
+                JOIN notes n ON n.id = notes_fts.rowid
+                WHERE notes_fts MATCH ?
+                ORDER BY score
+                LIMIT ?
+                """,
+                (match, limit)
+            )
+            results += [{"type": "note", **dict(r)} for r in cursor.fetchall()]
+
+        results.sort(key=lambda r: r["score"])
+        return results[:limit]
+
+    def _fts_query(self, query):
+        # Quote every term so user text can't break FTS5 syntax; the last
+        # term is a prefix match so partially typed words still hit
+        terms = [t.replace('"', '""') for t in (query or "").split()]
+        if not terms:
+            return ""
+        quoted = [f'"{t}"' for t in terms]
+        quoted[-1] += "*"
+        return " ".join(quoted)
 
     # =========================
     # LOGGING
     # =========================
 
     def append_log(self, level, message):
-        cursor = self.conn.cursor()
-        cursor.execute(
+        self._write(
             "INSERT INTO logs (level, message) VALUES (?, ?)",
             (level, message)
         )
-        self.conn.commit()
 
     def get_logs(self, level=None):
-        cursor = self.conn.cursor()
+        cursor = self._read()
         if level:
             cursor.execute(
                 "SELECT * FROM logs WHERE level=? ORDER BY created_at DESC",
@@ -254,14 +469,13 @@ class SystemDatabase:
     # =========================
 
     def get_setting(self, key):
-        cursor = self.conn.cursor()
+        cursor = self._read()
         cursor.execute("SELECT value FROM settings WHERE key=?", (key,))
         row = cursor.fetchone()
         return row["value"] if row else None
 
     def set_settings(self, key, value):
-        cursor = self.conn.cursor()
-        cursor.execute(
+        self._write(
             """
             INSERT INTO settings (key, value)
             VALUES (?, ?)
@@ -269,4 +483,3 @@ class SystemDatabase:
             """,
             (key, value)
         )
-        self.conn.commit()
\ No newline at end of file
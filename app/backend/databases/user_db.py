@@ -1,163 +1,240 @@
 import os
-import sqlite3
+import threading
 from datetime import datetime, timedelta
 import numpy as np
+from backend.databases.connection_pool import ConnectionPool
+from backend.databases.migrations import USER_MIGRATIONS, migrate
+from backend.databases.vector_store import VectorStore
+from backend.databases import vector_codec
+
+# Tables whose embeddings are mirrored into a VectorStore
+VECTOR_TABLES = ("memory", "document_chunks")
+# Ids bound per IN (...); SQLite caps a statement's variables (999 on older builds)
+MAX_IN_IDS = 500
+
+
+def _batches(ids, size=MAX_IN_IDS):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
 
 
 class UserDatabase:
-    def __init__(self, db_path=None):
+    def __init__(self, db_path=None, embedding_format="float32", rescore=4, vector_store=True):
+        if embedding_format not in vector_codec.FORMATS:
+            raise ValueError(f"Unknown embedding format: {embedding_format}")
+        # New embeddings are written in this format; rows keep the one they were written in
+        self.embedding_format = embedding_format
+        self.rescore = rescore
+
         db_path = db_path or os.path.expanduser("~/.local/share/omnimanager/user.db")
         self.APP_DIR = os.path.dirname(db_path)
         self.USER_DB_PATH = db_path
 
         os.makedirs(self.APP_DIR, exist_ok=True)
-        self.conn = sqlite3.connect(self.USER_DB_PATH, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
+        # One reader connection per thread plus a single writer
+        self.pool = ConnectionPool(self.USER_DB_PATH, self._configure)
+
+        # Retrieval hits waiting for flush_access()
+        self._accessed = set()
+        self._accessed_lock = threading.Lock()
 
-        self._configure()
         self.initialize()
 
+        # Memory-mapped copies of the embeddings, searched instead of the BLOBs
+        self.vectors = {}
+        if vector_store:
+            vector_dir = os.path.splitext(self.USER_DB_PATH)[0] + ".vectors"
+            for table in VECTOR_TABLES:
+                self.vectors[table] = VectorStore(os.path.join(vector_dir, table), embedding_format)
+                self._sync_vectors(table)
+
     # -----------------------------
     # Database Configuration
     # -----------------------------
-    def _configure(self):
-        cursor = self.conn.cursor()
-        cursor.execute("PRAGMA foreign_keys = ON;")
-        cursor.execute("PRAGMA journal_mode = WAL;")
-        cursor.execute("PRAGMA synchronous = NORMAL;")
-        self.conn.commit()
+    def _configure(self, conn):
+        conn.execute("PRAGMA foreign_keys = ON;")
+        conn.execute("PRAGMA journal_mode = WAL;")
+        conn.execute("PRAGMA synchronous = NORMAL;")
+        conn.execute("PRAGMA busy_timeout = 5000;")
+        # Not every SQLite build has the math functions (pow/exp)
+        conn.create_function(
+            "decay_factor", 2,
+            lambda days, half_life: 0.5 ** (max(days or 0.0, 0.0) / half_life),
+            deterministic=True
+        )
+
+    def pool_stats(self):
+        return self.pool.stats()
+
+    def vector_stats(self):
+        return {table: store.stats() for table, store in self.vectors.items()}
+
+    # -----------------------------
+    # Vector Stores
+    # -----------------------------
+    def _sync_vectors(self, table, batch_size=1000):
+        """
+        Bring a VectorStore in line with its table: append rows it is
+        missing (new store, crash between the two writes) and tombstone
+        rows that were deleted. Only ids are compared, so a store that is
+        already in sync costs one index scan.
+        """
+        store = self.vectors[table]
+        cursor = self.pool.reader().cursor()
+        cursor.execute(f"SELECT id FROM {table} WHERE embedding IS NOT NULL")
+        table_ids = np.fromiter((r[0] for r in cursor.fetchall()), dtype=np.int64)
+
+        stale = np.setdiff1d(store.ids(), table_ids)
+        missing = np.setdiff1d(table_ids, store.ids())
+        store.remove(stale.tolist())
+
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size].tolist()
+            cursor.execute(
+                f"SELECT id, embedding, embedding_format FROM {table} WHERE id IN ({','.join('?' * len(batch))})",
+                batch
+            )
+            rows = cursor.fetchall()
+            store.add_many(
+                [r["id"] for r in rows],
+                [vector_codec.decode(r["embedding"], r["embedding_format"]) for r in rows]
+            )
+
+        if len(stale) or len(missing):
+            print(f"🧮 {table} vectors: +{len(missing)} -{len(stale)} ({len(store)} live)")
+
+    def compact_vectors(self):
+        """Drop tombstoned rows from every store; returns rows dropped."""
+        return sum(store.compact() for store in self.vectors.values())
 
     # -----------------------------
     # Schema Initialization
     # -----------------------------
     def initialize(self):
-        cursor = self.conn.cursor()
-
-        cursor.executescript("""
-        CREATE TABLE IF NOT EXISTS user_profile (
-            id INTEGER PRIMARY KEY CHECK (id = 1),
-            name TEXT,
-            timezone TEXT,
-            primary_language TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-
-        CREATE TABLE IF NOT EXISTS user_preferences (
-            key TEXT PRIMARY KEY,
-            value TEXT,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-
-        CREATE TABLE IF NOT EXISTS memory (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            type TEXT,
-            category TEXT,
-            content TEXT NOT NULL,
-            embedding BLOB,
-            source TEXT,
-            importance INTEGER DEFAULT 1,
-            confidence REAL DEFAULT 1.0,
-            decay_score REAL DEFAULT 1.0,
-            pinned INTEGER DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            last_accessed TIMESTAMP
-        );
-
-        CREATE TABLE IF NOT EXISTS memory_links (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            memory_id_a INTEGER,
-            memory_id_b INTEGER,
-            relationship TEXT,
-            FOREIGN KEY(memory_id_a) REFERENCES memory(id) ON DELETE CASCADE,
-            FOREIGN KEY(memory_id_b) REFERENCES memory(id) ON DELETE CASCADE
-        );
-
-        CREATE TABLE IF NOT EXISTS conversations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT,
-            summary TEXT,
-            context_tags TEXT,
-            importance INTEGER DEFAULT 1,
-            archived INTEGER DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-
-        CREATE TABLE IF NOT EXISTS messages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            conversation_id INTEGER,
-            role TEXT,
-            content TEXT,
-            tokens INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (conversation_id)
-                REFERENCES conversations(id)
-                ON DELETE CASCADE
-        );
-
-        CREATE TABLE IF NOT EXISTS tasks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            description TEXT,
-            status TEXT DEFAULT 'pending',
-            priority INTEGER DEFAULT 1,
-            due_date TIMESTAMP,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-
-        CREATE TABLE IF NOT EXISTS knowledge_snapshots (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            topic TEXT,
-            summary TEXT,
-            source TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-
-        CREATE TABLE IF NOT EXISTS ai_state (
-            key TEXT PRIMARY KEY,
-            value TEXT,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
+        with self.pool.writer() as conn:
+            conn.executescript("""
+            CREATE TABLE IF NOT EXISTS user_profile (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                name TEXT,
+                timezone TEXT,
+                primary_language TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+
+            CREATE TABLE IF NOT EXISTS user_preferences (
+                key TEXT PRIMARY KEY,
+                value TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+
+            CREATE TABLE IF NOT EXISTS memory (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                type TEXT,
+                category TEXT,
+                content TEXT NOT NULL,
+                embedding BLOB,
+                source TEXT,
+                importance INTEGER DEFAULT 1,
+                confidence REAL DEFAULT 1.0,
+                decay_score REAL DEFAULT 1.0,
+                pinned INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_accessed TIMESTAMP
+            );
+
+            CREATE TABLE IF NOT EXISTS memory_links (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                memory_id_a INTEGER,
+                memory_id_b INTEGER,
+                relationship TEXT,
+                FOREIGN KEY(memory_id_a) REFERENCES memory(id) ON DELETE CASCADE,
+                FOREIGN KEY(memory_id_b) REFERENCES memory(id) ON DELETE CASCADE
+            );
+
+            CREATE TABLE IF NOT EXISTS conversations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT,
+                summary TEXT,
+                context_tags TEXT,
+                importance INTEGER DEFAULT 1,
+                archived INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                conversation_id INTEGER,
+                role TEXT,
+                content TEXT,
+                tokens INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (conversation_id)
+                    REFERENCES conversations(id)
+                    ON DELETE CASCADE
+            );
+
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                description TEXT,
+                status TEXT DEFAULT 'pending',
+                priority INTEGER DEFAULT 1,
+                due_date TIMESTAMP,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+
+            CREATE TABLE IF NOT EXISTS knowledge_snapshots (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                topic TEXT,
+                summary TEXT,
+                source TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+
+            CREATE TABLE IF NOT EXISTS ai_state (
+                key TEXT PRIMARY KEY,
+                value TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
                              
-        CREATE TABLE IF NOT EXISTS documents (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT,
-            source TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-
-        CREATE TABLE IF NOT EXISTS document_chunks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            document_id INTEGER,
-            content TEXT NOT NULL,
-            embedding BLOB NOT NULL,
-            chunk_index INTEGER,
-            FOREIGN KEY(document_id)
-                REFERENCES documents(id)
-                ON DELETE CASCADE
-        );
-        """)
-
-        self.conn.commit()
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT,
+                source TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+
+            CREATE TABLE IF NOT EXISTS document_chunks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                document_id INTEGER,
+                content TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                chunk_index INTEGER,
+                FOREIGN KEY(document_id)
+                    REFERENCES documents(id)
+                    ON DELETE CASCADE
+            );
+            """)
+
+        self.schema_version = migrate(self.pool, USER_MIGRATIONS, "user.db")
 
     # -------------------------------------------------
     # USER PROFILE
     # -------------------------------------------------
     def set_user_profile(self, name, timezone, language):
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                INSERT OR REPLACE INTO user_profile
-                (id, name, timezone, primary_language)
-                VALUES (1, ?, ?, ?)
-            """, (name, timezone, language))
-            self.conn.commit()
+            with self.pool.writer() as conn:
+                conn.execute("""
+                    INSERT OR REPLACE INTO user_profile
+                    (id, name, timezone, primary_language)
+                    VALUES (1, ?, ?, ?)
+                """, (name, timezone, language))
             return {"success": True}
         except Exception as e:
-            self.conn.rollback()
             return {"success": False, "error": str(e)}
 
     def get_user_profile(self):
-        cursor = self.conn.cursor()
+        cursor = self.pool.reader().cursor()
         cursor.execute("SELECT * FROM user_profile WHERE id=1")
         row = cursor.fetchone()
         return dict(row) if row else None
@@ -169,42 +246,47 @@ class UserDatabase:
                    source="ai", importance=1, confidence=1.0):
 
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                INSERT INTO memory
-                (type, category, content, source, importance, confidence)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (type_, category, content, source,
-                  importance, confidence))
-            self.conn.commit()
+            with self.pool.writer() as conn:
+                conn.execute("""
+                    INSERT INTO memory
+                    (type, category, content, source, importance, confidence)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (type_, category, content, source,
+                      importance, confidence))
             return {"success": True}
         except Exception as e:
-            self.conn.rollback()
             return {"success": False, "error": str(e)}
         
     def add_memory_with_embedding(self, type_, category, content, embedding, source="ai", importance=1, confidence=1.0):
         try:
-            cursor = self.conn.cursor()
-            embedding_blob = embedding.astype(np.float32).tobytes()
-
-            cursor.execute("""
-                INSERT INTO memory
-                (type, category, content, embedding, source,
-                importance, confidence)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (type_, category, content, embedding_blob,
-            source, importance, confidence))
-
-            self.conn.commit()
-            return {"success", True}
+            embedding_blob = vector_codec.encode(embedding, self.embedding_format)
+
+            with self.pool.writer() as conn:
+                cursor = conn.execute("""
+                    INSERT INTO memory
+                    (type, category, content, embedding, embedding_format,
+                    source, importance, confidence)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, (type_, category, content, embedding_blob, self.embedding_format,
+                source, importance, confidence))
+
+            if "memory" in self.vectors:
+                self.vectors["memory"].add(cursor.lastrowid, embedding)
+
+            return {"success": True}
         except Exception as e:
-            self.conn.rollback()
             return{"success": False, "error": str(e)}
         
     def search_memory_by_embedding(self, query_embedding, limit=5, type_filter=None):
-        cursor = self.conn.cursor()
-        query = """
-            SELECT id, content, embedding, importance, decay_score
+        """
+        Memories ranked by similarity * importance * decay_score.
+        Only the embeddings are scanned; content is read for the winners.
+        """
+        cursor = self.pool.reader().cursor()
+        store = self.vectors.get("memory")
+        columns = "id, importance, decay_score" if store is not None else "id, embedding, embedding_format, importance, decay_score"
+        query = f"""
+            SELECT {columns}
             FROM memory
             WHERE embedding IS NOT NULL
         """
@@ -215,27 +297,36 @@ class UserDatabase:
 
         cursor.execute(query, params)
         rows = cursor.fetchall()
-        results = []
-
-        for r in rows:
-            stored_embedding = np.frombuffer(
-                r["embedding"],
-                dtype=np.float32
+        weights = {r["id"]: r["importance"] * r["decay_score"] for r in rows}
+
+        if store is not None:
+            ranked = store.search(query_embedding, limit, rescore=self.rescore, weights=weights)
+        else:
+            ranked = vector_codec.search(
+                query_embedding,
+                [(r["id"], r["embedding"], r["embedding_format"]) for r in rows],
+                limit,
+                rescore=self.rescore,
+                weights=weights
             )
-            similarity = np.dot(query_embedding, stored_embedding)
-            score = similarity * r["importance"] * r["decay_score"]
+        if not ranked:
+            return []
 
-            results.append({
-                "id": r["id"],
-                "content": r["content"],
-                "score": score
-            })
+        ids = [memory_id for memory_id, _, _ in ranked]
+        cursor.execute(
+            f"SELECT id, content FROM memory WHERE id IN ({','.join('?' * len(ids))})",
+            ids
+        )
+        content = {r["id"]: r["content"] for r in cursor.fetchall()}
 
-        results.sort(key=lambda x: x["score"], reverse=True)
-        return results[:limit]
+        return [
+            {"id": memory_id, "content": content[memory_id], "score": score}
+            for memory_id, _, score in ranked
+            if memory_id in content
+        ]
 
     def get_relevant_memory(self, min_importance=1, limit=20):
-        cursor = self.conn.cursor()
+        cursor = self.pool.reader().cursor()
         cursor.execute("""
             SELECT * FROM memory
             WHERE importance >= ?
@@ -246,55 +337,233 @@ class UserDatabase:
         rows = cursor.fetchall()
         return [dict(r) for r in rows]
 
-    def access_memory(self, memory_id):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            UPDATE memory
-            SET last_accessed=?, decay_score=decay_score * 1.1
-            WHERE id=?
-        """, (datetime.utcnow(), memory_id))
-        self.conn.commit()
-
-    def decay_memories(self):
+    def access_memory(self, memory_id, boost=1.1, max_score=2.0):
+        with self.pool.writer() as conn:
+            conn.execute("""
+                UPDATE memory
+                SET last_accessed=?, decay_score=MIN(decay_score * ?, ?)
+                WHERE id=?
+            """, (datetime.utcnow().isoformat(" "), boost, max_score, memory_id))
+
+    def record_access(self, memory_ids):
+        """Queue retrieval hits; flush_access() applies them in one UPDATE."""
+        with self._accessed_lock:
+            self._accessed.update(memory_ids)
+
+    def flush_access(self, boost=1.1, max_score=2.0):
+        with self._accessed_lock:
+            ids, self._accessed = list(self._accessed), set()
+        if not ids:
+            return 0
+
+        now = datetime.utcnow().isoformat(" ")
+        with self.pool.writer() as conn:
+            for batch in _batches(ids):
+                conn.execute(f"""
+                    UPDATE memory
+                    SET last_accessed=?, decay_score=MIN(decay_score * ?, ?)
+                    WHERE id IN ({','.join('?' * len(batch))})
+                """, (now, boost, max_score, *batch))
+        return len(ids)
+
+    def decay_memories(self, half_life_days=30):
         """
-        Gradually reduce decay_score over time.
-        Run periodically (e.g., on app startup).
+        Halve decay_score every `half_life_days` without access, in one
+        UPDATE. Only the time since the later of the last access and the
+        last decay is applied, so it can run as often as wanted.
         """
-        cursor = self.conn.cursor()
+        now = datetime.utcnow().isoformat(" ")
+        with self.pool.writer() as conn:
+            cursor = conn.execute("""
+                UPDATE memory
+                SET decay_score = decay_score * decay_factor(
+                        julianday(:now) - julianday(MAX(
+                            COALESCE(last_accessed, created_at),
+                            COALESCE(decayed_at, created_at)
+                        )),
+                        :half_life
+                    ),
+                    decayed_at = :now
+                WHERE pinned = 0
+            """, {"now": now, "half_life": half_life_days})
+        return cursor.rowcount
+
+    def prune_memories(self, below=0.05, archive=True):
+        """
+        Remove unpinned memories whose importance * decay_score fell below
+        `below`, copying them to memory_archive first unless `archive` is
+        False. Returns how many were removed.
+        """
+        # Archived and deleted by the same predicate, not an id list: a
+        # long-unmaintained table can have more ids than a statement binds
+        predicate = "pinned = 0 AND importance * decay_score < ?"
+        with self.pool.writer() as conn:
+            ids = [r[0] for r in conn.execute(f"SELECT id FROM memory WHERE {predicate}", (below,)).fetchall()]
+            if not ids:
+                return 0
+
+            if archive:
+                conn.execute(f"""
+                    INSERT OR REPLACE INTO memory_archive
+                    (id, type, category, content, embedding, embedding_format, source,
+                    importance, confidence, decay_score, created_at, last_accessed)
+                    SELECT id, type, category, content, embedding, embedding_format, source,
+                    importance, confidence, decay_score, created_at, last_accessed
+                    FROM memory WHERE {predicate}
+                """, (below,))
+            conn.execute(f"DELETE FROM memory WHERE {predicate}", (below,))
+
+        if "memory" in self.vectors:
+            self.vectors["memory"].remove(ids)
+        return len(ids)
+
+    def memory_vectors(self, type_, newer_than=None):
+        """
+        (rows, matrix) for every embedded memory of one type: rows are
+        dicts without the embedding, matrix holds their unit-length
+        float32 embeddings in the same order. With `newer_than`, nothing
+        is loaded unless some memory has a larger id.
+        """
+        cursor = self.pool.reader().cursor()
+        if newer_than is not None:
+            cursor.execute(
+                "SELECT 1 FROM memory WHERE type = ? AND id > ? AND embedding IS NOT NULL LIMIT 1",
+                (type_, newer_than)
+            )
+            if cursor.fetchone() is None:
+                return [], np.zeros((0, 0), dtype=np.float32)
+
         cursor.execute("""
-            UPDATE memory
-            SET decay_score = decay_score * 0.98
-            WHERE pinned = 0
-        """)
-        self.conn.commit()
+            SELECT id, content, embedding, embedding_format, importance, decay_score, pinned
+            FROM memory
+            WHERE embedding IS NOT NULL AND type = ?
+            ORDER BY id
+        """, (type_,))
+        rows, vectors = [], []
+        for r in cursor.fetchall():
+            vectors.append(vector_codec.decode(r["embedding"], r["embedding_format"]))
+            row = dict(r)
+            del row["embedding"], row["embedding_format"]
+            rows.append(row)
+        if not rows:
+            return [], np.zeros((0, 0), dtype=np.float32)
+
+        matrix = np.vstack(vectors).astype(np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return rows, matrix / np.maximum(norms, 1e-12)
+
+    def merge_memories(self, keeper_id, member_ids, content=None, embedding=None):
+        """
+        Fold `member_ids` into `keeper_id`: the keeper takes the highest
+        importance, confidence, decay_score and pinned of the group (and
+        `content`/`embedding` when given), links are moved over, and the
+        members go to memory_archive with merged_into set.
+        """
+        member_ids = [int(i) for i in member_ids if int(i) != keeper_id]
+        if not member_ids:
+            return 0
+        group = [keeper_id, *member_ids]
+        columns = ("importance", "confidence", "decay_score", "pinned", "last_accessed")
+        embedding_blob = vector_codec.encode(embedding, self.embedding_format) if embedding is not None else None
+
+        with self.pool.writer() as conn:
+            # Group maxima a batch of ids at a time, so cluster size isn't bound by SQLite's variable limit
+            best = dict.fromkeys(columns)
+            for batch in _batches(group):
+                row = conn.execute(
+                    f"SELECT {', '.join(f'MAX({c})' for c in columns)} FROM memory WHERE id IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchone()
+                for column, value in zip(columns, row):
+                    if value is not None and (best[column] is None or value > best[column]):
+                        best[column] = value
+            conn.execute(
+                f"UPDATE memory SET {', '.join(f'{c} = ?' for c in columns)} WHERE id = ?",
+                (*best.values(), keeper_id)
+            )
+            if content is not None:
+                conn.execute("UPDATE memory SET content = ? WHERE id = ?", (content, keeper_id))
+            if embedding_blob is not None:
+                conn.execute(
+                    "UPDATE memory SET embedding = ?, embedding_format = ? WHERE id = ?",
+                    (embedding_blob, self.embedding_format, keeper_id)
+                )
+
+            for batch in _batches(member_ids):
+                placeholders = ",".join("?" * len(batch))
+                # Re-point the members' links; the unique index drops repeats
+                for column in ("memory_id_a", "memory_id_b"):
+                    conn.execute(f"""
+                        UPDATE OR IGNORE memory_links SET {column} = ?
+                        WHERE {column} IN ({placeholders})
+                    """, (keeper_id, *batch))
+
+                conn.execute(f"""
+                    INSERT OR REPLACE INTO memory_archive
+                    (id, type, category, content, embedding, embedding_format, source,
+                    importance, confidence, decay_score, created_at, last_accessed, merged_into)
+                    SELECT id, type, category, content, embedding, embedding_format, source,
+                    importance, confidence, decay_score, created_at, last_accessed, ?
+                    FROM memory WHERE id IN ({placeholders})
+                """, (keeper_id, *batch))
+                conn.execute(f"DELETE FROM memory WHERE id IN ({placeholders})", batch)
+            conn.execute("DELETE FROM memory_links WHERE memory_id_a = memory_id_b")
+
+        if "memory" in self.vectors:
+            self.vectors["memory"].remove(member_ids)
+            if embedding is not None:
+                self.vectors["memory"].add(keeper_id, embedding)
+        return len(member_ids)
+
+    def link_memories(self, pairs, relationship="related"):
+        """Record (id, id) pairs once each, smaller id first; returns links added."""
+        pairs = {(min(a, b), max(a, b)) for a, b in pairs if a != b}
+        if not pairs:
+            return 0
+        with self.pool.writer() as conn:
+            before = conn.total_changes
+            conn.executemany("""
+                INSERT OR IGNORE INTO memory_links (memory_id_a, memory_id_b, relationship)
+                SELECT ?, ?, ?
+                WHERE EXISTS (SELECT 1 FROM memory WHERE id = ?)
+                AND EXISTS (SELECT 1 FROM memory WHERE id = ?)
+            """, [(a, b, relationship, a, b) for a, b in sorted(pairs)])
+            return conn.total_changes - before
+
+    def optimize(self, vacuum_free_ratio=0.2, compact_ratio=0.25):
+        """Idle-time upkeep: planner stats, VACUUM/checkpoint, vector compaction."""
+        done = self.pool.optimize(vacuum_free_ratio)
+        for table, store in self.vectors.items():
+            stats = store.stats()
+            if stats["rows"] and stats["tombstones"] / stats["rows"] >= compact_ratio:
+                done[f"{table}_vectors_compacted"] = store.compact()
+        return done
 
     # -------------------------------------------------
     # CONVERSATIONS
     # -------------------------------------------------
     def create_conversation(self, title):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT INTO conversations (title)
-            VALUES (?)
-        """, (title,))
-        self.conn.commit()
+        with self.pool.writer() as conn:
+            cursor = conn.execute("""
+                INSERT INTO conversations (title)
+                VALUES (?)
+            """, (title,))
         return cursor.lastrowid
 
     def add_message(self, conversation_id, role, content, tokens=0):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT INTO messages
-            (conversation_id, role, content, tokens)
-            VALUES (?, ?, ?, ?)
-        """, (conversation_id, role, content, tokens))
-        self.conn.commit()
+        with self.pool.writer() as conn:
+            conn.execute("""
+                INSERT INTO messages
+                (conversation_id, role, content, tokens)
+                VALUES (?, ?, ?, ?)
+            """, (conversation_id, role, content, tokens))
 
     def get_conversation_messages(self, conversation_id):
-        cursor = self.conn.cursor()
+        cursor = self.pool.reader().cursor()
         cursor.execute("""
             SELECT * FROM messages
             WHERE conversation_id=?
-            ORDER BY created_at ASC
+            ORDER BY created_at ASC, id ASC
         """, (conversation_id,))
         return [dict(r) for r in cursor.fetchall()]
 
@@ -302,16 +571,15 @@ class UserDatabase:
     # TASKS
     # -------------------------------------------------
     def create_task(self, title, description=None, priority=1, due_date=None):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT INTO tasks (title, description, priority, due_date)
-            VALUES (?, ?, ?, ?)
-        """, (title, description, priority, due_date))
-        self.conn.commit()
+        with self.pool.writer() as conn:
+            cursor = conn.execute("""
+                INSERT INTO tasks (title, description, priority, due_date)
+                VALUES (?, ?, ?, ?)
+            """, (title, description, priority, due_date))
         return cursor.lastrowid
 
     def get_active_tasks(self):
-        cursor = self.conn.cursor()
+        cursor = self.pool.reader().cursor()
         cursor.execute("""
             SELECT * FROM tasks
             WHERE status != 'completed'
@@ -320,28 +588,93 @@ class UserDatabase:
         return [dict(r) for r in cursor.fetchall()]
 
     def update_task_status(self, task_id, status):
-        cursor = self.conn.cursor()
+        with self.pool.writer() as conn:
+            conn.execute("""
+                UPDATE tasks
+                SET status=?
+                WHERE id=?
+            """, (status, task_id))
+
+    # -------------------------------------------------
+    # RESPONSE CACHE
+    # -------------------------------------------------
+    def cached_prompts(self, context_key, since):
+        """Entries for one context created after `since` (epoch seconds), without their responses."""
+        cursor = self.pool.reader().cursor()
         cursor.execute("""
-            UPDATE tasks
-            SET status=?
-            WHERE id=?
-        """, (status, task_id))
-        self.conn.commit()
+            SELECT id, prompt, embedding, embedding_format
+            FROM response_cache
+            WHERE context_key = ? AND created_at >= ?
+        """, (context_key, since))
+        return cursor.fetchall()
+
+    def cached_response(self, entry_id):
+        row = self.pool.reader().execute(
+            "SELECT response FROM response_cache WHERE id = ?", (entry_id,)
+        ).fetchone()
+        return row["response"] if row else None
+
+    def add_cached_response(self, context_key, flow, prompt, embedding, response, now):
+        embedding_blob = vector_codec.encode(embedding, self.embedding_format)
+        size = len(embedding_blob) + len(prompt.encode("utf-8")) + len(response.encode("utf-8"))
+        with self.pool.writer() as conn:
+            cursor = conn.execute("""
+                INSERT INTO response_cache
+                (context_key, flow, prompt, embedding, embedding_format, response, bytes, created_at, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (context_key, flow, prompt, embedding_blob, self.embedding_format, response, size, now, now))
+        return cursor.lastrowid
+
+    def touch_cached_response(self, entry_id, now):
+        with self.pool.writer() as conn:
+            conn.execute(
+                "UPDATE response_cache SET hits = hits + 1, last_used = ? WHERE id = ?",
+                (now, entry_id)
+            )
+
+    def evict_cached_responses(self, expired_before, max_entries, max_bytes):
+        """
+        Drop expired entries, then least recently used ones until both
+        limits hold; returns (entries, bytes) left.
+        """
+        with self.pool.writer() as conn:
+            conn.execute("DELETE FROM response_cache WHERE created_at < ?", (expired_before,))
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM response_cache"
+            ).fetchone()
+            if entries <= max_entries and size <= max_bytes:
+                return entries, size
+
+            # Oldest-used first, keeping a running total of what stays
+            drop, kept, kept_bytes = [], entries, size
+            for entry_id, entry_bytes in conn.execute(
+                "SELECT id, bytes FROM response_cache ORDER BY last_used, id"
+            ):
+                if kept <= max_entries and kept_bytes <= max_bytes:
+                    break
+                drop.append(entry_id)
+                kept -= 1
+                kept_bytes -= entry_bytes
+            conn.executemany("DELETE FROM response_cache WHERE id = ?", [(i,) for i in drop])
+            return kept, kept_bytes
+
+    def clear_cached_responses(self):
+        with self.pool.writer() as conn:
+            conn.execute("DELETE FROM response_cache")
 
     # -------------------------------------------------
     # AI STATE
     # -------------------------------------------------
     def set_state(self, key, value):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT OR REPLACE INTO ai_state
-            (key, value, updated_at)
-            VALUES (?, ?, ?)
-        """, (key, value, datetime.utcnow()))
-        self.conn.commit()
+        with self.pool.writer() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO ai_state
+                (key, value, updated_at)
+                VALUES (?, ?, ?)
+            """, (key, value, datetime.utcnow()))
 
     def get_state(self, key):
-        cursor = self.conn.cursor()
+        cursor = self.pool.reader().cursor()
         cursor.execute("""
             SELECT value FROM ai_state WHERE key=?
         """, (key,))
@@ -352,49 +685,152 @@ class UserDatabase:
     # Utility
     # -------------------------------------------------
     def close(self):
-        self.conn.close()
+        # Hits queued since the last flush would be lost with the pool
+        try:
+            self.flush_access()
+        except Exception as e:
+            print(f"⚠️  Access flush on close failed: {e}")
+        for store in self.vectors.values():
+            store.close()
+        self.pool.close()
     
     def create_document(self, title, source=None):
-        cursor = self.conn.cursor()
-        cursor.execute(
-            """
-            Insert INTO documents (title, source)
-            VALUES (?, ?)
-            """,
-            (title, source)
-        )
-        self.conn.commit()
+        with self.pool.writer() as conn:
+            cursor = conn.execute(
+                """
+                Insert INTO documents (title, source)
+                VALUES (?, ?)
+                """,
+                (title, source)
+            )
         return cursor.lastrowid
     
     def add_document_chunk(self, document_id, content, embedding, chunk_index):
-        cursor = self.conn.cursor()
+        embedding_blob = vector_codec.encode(embedding, self.embedding_format)
+
+        with self.pool.writer() as conn:
+            cursor = conn.execute(
+                """
+                INSERT INTO document_chunks
+                (document_id, content, embedding, embedding_format, chunk_index)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (document_id, content, embedding_blob, self.embedding_format, chunk_index)
+            )
 
-        embedding_blob = embedding.astype(np.float32).tobytes()
+        if "document_chunks" in self.vectors:
+            self.vectors["document_chunks"].add(cursor.lastrowid, embedding)
+    
+    def documents_version(self):
+        """Changes whenever a document chunk is added or removed."""
+        row = self.pool.reader().execute(
+            "SELECT COUNT(*), COALESCE(MAX(id), 0) FROM document_chunks"
+        ).fetchone()
+        return [row[0], row[1]]
+
+    def memories_version(self):
+        """Changes whenever a memory is added, merged or pruned (both archive into memory_archive)."""
+        row = self.pool.reader().execute("""
+            SELECT (SELECT COUNT(*) FROM memory), (SELECT COALESCE(MAX(id), 0) FROM memory),
+                   (SELECT COUNT(*) FROM memory_archive)
+        """).fetchone()
+        return [row[0], row[1], row[2]]
+
+    def get_all_chunks(self):
+        cursor = self.pool.reader().cursor()
+        cursor.execute("SELECT * FROM document_chunks")
+
+        return [self._chunk(r) for r in cursor.fetchall()]
 
+    def get_chunks(self, chunk_ids):
+        chunk_ids = list(chunk_ids)
+        if not chunk_ids:
+            return []
+
+        cursor = self.pool.reader().cursor()
         cursor.execute(
-            """
-            INSERT INTO document_chunks
-            (document_id, content, embedding, chunk_index)
-            VALUES (?, ?, ?, ?)
-            """,
-            (document_id, content, embedding_blob, chunk_index)
+            f"SELECT * FROM document_chunks WHERE id IN ({','.join('?' * len(chunk_ids))})",
+            chunk_ids
         )
+        return [self._chunk(r) for r in cursor.fetchall()]
 
-        self.conn.commit()
-    
-    def get_all_chunks(self):
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM document_chunks")
+    def _chunk(self, r):
+        return {
+            "id": r["id"],
+            "document_id": r["document_id"],
+            "content": r["content"],
+            "embedding": vector_codec.decode(r["embedding"], r["embedding_format"])
+        }
 
-        rows = cursor.fetchall()
+    def search_chunks_by_embedding(self, query_embedding, limit=50):
+        """
+        Dense ranking of document chunks; returns [(cosine, chunk)] best first.
+        Quantized rows are scored compactly and only the top
+        `limit * rescore` are dequantized and rescored.
+        """
+        store = self.vectors.get("document_chunks")
+        if store is not None:
+            ranked = store.search(query_embedding, limit, rescore=self.rescore)
+        else:
+            cursor = self.pool.reader().cursor()
+            cursor.execute("SELECT id, embedding, embedding_format FROM document_chunks")
+            ranked = vector_codec.search(
+                query_embedding,
+                [(r["id"], r["embedding"], r["embedding_format"]) for r in cursor.fetchall()],
+                limit,
+                rescore=self.rescore
+            )
+        chunks = {chunk["id"]: chunk for chunk in self.get_chunks(chunk_id for chunk_id, _, _ in ranked)}
+        return [(cosine, chunks[chunk_id]) for chunk_id, cosine, _ in ranked if chunk_id in chunks]
 
-        results = []
-        for r in rows:
-            results.append({
-                "id": r["id"],
-                "document_id": r["document_id"],
-                "content": r["content"],
-                "embedding": np.frombuffer(r["embedding"], dtype=np.float32)
-            })
+    def requantize_embeddings(self, embedding_format=None):
+        """
+        Rewrite stored embeddings in `embedding_format` (default: the
+        configured one). Quantizing is lossy: converting back to float32
+        keeps the quantized values. Returns the number of rows rewritten.
+        """
+        embedding_format = embedding_format or self.embedding_format
+        if embedding_format not in vector_codec.FORMATS:
+            raise ValueError(f"Unknown embedding format: {embedding_format}")
+
+        rewritten = 0
+        with self.pool.writer() as conn:
+            for table in ("memory", "document_chunks"):
+                rows = conn.execute(
+                    f"SELECT id, embedding, embedding_format FROM {table} "
+                    "WHERE embedding IS NOT NULL AND embedding_format != ?",
+                    (embedding_format,)
+                ).fetchall()
+                conn.executemany(
+                    f"UPDATE {table} SET embedding=?, embedding_format=? WHERE id=?",
+                    [
+                        (
+                            vector_codec.encode(vector_codec.decode(r["embedding"], r["embedding_format"]), embedding_format),
+                            embedding_format,
+                            r["id"]
+                        )
+                        for r in rows
+                    ]
+                )
+                rewritten += len(rows)
+        return rewritten
+
+    def search_chunks(self, query, limit=50):
+        """
+        Lexical (BM25) ranking of document chunks for a free-text query.
+        Any term may match; returns [{"id", "score"}] best first.
+        """
+        terms = [t.replace('"', '""') for t in (query or "").split()][:32]
+        if not terms:
+            return []
+        match = " OR ".join(f'"{t}"' for t in terms)
 
-        return results
\ No newline at end of file
+        cursor = self.pool.reader().cursor()
+        cursor.execute("""
+            SELECT rowid AS id, bm25(chunks_fts) AS score
+            FROM chunks_fts
+            WHERE chunks_fts MATCH ?
+            ORDER BY score
+            LIMIT ?
+        """, (match, limit))
+        return [dict(r) for r in cursor.fetchall()]
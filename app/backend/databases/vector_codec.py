@@ -0,0 +1,198 @@
+"""
+Compact storage and scoring for embedding vectors.
+
+Formats (per row, so a database can mix them while it is converted):
+    float32  raw little-endian floats                       4 * d bytes
+    float16  half floats                                    2 * d bytes
+    int8     float32 scale + round(v / scale), |v| <= 127    d + 4 bytes
+    binary   sign bits, np.packbits(v > 0)                  d / 8 bytes
+
+Search runs in two stages: quantized scoring (int8 dot product or
+Hamming distance) picks `limit * rescore` candidates from each format,
+then the float query is scored against the dequantized candidates and
+the best `limit` are returned as cosine similarities.
+
+Every format is fixed-width for a given dimension, so rows of one format
+can be scored straight from a (n, row_bytes) uint8 matrix, whether it
+was joined from SQLite BLOBs or is an np.memmap (see vector_store).
+"""
+import numpy as np
+
+FORMATS = ("float32", "float16", "int8", "binary")
+
+# Cosine against a sign vector is ~sqrt(2/pi) of the true cosine for
+# well-spread embeddings; undo that so min_score thresholds still apply
+BINARY_COSINE_CORRECTION = np.sqrt(np.pi / 2)
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def row_bytes(fmt, dim):
+    if fmt == "float32":
+        return 4 * dim
+    if fmt == "float16":
+        return 2 * dim
+    if fmt == "int8":
+        return dim + 4
+    if fmt == "binary":
+        return (dim + 7) // 8
+    raise ValueError(f"Unknown embedding format: {fmt}")
+
+
+def encode(vector, fmt="float32"):
+    vector = np.asarray(vector, dtype=np.float32)
+    if fmt == "float32":
+        return vector.tobytes()
+    if fmt == "float16":
+        return vector.astype(np.float16).tobytes()
+    if fmt == "int8":
+        peak = float(np.max(np.abs(vector))) if vector.size else 0.0
+        scale = peak / 127 if peak else 1.0
+        quantized = np.clip(np.round(vector / scale), -127, 127).astype(np.int8)
+        return np.float32(scale).tobytes() + quantized.tobytes()
+    if fmt == "binary":
+        return np.packbits(vector > 0).tobytes()
+    raise ValueError(f"Unknown embedding format: {fmt}")
+
+
+def decode(blob, fmt="float32", dim=None):
+    """Back to float32; binary vectors come back as +-1 and need `dim`."""
+    if fmt == "float32":
+        return np.frombuffer(blob, dtype=np.float32)
+    if fmt == "float16":
+        return np.frombuffer(blob, dtype=np.float16).astype(np.float32)
+    if fmt == "int8":
+        scale = np.frombuffer(blob[:4], dtype=np.float32)[0]
+        return np.frombuffer(blob[4:], dtype=np.int8).astype(np.float32) * scale
+    if fmt == "binary":
+        bits = np.unpackbits(np.frombuffer(blob, dtype=np.uint8))
+        if dim is not None:
+            bits = bits[:dim]
+        return bits.astype(np.float32) * 2 - 1
+    raise ValueError(f"Unknown embedding format: {fmt}")
+
+
+def search(query, rows, limit, rescore=4, weights=None):
+    """
+    Top `limit` rows by cosine with `query`.
+
+    `rows` is a list of (id, blob, fmt); `weights` optionally maps id to a
+    multiplier applied in both stages (memory importance * decay).
+    Returns [(id, cosine, weighted_score)] best first.
+    """
+    groups = {}
+    for row_id, blob, fmt in rows:
+        if blob:
+            ids, blobs = groups.setdefault(fmt or "float32", ([], []))
+            ids.append(row_id)
+            blobs.append(blob)
+
+    results = []
+    for fmt, (ids, blobs) in groups.items():
+        raw = np.frombuffer(b"".join(blobs), dtype=np.uint8).reshape(len(blobs), -1)
+        weight = np.array([weights.get(i, 1.0) for i in ids], dtype=np.float32) if weights else None
+        results += [
+            (ids[row], cosine, score)
+            for row, cosine, score in search_matrix(query, raw, fmt, limit, rescore, weight)
+        ]
+
+    results.sort(key=lambda r: r[2], reverse=True)
+    return results[:limit]
+
+
+def search_matrix(query, raw, fmt, limit, rescore=4, weights=None, mask=None):
+    """
+    Same two stages over a (n, row_bytes) uint8 matrix of one format.
+
+    `weights` and `mask` are optional per-row arrays; masked-out rows are
+    never returned. Returns [(row_index, cosine, weighted_score)].
+    """
+    query = np.asarray(query, dtype=np.float32)
+    query_norm = float(np.linalg.norm(query))
+    if limit <= 0 or query_norm == 0 or len(raw) == 0:
+        return []
+
+    rows = None
+    if mask is not None:
+        if not mask.any():
+            return []
+        # Small subsets (one memory type, say) are cheaper to gather first
+        if mask.sum() < len(raw) // 4:
+            rows = np.flatnonzero(mask)
+            raw = raw[rows]
+            weights = weights[rows] if weights is not None else None
+            mask = None
+
+    # Stage 1: cheap scores on the compact form
+    approx = _quantized_scores(query, raw, fmt)
+    if weights is not None:
+        approx = approx * weights
+    if mask is not None:
+        approx = np.where(mask, approx, -np.inf)
+
+    fetch = min(max(limit * rescore, limit), len(approx))
+    top = np.argpartition(-approx, fetch - 1)[:fetch] if fetch < len(approx) else np.arange(len(approx))
+    top = top[np.isfinite(approx[top])]
+
+    # Stage 2: float query against the dequantized candidates
+    matrix = decode_matrix(raw[top], fmt, query.shape[0])
+    norms = np.linalg.norm(matrix, axis=1) * query_norm
+    valid = norms > 0
+    cosine = (matrix @ query) / np.where(valid, norms, 1.0)
+    if fmt == "binary":
+        cosine = np.minimum(cosine * BINARY_COSINE_CORRECTION, 1.0)
+    score = cosine * weights[top] if weights is not None else cosine
+
+    if rows is not None:
+        top = rows[top]
+    order = [j for j in np.argsort(-score) if valid[j]][:limit]
+    return [(int(top[j]), float(cosine[j]), float(score[j])) for j in order]
+
+
+def decode_matrix(raw, fmt, dim):
+    """Rows of a (n, row_bytes) uint8 matrix as a float32 (n, dim) matrix."""
+    raw = np.asarray(raw, dtype=np.uint8)
+    if len(raw) == 0:
+        return np.zeros((0, dim), dtype=np.float32)
+
+    if fmt == "float32":
+        return np.ascontiguousarray(raw).view(np.float32)
+    if fmt == "float16":
+        return np.ascontiguousarray(raw).view(np.float16).astype(np.float32)
+    if fmt == "int8":
+        scales = raw[:, :4].copy().view(np.float32)
+        return raw[:, 4:].view(np.int8).astype(np.float32) * scales
+    if fmt == "binary":
+        return np.unpackbits(raw, axis=1)[:, :dim].astype(np.float32) * 2 - 1
+    raise ValueError(f"Unknown embedding format: {fmt}")
+
+
+def _quantized_scores(query, raw, fmt):
+    """Approximate dot products, comparable within one format only."""
+    if fmt == "float32":
+        return raw.view(np.float32) @ query
+
+    if fmt == "float16":
+        return _widened_dot(raw.view(np.float16), query)
+
+    if fmt == "int8":
+        # NumPy has no BLAS path for integer matmul; widening to float32
+        # and using sgemv is ~2x faster than an int32 dot product
+        scales = raw[:, :4].copy().view(np.float32).ravel()
+        return _widened_dot(raw[:, 4:].view(np.int8), query) * scales
+
+    if fmt == "binary":
+        query_bits = np.packbits(query > 0)
+        distance = _POPCOUNT[np.bitwise_xor(raw, query_bits)].sum(axis=1, dtype=np.int32)
+        # Hamming distance as a similarity in [-1, 1]
+        return 1 - 2 * distance.astype(np.float32) / query.shape[0]
+
+    raise ValueError(f"Unknown embedding format: {fmt}")
+
+
+def _widened_dot(matrix, query, block=2048):
+    """matrix @ query in float32, widening a cache-sized block at a time."""
+    out = np.empty(len(matrix), dtype=np.float32)
+    for start in range(0, len(matrix), block):
+        out[start:start + block] = matrix[start:start + block].astype(np.float32) @ query
+    return out
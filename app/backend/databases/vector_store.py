@@ -0,0 +1,273 @@
+"""
+Append-only, memory-mapped embedding file.
+
+    <name>[.<gen>].vec    fixed-width rows in a vector_codec format
+    <name>[.<gen>].ids    int64 row id (the SQLite rowid), one per row
+    <name>[.<gen>].tomb   int64 indices of rows that were deleted or replaced
+    <name>.json           {"format", "dim", "generation"}
+
+compact() writes the next generation next to the current one and then
+flips "generation" in the metadata with a single rename, so a crash
+leaves either the old set of files or the new one, never a mix.
+
+Search runs over np.memmap, so vectors are paged in by the OS instead of
+being copied out of sqlite3 rows, and opening a store only reads the id
+map. The SQLite tables stay the source of truth: UserDatabase re-syncs a
+store against them at startup, so a store can always be deleted and
+rebuilt.
+"""
+import os
+import re
+import json
+import threading
+import numpy as np
+from backend.databases import vector_codec
+
+
+class VectorStore:
+    def __init__(self, path, embedding_format="float32"):
+        if embedding_format not in vector_codec.FORMATS:
+            raise ValueError(f"Unknown embedding format: {embedding_format}")
+
+        self.path = path
+        self.embedding_format = embedding_format
+        self.dim = None
+        self.generation = 0
+
+        self._lock = threading.Lock()
+        self._map = None
+        self._mapped_rows = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._open()
+
+    # ============================================================
+    #                    FILES
+    # ============================================================
+    def _file(self, ext, generation=None):
+        generation = self.generation if generation is None else generation
+        if ext.startswith("json") or generation == 0:
+            return f"{self.path}.{ext}"
+        return f"{self.path}.{generation}.{ext}"
+
+    def _write_meta(self, generation):
+        with open(self._file("json.tmp"), "w") as f:
+            json.dump({"format": self.embedding_format, "dim": self.dim, "generation": generation}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self._file("json.tmp"), self._file("json"))
+
+    def _open(self):
+        meta = None
+        if os.path.exists(self._file("json")):
+            with open(self._file("json")) as f:
+                meta = json.load(f)
+
+        # A different format can't be read in place; rebuild from SQLite
+        if meta and meta.get("format") != self.embedding_format:
+            print(f"🧮 {os.path.basename(self.path)} vectors: {meta.get('format')} -> {self.embedding_format}, rebuilding")
+            self._remove_files()
+            meta = None
+
+        self.dim = meta.get("dim") if meta else None
+        self.generation = meta.get("generation", 0) if meta else 0
+        self._remove_stale()
+        ids = np.fromfile(self._file("ids"), dtype=np.int64) if os.path.exists(self._file("ids")) else np.zeros(0, np.int64)
+
+        # An interrupted append can leave the two files at different lengths
+        vec_size = os.path.getsize(self._file("vec")) if os.path.exists(self._file("vec")) else 0
+        rows = min(len(ids), vec_size // self.width) if self.dim else 0
+        if rows != len(ids) or (self.dim and vec_size != rows * self.width):
+            self._truncate(rows)
+            ids = ids[:rows]
+
+        self._ids = list(ids.tolist())
+        self._alive = np.ones(rows, dtype=bool)
+        if os.path.exists(self._file("tomb")):
+            tombs = np.fromfile(self._file("tomb"), dtype=np.int64)
+            self._alive[tombs[tombs < rows]] = False
+        self._rows = {row_id: row for row, row_id in enumerate(self._ids) if self._alive[row]}
+
+    def _truncate(self, rows):
+        with open(self._file("ids"), "ab") as f:
+            f.truncate(rows * 8)
+        if self.dim:
+            with open(self._file("vec"), "ab") as f:
+                f.truncate(rows * self.width)
+
+    def _remove_files(self):
+        for ext in ("vec", "ids", "tomb", "json"):
+            if os.path.exists(self._file(ext)):
+                os.remove(self._file(ext))
+        self.generation = 0
+        self._remove_stale()
+
+    def _remove_stale(self):
+        """Delete files of any generation but the current one (an interrupted compact)."""
+        directory, name = os.path.split(self.path)
+        pattern = re.compile(rf"{re.escape(name)}(?:\.(\d+))?\.(?:vec|ids|tomb)(?:\.tmp)?")
+        for entry in os.listdir(directory or "."):
+            match = pattern.fullmatch(entry)
+            if match and int(match.group(1) or 0) != self.generation:
+                os.remove(os.path.join(directory, entry))
+
+    @property
+    def width(self):
+        return vector_codec.row_bytes(self.embedding_format, self.dim)
+
+    def _matrix(self):
+        """Read-only memmap of every row, remapped when the file has grown."""
+        rows = len(self._ids)
+        if rows == 0:
+            return np.zeros((0, self.width if self.dim else 0), dtype=np.uint8)
+        if self._map is None or self._mapped_rows != rows:
+            self._map = np.memmap(self._file("vec"), dtype=np.uint8, mode="r", shape=(rows, self.width))
+            self._mapped_rows = rows
+        return self._map
+
+    # ============================================================
+    #                    WRITES
+    # ============================================================
+    def add(self, row_id, vector):
+        self.add_many([row_id], [vector])
+
+    def add_many(self, row_ids, vectors):
+        """Append vectors; an id that is already stored is replaced."""
+        row_ids = [int(i) for i in row_ids]
+        if not row_ids:
+            return
+
+        with self._lock:
+            dim = len(vectors[0])
+            if self.dim is None:
+                self.dim = dim
+                self._write_meta(self.generation)
+            if any(len(v) != self.dim for v in vectors):
+                raise ValueError(f"Embedding dimension {dim} does not match store dimension {self.dim}")
+
+            self._tombstone([self._rows[i] for i in row_ids if i in self._rows])
+
+            data = b"".join(vector_codec.encode(v, self.embedding_format) for v in vectors)
+            with open(self._file("vec"), "ab") as f:
+                f.write(data)
+            with open(self._file("ids"), "ab") as f:
+                f.write(np.array(row_ids, dtype=np.int64).tobytes())
+
+            start = len(self._ids)
+            self._ids.extend(row_ids)
+            self._alive = np.concatenate([self._alive, np.ones(len(row_ids), dtype=bool)])
+            for offset, row_id in enumerate(row_ids):
+                self._rows[row_id] = start + offset
+
+    def remove(self, row_ids):
+        with self._lock:
+            self._tombstone([self._rows[int(i)] for i in row_ids if int(i) in self._rows])
+
+    def _tombstone(self, rows):
+        if not rows:
+            return
+        with open(self._file("tomb"), "ab") as f:
+            f.write(np.array(rows, dtype=np.int64).tobytes())
+        self._alive[rows] = False
+        for row in rows:
+            self._rows.pop(self._ids[row], None)
+
+    def compact(self):
+        """Rewrite the files without tombstoned rows; returns rows dropped."""
+        with self._lock:
+            dead = len(self._ids) - len(self._rows)
+            if dead == 0:
+                return 0
+
+            keep = np.flatnonzero(self._alive)
+            matrix = self._matrix()
+            ids = np.array(self._ids, dtype=np.int64)[keep]
+            old, new = self.generation, self.generation + 1
+            with open(self._file("vec", new), "wb") as f:
+                for start in range(0, len(keep), 4096):
+                    f.write(np.ascontiguousarray(matrix[keep[start:start + 4096]]).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self._file("ids", new), "wb") as f:
+                f.write(ids.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            # The metadata rename is the commit point
+            self._map = None
+            self._write_meta(new)
+            self.generation = new
+            for ext in ("vec", "ids", "tomb"):
+                if os.path.exists(self._file(ext, old)):
+                    os.remove(self._file(ext, old))
+
+            self._ids = ids.tolist()
+            self._alive = np.ones(len(self._ids), dtype=bool)
+            self._rows = {row_id: row for row, row_id in enumerate(self._ids)}
+            return dead
+
+    # ============================================================
+    #                    READS
+    # ============================================================
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, row_id):
+        return row_id in self._rows
+
+    def ids(self):
+        return np.fromiter(self._rows.keys(), dtype=np.int64, count=len(self._rows))
+
+    def get(self, row_id):
+        with self._lock:
+            row = self._rows.get(row_id)
+            if row is None:
+                return None
+            return vector_codec.decode_matrix(self._matrix()[row:row + 1], self.embedding_format, self.dim)[0]
+
+    def search(self, query, limit, rescore=4, weights=None):
+        """
+        [(id, cosine, weighted_score)] best first over live rows.
+        `weights` maps id to a multiplier; when given, ids missing from it
+        are skipped (that is how callers filter, e.g. by memory type).
+        """
+        with self._lock:
+            if not self._rows:
+                return []
+            matrix = self._matrix()
+            ids = self._ids
+            mask = self._alive.copy()
+            # compact() swaps in a new dict; this one matches `matrix`
+            rows = self._rows
+
+        weight = None
+        if weights is not None:
+            weight = np.zeros(len(mask), dtype=np.float32)
+            subset = np.zeros(len(mask), dtype=bool)
+            for row_id, value in weights.items():
+                row = rows.get(row_id)
+                if row is not None and row < len(mask):
+                    weight[row] = value
+                    subset[row] = True
+            mask &= subset
+
+        return [
+            (ids[row], cosine, score)
+            for row, cosine, score in vector_codec.search_matrix(
+                query, matrix, self.embedding_format, limit, rescore, weight, mask
+            )
+        ]
+
+    def stats(self):
+        return {
+            "format": self.embedding_format,
+            "dim": self.dim,
+            "rows": len(self._ids),
+            "live": len(self._rows),
+            "tombstones": len(self._ids) - len(self._rows),
+            "bytes": len(self._ids) * self.width if self.dim else 0
+        }
+
+    def close(self):
+        with self._lock:
+            self._map = None
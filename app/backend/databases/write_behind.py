@@ -0,0 +1,161 @@
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+
+class WriteBehindQueue:
+    """
+    Single writer thread that applies queued writes in group commits.
+
+    Callers submit `fn(conn)` callables. The writer drains the queue into
+    one transaction (each write in its own SAVEPOINT, so a failing write
+    doesn't roll back its neighbours) and commits once per batch. A batch
+    closes when it reaches `max_batch`, when `flush_interval` seconds have
+    passed since its first write, or as soon as the queue is empty and
+    someone is waiting on a result. Futures resolve only after COMMIT.
+
+    flush() is the durability barrier: it returns once every write
+    submitted before it is committed. Batches run on the pool's single
+    writer connection.
+    """
+
+    def __init__(self, pool, flush_interval=0.05, max_batch=512, name="omni-db-writer"):
+        self.pool = pool
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+
+        self._queue = queue.Queue()
+        self._outstanding = 0
+        self._outstanding_lock = threading.Lock()
+        self._closed = False
+
+        self.writes = 0
+        self.commits = 0
+        self.failed = 0
+        self.largest_batch = 0
+        self._started_at = time.monotonic()
+
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    # ============================================================
+    #                    SUBMITTING
+    # ============================================================
+    def submit(self, fn, wait=False):
+        """Queue a write; with wait=True block until it is committed and return its result."""
+        if self._closed:
+            raise RuntimeError("Write queue is closed")
+
+        future = Future()
+        with self._outstanding_lock:
+            self._outstanding += 1
+        self._queue.put((fn, future, wait))
+
+        if wait:
+            return future.result()
+        return future
+
+    def flush(self, timeout=None):
+        if self._closed:
+            return
+        future = Future()
+        with self._outstanding_lock:
+            self._outstanding += 1
+        self._queue.put((None, future, True))
+        future.result(timeout)
+
+    def sync(self):
+        """Read-your-writes barrier: flush only if something is still queued or in flight."""
+        if self._outstanding:
+            self.flush()
+
+    def close(self):
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def stats(self):
+        elapsed = time.monotonic() - self._started_at
+        return {
+            "writes": self.writes,
+            "commits": self.commits,
+            "failed": self.failed,
+            "avg_batch": round(self.writes / self.commits, 2) if self.commits else 0.0,
+            "largest_batch": self.largest_batch,
+            "writes_per_s": round(self.writes / elapsed, 2) if elapsed else 0.0,
+            "queued": self._queue.qsize()
+        }
+
+    # ============================================================
+    #                    WRITER THREAD
+    # ============================================================
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            batch = [item]
+            urgent = item[2]
+            deadline = time.monotonic() + self.flush_interval
+
+            while len(batch) < self.max_batch:
+                try:
+                    if urgent:
+                        item = self._queue.get_nowait()
+                    else:
+                        item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+                urgent = urgent or item[2]
+
+            self._commit(batch)
+
+    def _commit(self, batch):
+        results = []
+        try:
+            with self.pool.writer() as conn:
+                for fn, future, wait in batch:
+                    if fn is None:
+                        results.append((future, wait, None, None))
+                        continue
+                    conn.execute("SAVEPOINT write")
+                    try:
+                        result = fn(conn)
+                        conn.execute("RELEASE write")
+                        results.append((future, wait, result, None))
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO write")
+                        conn.execute("RELEASE write")
+                        results.append((future, wait, None, e))
+        except Exception as e:
+            # The whole batch was rolled back; fail every waiter and keep the thread alive
+            results = [(future, wait, None, e) for _, future, wait in batch]
+
+        written = sum(1 for fn, _, _ in batch if fn is not None)
+        self.writes += written
+        self.commits += 1 if written else 0
+        self.largest_batch = max(self.largest_batch, written)
+
+        with self._outstanding_lock:
+            self._outstanding -= len(batch)
+
+        for future, wait, result, error in results:
+            if not future.set_running_or_notify_cancel():
+                continue
+            if error is None:
+                future.set_result(result)
+                continue
+            self.failed += 1
+            future.set_exception(error)
+            if not wait:
+                # Nobody is blocked on this write, so surface it here
+                print(f"⚠️  Queued write failed: {error}")
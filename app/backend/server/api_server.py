@@ -0,0 +1,370 @@
+import os
+import re
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from backend.ai.async_orchestrator import OrchestratorBusy
+from backend.server.http import (
+    HttpError, WebSocket, WebSocketClosed,
+    read_request, send_response, start_event_stream, send_event
+)
+
+
+class ApiServer:
+    """
+    Local HTTP/WebSocket front door for the backend services.
+
+    Runs on a plain asyncio loop (no QApplication). Chat turns go through
+    the AsyncOrchestrator, which bounds how many run at once and how many
+    may wait; database reads are served from a small IO pool so many
+    clients can be connected at once.
+
+    Routes:
+        GET    /health
+        GET    /stats
+        GET    /chats
+        GET    /chats/<id>/messages?before_id=&limit=   (whole chat when neither is given)
+        PATCH  /chats/<id>            {"title"}
+        DELETE /chats/<id>
+        GET    /notes
+        GET    /logs?level=
+        GET    /search?q=&limit=
+        POST   /chat                  {"chat_id", "prompt", "stream"}  (SSE when stream)
+        GET    /ws                    WebSocket, send {"chat_id", "prompt"}
+    """
+
+    def __init__(self, services: dict, host="127.0.0.1", port=8765, io_workers=4):
+        self.host = host
+        self.port = port
+
+        self.settings = services["settings"]
+        self.system_db = services["system_db"]
+        self.user_db = services["user_db"]
+        self.model_manager = services["model_manager"]
+        self.rag_pipeline = services["rag_pipeline"]
+
+        self.loop = None
+        self.core = None
+        self.maintenance = None
+        self.follow_ups = None
+        self.file_index = None
+        self._server = None
+
+        self._io_executor = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="omni-io")
+
+        self.stats = {
+            "started_at": time.time(),
+            "requests": 0,
+            "turns_started": 0,
+            "turns_finished": 0,
+            "turns_failed": 0,
+            "tokens_streamed": 0,
+        }
+
+        self.routes = [
+            ("GET", r"/health", self._health),
+            ("GET", r"/stats", self._stats),
+            ("GET", r"/chats", self._list_chats),
+            ("GET", r"/chats/(\d+)/messages", self._chat_messages),
+            ("PATCH", r"/chats/(\d+)", self._rename_chat),
+            ("DELETE", r"/chats/(\d+)", self._delete_chat),
+            ("GET", r"/notes", self._list_notes),
+            ("GET", r"/logs", self._list_logs),
+            ("GET", r"/search", self._search),
+        ]
+
+    # ============================================================
+    #                    LIFECYCLE
+    # ============================================================
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self._initialize_core()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        print(f"🌐 API server listening on http://{self.host}:{self.port}")
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self._io_executor.shutdown(wait=True)
+        if self.follow_ups is not None:
+            self.follow_ups.stop()
+        if self.core is not None:
+            self.core.executor.shutdown(wait=True)
+        if self.maintenance is not None:
+            self.maintenance.stop()
+        if self.file_index is not None:
+            self.file_index.close()
+        self.user_db.close()
+        self.system_db.close()
+
+    def _initialize_core(self):
+        from backend.ai.llm_engine import LLMEngine
+        from backend.ai.orchestrator import Orchestrator
+        from backend.ai.async_orchestrator import AsyncOrchestrator
+        from backend.services.chat_service import ChatService
+        from backend.services.maintenance import MaintenanceScheduler
+        from backend.services.memory_consolidation import MemoryConsolidator
+        from backend.services.follow_up_queue import FollowUpQueue
+        from backend.services.file_index import FileIndex
+
+        llm = LLMEngine(self.model_manager, self.settings)
+        orchestrator = Orchestrator(llm, self.rag_pipeline, self.settings, self.user_db, None)
+        chat_service = ChatService(self.system_db, orchestrator)
+        orchestrator.chat_service = chat_service
+
+        self.core = AsyncOrchestrator(orchestrator, chat_service)
+
+        self.file_index = FileIndex(
+            os.path.join(self.user_db.APP_DIR, "files.db"), self.settings, self.core.idle_seconds
+        )
+        orchestrator.file_index = self.file_index
+        self.file_index.start()
+
+        generate_settings = self.settings.get_settings()["generate_settings"]
+        if generate_settings.get("background_follow_ups", True):
+            self.follow_ups = FollowUpQueue(self.core.idle_seconds, generate_settings.get("follow_up_idle_s", 1.0))
+            chat_service.follow_ups = self.follow_ups
+            self.core.follow_ups = self.follow_ups
+            self.follow_ups.start()
+
+        consolidator = MemoryConsolidator(
+            self.user_db,
+            orchestrator.merge_memory_text,
+            lambda text: self.rag_pipeline.embedding_engine.embed(text)[0]
+        )
+        self.maintenance = MaintenanceScheduler(
+            self.settings, self.system_db, self.user_db, self.core.idle_seconds, consolidator
+        )
+        self.maintenance.start()
+
+    # ============================================================
+    #                    AI TURNS
+    # ============================================================
+    async def run_turn(self, chat_id, prompt, emit=None):
+        """Run one prompt through the async core, forwarding events to `emit` until it finishes."""
+        events = asyncio.Queue()
+
+        def put(event, data):
+            self.loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+        def on_token(phase, token, token_chat_id):
+            if phase == "thinking":
+                return
+            self.stats["tokens_streamed"] += 1
+            put("token", {"chat_id": token_chat_id, "phase": phase, "token": token})
+
+        def on_chat(new_chat_id, title):
+            put("chat", {"chat_id": new_chat_id, "title": title})
+
+        def on_done(task):
+            if task.cancelled():
+                results = {"success": False, "error": "Turn cancelled"}
+            elif isinstance(task.exception(), OrchestratorBusy):
+                results = {"success": False, "busy": True, "error": str(task.exception())}
+            elif task.exception() is not None:
+                results = {"success": False, "error": str(task.exception())}
+            else:
+                results = task.result()
+            results.setdefault("chat_id", chat_id)
+            if results.get("success"):
+                self.stats["turns_finished"] += 1
+            else:
+                self.stats["turns_failed"] += 1
+            put("done", results)
+
+        self.stats["turns_started"] += 1
+        task = asyncio.ensure_future(self.core.run_turn(chat_id, prompt, on_token, on_chat))
+        task.add_done_callback(on_done)
+
+        while True:
+            event, data = await events.get()
+            if event == "done":
+                return data
+            if emit is not None:
+                await emit(event, data)
+
+    # ============================================================
+    #                    CONNECTION HANDLING
+    # ============================================================
+    async def _handle_connection(self, reader, writer):
+        try:
+            request = await read_request(reader)
+            if request is None:
+                return
+            self.stats["requests"] += 1
+
+            if request.path == "/ws" and request.wants_websocket():
+                await self._websocket_session(request, reader, writer)
+            elif request.method == "POST" and request.path == "/chat":
+                await self._chat(request, writer)
+            else:
+                status, payload = await self._dispatch(request)
+                await send_response(writer, status, payload)
+
+        except HttpError as e:
+            await send_response(writer, e.status, {"success": False, "error": e.message})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            print(f"⚠️  API server error: {e}")
+            try:
+                await send_response(writer, 500, {"success": False, "error": str(e)})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, request):
+        path_matched = False
+        for method, pattern, handler in self.routes:
+            match = re.fullmatch(pattern, request.path)
+            if not match:
+                continue
+            path_matched = True
+            if method == request.method:
+                return await handler(request, *match.groups())
+
+        if path_matched:
+            raise HttpError(405, f"{request.method} not allowed on {request.path}")
+        raise HttpError(404, f"No route for {request.path}")
+
+    async def _io(self, fn, *args):
+        return await self.loop.run_in_executor(self._io_executor, fn, *args)
+
+    # ============================================================
+    #                    CHAT (HTTP + SSE)
+    # ============================================================
+    async def _chat(self, request, writer):
+        body = request.json()
+        prompt = self._prompt(body.get("prompt"))
+        chat_id = self._chat_id(body.get("chat_id"))
+
+        if not body.get("stream"):
+            results = await self.run_turn(chat_id, prompt)
+            await send_response(writer, 503 if results.get("busy") else 200, results)
+            return
+
+        await start_event_stream(writer)
+
+        async def emit(event, data):
+            await send_event(writer, event, data)
+
+        results = await self.run_turn(chat_id, prompt, emit)
+        await send_event(writer, "done", results)
+
+    async def _websocket_session(self, request, reader, writer):
+        ws = WebSocket(reader, writer)
+        await ws.accept(request)
+
+        async def emit(event, data):
+            await ws.send_json({"type": event, **data})
+
+        try:
+            while True:
+                try:
+                    message = await ws.receive_json()
+                    if not isinstance(message, dict):
+                        raise HttpError(400, "Message must be a JSON object")
+                    prompt = self._prompt(message.get("prompt"))
+                    chat_id = self._chat_id(message.get("chat_id"))
+                except HttpError as e:
+                    await ws.send_json({"type": "error", "error": e.message})
+                    continue
+
+                results = await self.run_turn(chat_id, prompt, emit)
+                await ws.send_json({"type": "done", **results})
+        except WebSocketClosed:
+            pass
+        finally:
+            await ws.close()
+
+    @staticmethod
+    def _prompt(value):
+        prompt = value.strip() if isinstance(value, str) else ""
+        if not prompt:
+            raise HttpError(400, "Missing prompt")
+        return prompt
+
+    @staticmethod
+    def _chat_id(value):
+        """A chat id from a request body; missing or empty starts a new chat."""
+        try:
+            return int(value or -1)
+        except (TypeError, ValueError):
+            raise HttpError(400, "chat_id must be an integer")
+
+    # ============================================================
+    #                    READ/WRITE ROUTES
+    # ============================================================
+    async def _health(self, request):
+        return 200, {"success": True, "ready": self.core is not None}
+
+    async def _stats(self, request):
+        uptime = time.time() - self.stats["started_at"]
+        stats = dict(self.stats)
+        stats["uptime_s"] = round(uptime, 3)
+        stats["turns_per_s"] = round(self.stats["turns_finished"] / uptime, 4) if uptime else 0.0
+        stats["active_turns"] = self.core.active
+        stats["pending_turns"] = self.core.pending
+        stats["chat_cache"] = self.core.chat_service.chat_cache.stats()
+        stats["db_writes"] = self.system_db.write_stats()
+        stats["db_pools"] = {
+            "system": self.system_db.pool_stats(),
+            "user": self.user_db.pool_stats()
+        }
+        stats["db_vectors"] = self.user_db.vector_stats()
+        stats["maintenance"] = self.maintenance.stats()
+        stats["follow_ups"] = self.follow_ups.stats() if self.follow_ups is not None else None
+        stats["router"] = self.core.orchestrator.intent_router.stats()
+        stats["turns"] = self.core.turn_stats()
+        stats["file_index"] = self.file_index.stats() if self.file_index is not None else None
+        stats["response_cache"] = self.core.response_cache.stats() if self.core.response_cache is not None else None
+        return 200, stats
+
+    async def _list_chats(self, request):
+        return 200, await self._io(self.system_db.get_chats)
+
+    async def _chat_messages(self, request, chat_id):
+        if "limit" not in request.query and "before_id" not in request.query:
+            return 200, await self._io(self.system_db.get_messages_by_chat, int(chat_id))
+
+        try:
+            before_id = int(request.query["before_id"]) if request.query.get("before_id") else None
+            limit = min(int(request.query.get("limit") or 50), 500)
+        except ValueError:
+            raise HttpError(400, "before_id and limit must be integers")
+        return 200, await self._io(self.system_db.get_messages_page, int(chat_id), before_id, limit)
+
+    async def _rename_chat(self, request, chat_id):
+        title = request.json().get("title")
+        if not isinstance(title, str) or not title.strip():
+            raise HttpError(400, "Missing title")
+        title = title.strip()
+        await self._io(self.core.chat_service.rename_chat, int(chat_id), title[:25], True)
+        return 200, {"success": True}
+
+    async def _delete_chat(self, request, chat_id):
+        await self._io(self.core.chat_service.delete_chat, int(chat_id))
+        return 200, {"success": True}
+
+    async def _list_notes(self, request):
+        return 200, await self._io(self.system_db.get_all_notes)
+
+    async def _list_logs(self, request):
+        return 200, await self._io(self.system_db.get_logs, request.query.get("level"))
+
+    async def _search(self, request):
+        query = (request.query.get("q") or "").strip()
+        if not query:
+            raise HttpError(400, "Missing q")
+        try:
+            limit = min(int(request.query.get("limit") or 20), 100)
+        except ValueError:
+            raise HttpError(400, "limit must be an integer")
+        return 200, await self._io(self.system_db.search_history, query, limit)
@@ -0,0 +1,248 @@
+import json
+import base64
+import hashlib
+import asyncio
+from urllib.parse import urlsplit, parse_qs
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+MAX_BODY_BYTES = 1024 * 1024
+
+STATUS_TEXT = {
+    200: "OK",
+    204: "No Content",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request:
+    def __init__(self, method, target, headers, body):
+        parts = urlsplit(target)
+        self.method = method.upper()
+        self.path = parts.path.rstrip("/") or "/"
+        self.query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        """The body as a JSON object; every endpoint takes one."""
+        if not self.body:
+            return {}
+        try:
+            body = json.loads(self.body)
+        except ValueError:
+            raise HttpError(400, "Body is not valid JSON")
+        if not isinstance(body, dict):
+            raise HttpError(400, "Body must be a JSON object")
+        return body
+
+    def wants_websocket(self):
+        return (
+            self.headers.get("upgrade", "").lower() == "websocket"
+            and "sec-websocket-key" in self.headers
+        )
+
+
+# ============================================================
+#                    REQUEST / RESPONSE
+# ============================================================
+async def read_request(reader: asyncio.StreamReader):
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+
+    try:
+        method, target, _version = request_line.decode("latin-1").split()
+    except ValueError:
+        raise HttpError(400, "Malformed request line")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length", 0) or 0)
+    except ValueError:
+        raise HttpError(400, "Invalid Content-Length")
+    if length < 0:
+        raise HttpError(400, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HttpError(413, "Request body too large")
+    body = await reader.readexactly(length) if length else b""
+
+    return Request(method, target, headers, body)
+
+
+async def send_response(writer: asyncio.StreamWriter, status, payload=None, headers=None):
+    body = b"" if payload is None else json.dumps(payload, default=str).encode()
+    head = [
+        f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+        "Content-Type: application/json",
+        f"Content-Length: {len(body)}",
+        "Connection: close",
+    ]
+    for name, value in (headers or {}).items():
+        head.append(f"{name}: {value}")
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + body)
+    await writer.drain()
+
+
+# ============================================================
+#                    SERVER-SENT EVENTS
+# ============================================================
+async def start_event_stream(writer: asyncio.StreamWriter):
+    writer.write((
+        "HTTP/1.1 200 OK\r\n"
+        "Content-Type: text/event-stream\r\n"
+        "Cache-Control: no-cache\r\n"
+        "Connection: close\r\n\r\n"
+    ).encode())
+    await writer.drain()
+
+
+async def send_event(writer: asyncio.StreamWriter, event, data):
+    writer.write(f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n".encode())
+    await writer.drain()
+
+
+# ============================================================
+#                    WEBSOCKET (RFC 6455, text frames only)
+# ============================================================
+class WebSocketClosed(Exception):
+    pass
+
+
+class WebSocket:
+    CLOSE_NORMAL = 1000
+    CLOSE_PROTOCOL_ERROR = 1002
+    CLOSE_TOO_BIG = 1009
+
+    OP_CONT = 0x0
+    OP_TEXT = 0x1
+    OP_BINARY = 0x2
+    OP_CLOSE = 0x8
+    OP_PING = 0x9
+    OP_PONG = 0xA
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self._send_lock = asyncio.Lock()
+        self.closed = False
+
+    async def accept(self, request: Request):
+        key = request.headers["sec-websocket-key"]
+        accept = base64.b64encode(
+            hashlib.sha1((key + WS_GUID).encode()).digest()
+        ).decode()
+        self.writer.write((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+        ).encode())
+        await self.writer.drain()
+
+    async def receive_json(self):
+        text = await self.receive_text()
+        try:
+            return json.loads(text)
+        except ValueError:
+            raise HttpError(400, "Message is not valid JSON")
+
+    async def receive_text(self):
+        message = b""
+        while True:
+            fin, opcode, payload = await self._read_frame()
+            if opcode == self.OP_CLOSE:
+                await self.close()
+                raise WebSocketClosed()
+            if opcode == self.OP_PING:
+                await self._write_frame(self.OP_PONG, payload)
+                continue
+            if opcode == self.OP_PONG:
+                continue
+            message += payload
+            # Fragments count towards one message's limit
+            if len(message) > MAX_BODY_BYTES:
+                await self.close(self.CLOSE_TOO_BIG)
+                raise WebSocketClosed()
+            if fin:
+                return message.decode("utf-8", errors="replace")
+
+    async def send_json(self, data):
+        await self._write_frame(self.OP_TEXT, json.dumps(data, default=str).encode())
+
+    async def close(self, code=CLOSE_NORMAL):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            await self._write_frame(self.OP_CLOSE, code.to_bytes(2, "big"))
+        except (ConnectionError, RuntimeError, WebSocketClosed):
+            pass
+
+    async def _read_frame(self):
+        head = await self._read(2)
+        fin = bool(head[0] & 0x80)
+        opcode = head[0] & 0x0F
+        masked = bool(head[1] & 0x80)
+        length = head[1] & 0x7F
+
+        # Clients must mask every frame (RFC 6455 5.1)
+        if not masked:
+            await self.close(self.CLOSE_PROTOCOL_ERROR)
+            raise WebSocketClosed()
+
+        if length == 126:
+            length = int.from_bytes(await self._read(2), "big")
+        elif length == 127:
+            length = int.from_bytes(await self._read(8), "big")
+        if length > MAX_BODY_BYTES:
+            await self.close(self.CLOSE_TOO_BIG)
+            raise WebSocketClosed()
+
+        mask = await self._read(4)
+        payload = await self._read(length) if length else b""
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        return fin, opcode, payload
+
+    async def _read(self, size):
+        try:
+            return await self.reader.readexactly(size)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            raise WebSocketClosed()
+
+    async def _write_frame(self, opcode, payload: bytes):
+        if self.writer.is_closing():
+            raise WebSocketClosed()
+
+        head = bytearray([0x80 | opcode])
+        length = len(payload)
+        if length < 126:
+            head.append(length)
+        elif length < 1 << 16:
+            head.append(126)
+            head += length.to_bytes(2, "big")
+        else:
+            head.append(127)
+            head += length.to_bytes(8, "big")
+
+        async with self._send_lock:
+            self.writer.write(bytes(head) + payload)
+            await self.writer.drain()
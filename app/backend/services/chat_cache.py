@@ -0,0 +1,166 @@
+import threading
+from collections import OrderedDict
+
+MESSAGE_OVERHEAD_BYTES = 64
+
+
+class ChatCache:
+    """
+    Bounded LRU of chat message lists.
+
+    Chats are evicted least-recently-used first once the resident total
+    passes `max_messages` or `max_bytes`; the chat being touched is never
+    evicted by its own insert. Evicted or unknown chats are reloaded
+    through `loader(chat_id)` (SystemDatabase.get_messages_by_chat).
+
+    Lists handed out by get() are live: change them through set(),
+    update(), append() or discard() so the resident size stays accounted. Small
+    per-chat metadata (title, has_title) lives and is evicted alongside.
+    """
+
+    def __init__(self, loader, max_messages=2000, max_bytes=8 * 1024 * 1024):
+        self.loader = loader
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+
+        self._chats = OrderedDict()
+        self._sizes = {}
+        self._meta = {}
+        self._lock = threading.RLock()
+
+        self.resident_messages = 0
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ============================================================
+    #                    ACCESS
+    # ============================================================
+    def get(self, chat_id):
+        with self._lock:
+            if chat_id in self._chats:
+                self.hits += 1
+                self._chats.move_to_end(chat_id)
+                return self._chats[chat_id]
+            self.misses += 1
+
+        messages = list(self.loader(chat_id) or [])
+        with self._lock:
+            # Another thread may have loaded it while we were reading
+            if chat_id in self._chats:
+                return self._chats[chat_id]
+            self._store(chat_id, messages)
+            return messages
+
+    def peek(self, chat_id):
+        with self._lock:
+            return self._chats.get(chat_id)
+
+    def __contains__(self, chat_id):
+        with self._lock:
+            return chat_id in self._chats
+
+    def set(self, chat_id, messages: list):
+        with self._lock:
+            self._store(chat_id, list(messages))
+            return self._chats[chat_id]
+
+    def update(self, chat_id, fn):
+        """
+        Replace the chat's list with fn(current list) under the lock, so
+        messages appended meanwhile aren't lost; loads the chat if needed.
+        """
+        while True:
+            current = self.get(chat_id)
+            with self._lock:
+                # Evicted or replaced between get() and here: start over
+                if self._chats.get(chat_id) is current:
+                    self._store(chat_id, list(fn(current)))
+                    return self._chats[chat_id]
+
+    def append(self, chat_id, message: dict):
+        with self._lock:
+            if chat_id not in self._chats:
+                return None
+            messages = self._chats[chat_id]
+            messages.append(message)
+            count, size = self._sizes[chat_id]
+            added = self._message_bytes(message)
+            self._sizes[chat_id] = (count + 1, size + added)
+            self.resident_messages += 1
+            self.resident_bytes += added
+            self._chats.move_to_end(chat_id)
+            self._evict(keep=chat_id)
+            return messages
+
+    def get_meta(self, chat_id):
+        with self._lock:
+            return self._meta.get(chat_id)
+
+    def set_meta(self, chat_id, **fields):
+        with self._lock:
+            if chat_id not in self._chats:
+                return None
+            self._meta.setdefault(chat_id, {}).update(fields)
+            return self._meta[chat_id]
+
+    def discard(self, chat_id):
+        with self._lock:
+            if chat_id in self._chats:
+                self._drop(chat_id)
+
+    # ============================================================
+    #                    METRICS
+    # ============================================================
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "resident_chats": len(self._chats),
+                "resident_messages": self.resident_messages,
+                "resident_bytes": self.resident_bytes,
+                "max_messages": self.max_messages,
+                "max_bytes": self.max_bytes
+            }
+
+    # ============================================================
+    #                    ACCOUNTING
+    # ============================================================
+    def _store(self, chat_id, messages):
+        meta = self._meta.get(chat_id)
+        if chat_id in self._chats:
+            self._drop(chat_id)
+        if meta is not None:
+            self._meta[chat_id] = meta
+        size = sum(self._message_bytes(m) for m in messages)
+        self._chats[chat_id] = messages
+        self._sizes[chat_id] = (len(messages), size)
+        self.resident_messages += len(messages)
+        self.resident_bytes += size
+        self._evict(keep=chat_id)
+
+    def _drop(self, chat_id):
+        self._chats.pop(chat_id)
+        self._meta.pop(chat_id, None)
+        count, size = self._sizes.pop(chat_id)
+        self.resident_messages -= count
+        self.resident_bytes -= size
+
+    def _evict(self, keep):
+        while (
+            self.resident_messages > self.max_messages
+            or self.resident_bytes > self.max_bytes
+        ):
+            victim = next((c for c in self._chats if c != keep), None)
+            if victim is None:
+                return
+            self._drop(victim)
+            self.evictions += 1
+
+    def _message_bytes(self, message):
+        return len((message.get("content") or "").encode("utf-8")) + MESSAGE_OVERHEAD_BYTES
@@ -1,6 +1,8 @@
 from PySide6.QtCore import Signal, QObject
 from backend.databases.system_db import SystemDatabase
-from backend.ai.orchestrator import Orchestrator
+from backend.ai.orchestrator import Orchestrator, TITLE_PROMPT
+from backend.services.chat_cache import ChatCache
+from backend.services.follow_up_queue import JobCancelled
 
 class ChatService(QObject):
     chatCreated = Signal(int, str)
@@ -9,7 +11,16 @@ class ChatService(QObject):
         super().__init__()
         self.system_db = system_db
         self.orchestrator = orchestrator
-        self.chat_cache = {}
+
+        cache_settings = self.orchestrator.settings.get_settings().get("cache_settings", {})
+        self.chat_cache = ChatCache(
+            self._load_history,
+            max_messages=cache_settings.get("max_cached_messages", 2000),
+            max_bytes=int(cache_settings.get("max_cached_mb", 8) * 1024 * 1024)
+        )
+
+        # FollowUpQueue for summaries/titles; None runs them inline
+        self.follow_ups = None
 
         self.orchestrator.llm.titleSignal.connect(self.on_title_results)
 
@@ -17,27 +28,33 @@ class ChatService(QObject):
     #                    PROMPT HANDLING
     # ============================================================
     def send_message(self, chat_id, prompt):
+        chat_id, history = self.prepare_turn(chat_id, prompt)
+        self.orchestrator.run(prompt, history, chat_id=chat_id)
+
+    def prepare_turn(self, chat_id, prompt):
+        """Store the user's prompt and return (chat_id, cached history) ready for a flow."""
+        new_chat = None
         if not chat_id or chat_id <= 0:
-            chat_id = self.system_db.create_chat(prompt[:25])
+            new_chat = self.system_db.insert_chat(prompt[:25])
+            chat_id = new_chat["id"]
             self.chatCreated.emit(chat_id, prompt[:25])
 
-        user_msg_id = self.system_db.create_message(chat_id, "user", prompt)
-        user_msg = self.system_db.get_message_by_id(user_msg_id)
+        user_msg = self.system_db.insert_message(chat_id, "user", prompt)
 
-        print("PREVIOUS CACHE:", self.chat_cache.get(chat_id, {}))
-        history = self.system_db.get_messages_by_chat(chat_id)
-        if chat_id in self.chat_cache:
-            self.chat_cache[chat_id].append(user_msg)
-        else:
-            self.chat_cache[chat_id] = list(history)
+        # New chats start with just this prompt; cached chats grow by one;
+        # only evicted chats reload their history (which includes the prompt)
+        if new_chat:
+            self.chat_cache.set(chat_id, [user_msg])
+            self.chat_cache.set_meta(chat_id, title=new_chat["title"], has_title=bool(new_chat["has_title"]))
+        elif self.chat_cache.append(chat_id, user_msg) is None:
+            self.chat_cache.get(chat_id)
 
         print("SEND MESSAGE IMPORTANCES: ", {
-            "chat_cache": self.chat_cache,
             "chat_id": chat_id,
-            "history": history
+            "cache": self.chat_cache.stats()
         })
 
-        self.orchestrator.run(prompt, self.chat_cache[chat_id], chat_id=chat_id)
+        return chat_id, self.chat_cache.get(chat_id)
 
     # ============================================================
     #                    CACHING
@@ -45,7 +62,31 @@ class ChatService(QObject):
     def get_messages(self, chat_id: int):
         if not chat_id:
             print("no chat_id")
-        return self.chat_cache.get(chat_id, [])
+            return []
+        return self.chat_cache.get(chat_id)
+
+    def chat_meta(self, chat_id: int):
+        meta = self.chat_cache.get_meta(chat_id)
+        if meta is not None:
+            return meta
+
+        chat = self.system_db.get_chat_by_id(chat_id)
+        if not chat:
+            return None
+        meta = {"title": chat["title"], "has_title": bool(chat["has_title"])}
+        self.chat_cache.set_meta(chat_id, **meta)
+        return meta
+
+    def rename_chat(self, chat_id: int, title: str, has_title=False):
+        self.system_db.edit_chat_title(title, chat_id, has_title=has_title)
+        fields = {"title": title}
+        if has_title:
+            fields["has_title"] = True
+        self.chat_cache.set_meta(chat_id, **fields)
+
+    def delete_chat(self, chat_id: int):
+        self.system_db.delete_chat(chat_id)
+        self.chat_cache.discard(chat_id)
 
     def append_message(self, chat_id: int, message: dict):
         if message:
@@ -53,10 +94,9 @@ class ChatService(QObject):
                 print("no chat_id")
             else:
                 self.system_db.create_message(chat_id, message["role"], message.get("content", ""))
-                if chat_id not in self.chat_cache:
-                    self.chat_cache[chat_id] = []
-                self.chat_cache[chat_id].append(message)
-        return self.chat_cache[chat_id]
+                if self.chat_cache.append(chat_id, message) is None:
+                    self.chat_cache.get(chat_id)
+        return self.get_messages(chat_id)
 
     # ============================================================
     #                    ASSISTING CHAT WITH AI
@@ -75,9 +115,26 @@ class ChatService(QObject):
     #     )
 
     def _maybe_summarize(self, messages: list, transfer):
-        summary_settings = self.orchestrator.settings.get_settings()["summary_settings"]
-        max_messages = summary_settings.get("max_message", 8)
+        if self.hierarchical_summaries():
+            job = self.next_summary_job(transfer["chat_id"])
+            if job:
+                # store_summary asks for the next job (e.g. a condense) once this one lands
+                transfer = {**transfer, "summary_job": job, "cascade": True}
+                self.orchestrator.generate_summary(None, transfer, job["messages"])
+            return
+
+        to_summarize = self.messages_to_summarize(messages)
+        if not to_summarize:
+            return
+
+        return self.orchestrator.generate_summary(to_summarize, transfer)
+
+    def messages_to_summarize(self, messages: list):
+        summary_settings = self._summary_settings()
+        max_messages = summary_settings.get("max_messages", 8)
         keep_fresh = summary_settings.get("keep_fresh", 3)
+        # Summaries already in the cache are folded in separately, not re-read as chat
+        messages = [m for m in messages if "summary_level" not in m]
         if(len(messages) < max_messages): return
         
         total_tokens = sum(
@@ -87,9 +144,14 @@ class ChatService(QObject):
         threshold = summary_settings.get("summary_token_threshold", 2500)
         if total_tokens < threshold:
             return
-        to_summarize = messages[:-keep_fresh]
+        return messages[:-keep_fresh]
 
-        return self.orchestrator.generate_summary(to_summarize, transfer)
+    def needs_title(self, chat_id: int):
+        chat_cache = self.chat_cache.peek(chat_id) or []
+        if len(chat_cache) != 6:
+            return False
+        meta = self.chat_meta(chat_id)
+        return bool(meta) and not meta["has_title"]
 
     # def _run_summary(self, messages_to_summarize: list, transfer):
     #     from backend.ai.prompt_builder import PromptBuilder
@@ -113,23 +175,174 @@ class ChatService(QObject):
     #     )
 
     def add_summary(self, summary, transfer):
-        summary_settings = self.orchestrator.settings.get_settings()["summary_settings"]
+        summary_settings = self._summary_settings()
         keep_fresh = summary_settings.get("keep_fresh", 3)
 
         chat_id = transfer["chat_id"]
 
-        summarized_cache = self.chat_cache[chat_id][-keep_fresh:]
+        summarized_cache = self.chat_cache.get(chat_id)[-keep_fresh:]
         summarized_cache.append({
             "role": "system",
             "content": summary
         })
-        print(f"\n\n\nCHAT CACHE: {self.chat_cache}\n SUMMARIZED CACHE: {summarized_cache}\n\n\n")
-        self.chat_cache[chat_id] = summarized_cache
+        print(f"\n\n\nCHAT CACHE: {self.chat_cache.stats()}\n SUMMARIZED CACHE: {summarized_cache}\n\n\n")
+        self.chat_cache.set(chat_id, summarized_cache)
         return
-    
+
+    def store_summary(self, summary_text, transfer):
+        if not summary_text or not summary_text.strip():
+            return
+
+        job = transfer.get("summary_job")
+        if job is None:
+            self.add_summary(summary_text, transfer)
+        else:
+            self.apply_summary(transfer["chat_id"], job, summary_text)
+            if transfer.get("cascade"):
+                self._maybe_summarize(None, {"chat_id": transfer["chat_id"]})
+            # A condensed level is a rollup of summaries already stored as memories
+            if job["kind"] != "fold":
+                return
+
+        embedding = self.orchestrator.rag.embedding_engine.embed(summary_text)[0]
+        self.orchestrator.user_db.add_memory_with_embedding(
+            type_="summary",
+            category="conversation",
+            content=summary_text,
+            embedding=embedding,
+            source="ai",
+            importance=2,
+            confidence=0.9
+        )
+
+    # ============================================================
+    #                    ROLLING SUMMARIES
+    # ============================================================
+    def _summary_settings(self):
+        return self.orchestrator.settings.get_settings()["summary_settings"]
+
+    def hierarchical_summaries(self):
+        return self._summary_settings().get("mode", "hierarchical") == "hierarchical"
+
+    def _load_history(self, chat_id):
+        """Cache loader: a chat's stored summary levels, then only the messages after them."""
+        summaries = self.system_db.get_chat_summaries(chat_id)
+        if not summaries:
+            return self.system_db.get_messages_by_chat(chat_id)
+
+        through_id = max(s["through_id"] for s in summaries)
+        return [self._summary_message(s) for s in summaries] + self.system_db.get_messages_after(chat_id, through_id)
+
+    @staticmethod
+    def _summary_message(summary):
+        return {
+            "role": "system",
+            "content": summary["content"],
+            "summary_level": summary["level"],
+            "through_id": summary["through_id"],
+            "tokens": summary["tokens"]
+        }
+
+    def next_summary_job(self, chat_id: int):
+        """
+        The next summarization step for a chat, or None:
+            condense  a level over `level_max_tokens` is folded into the
+                      level above it and cleared (the top level absorbs
+                      whatever reaches it)
+            fold      the unsummarized messages, minus `keep_fresh`, are
+                      folded into level 0
+        Each step reads at most two summaries or one message window, so
+        its cost doesn't grow with the chat.
+        """
+        summary_settings = self._summary_settings()
+        max_tokens = summary_settings.get("level_max_tokens", 512)
+        max_levels = summary_settings.get("max_levels", 3)
+
+        messages = self.chat_cache.get(chat_id)
+        summaries = {m["summary_level"]: m for m in messages if "summary_level" in m}
+
+        for level in sorted(summaries):
+            if level + 1 >= max_levels:
+                break
+            if summaries[level]["tokens"] > max_tokens:
+                above = summaries.get(level + 1)
+                return {
+                    "kind": "condense",
+                    "level": level,
+                    "through_id": summaries[level]["through_id"],
+                    "messages": self.orchestrator.build_condense_messages(
+                        above["content"] if above else "", summaries[level]["content"], max_tokens
+                    )
+                }
+
+        to_summarize = self.messages_to_summarize(messages)
+        if not to_summarize:
+            return None
+
+        previous = summaries.get(0)
+        through_id = max(
+            (m["id"] for m in to_summarize if m.get("id") is not None),
+            default=max((s["through_id"] for s in summaries.values()), default=0)
+        )
+        return {
+            "kind": "fold",
+            "level": 0,
+            "through_id": through_id,
+            "count": len(to_summarize),
+            "messages": self.orchestrator.build_summary_messages(
+                to_summarize, previous["content"] if previous else None
+            )
+        }
+
+    def needs_summary(self, chat_id: int):
+        """Cheap check for queued work: a level to condense or enough new messages."""
+        messages = self.chat_cache.peek(chat_id) or []
+        if self.hierarchical_summaries():
+            summary_settings = self._summary_settings()
+            max_tokens = summary_settings.get("level_max_tokens", 512)
+            max_levels = summary_settings.get("max_levels", 3)
+            if any(
+                m["tokens"] > max_tokens and m["summary_level"] + 1 < max_levels
+                for m in messages if "summary_level" in m
+            ):
+                return True
+        return bool(self.messages_to_summarize(messages))
+
+    def apply_summary(self, chat_id: int, job: dict, text: str):
+        """Store a finished summary step and rebuild the chat's cache around it."""
+        text = text.strip()
+        level = job["level"] if job["kind"] == "fold" else job["level"] + 1
+        summary = self._summary_message({
+            "level": level,
+            "content": text,
+            "through_id": job["through_id"],
+            "tokens": self.orchestrator.llm.estimate_tokens(text)
+        })
+
+        def rebuild(messages):
+            summaries = {m["summary_level"]: m for m in messages if "summary_level" in m}
+            rest = [m for m in messages if "summary_level" not in m]
+            summaries[level] = summary
+            if job["kind"] == "fold":
+                # Messages that arrived while the summary was generated stay
+                rest = rest[job["count"]:]
+            else:
+                del summaries[job["level"]]
+            ordered = [summaries[level] for level in sorted(summaries, reverse=True)]
+            self.system_db.set_chat_summaries(chat_id, [
+                {key: m[key] for key in ("content", "through_id", "tokens")} | {"level": m["summary_level"]}
+                for m in ordered
+            ])
+            return ordered + rest
+
+        # The DB write happens inside update(), under the cache lock: a reload
+        # can't pick up the new summary before `rebuild` has applied it once,
+        # and turns appended meanwhile are kept
+        self.chat_cache.update(chat_id, rebuild)
+
     def on_title_results(self, results, chat_id):
         if results["success"]:
-            self.system_db.edit_chat_title(results["text"], chat_id)
+            self.rename_chat(chat_id, results["text"], has_title=True)
         else:
             print(f"Failed to generate title: {results["error"]}")
 
@@ -140,18 +353,71 @@ class ChatService(QObject):
     #     print(f"STREAMING, TOKEN:{token}, CHAT ID:{chat_id}")
     #     self.tokenGenerated.emit(phase, token, chat_id)
 
-    def cache_response(self, text, transfer):
+    def cache_response(self, text, transfer, follow_ups=True):
         chat_id = transfer["chat_id"]
-        chat_cache = self.chat_cache[chat_id]
 
-        sys_msg_id = self.system_db.create_message(chat_id, "assistant", text)
-        sys_msg = self.system_db.get_message_by_id(sys_msg_id)
-        chat = self.system_db.get_chat_by_id(chat_id)
+        sys_msg = self.system_db.insert_message(chat_id, "assistant", text)
 
-        chat_cache.append(sys_msg)
+        chat_cache = self.chat_cache.append(chat_id, sys_msg) or self.chat_cache.get(chat_id)
+        # The async core queues summaries and titles itself
+        if not follow_ups or self.queue_follow_ups(chat_id):
+            return
         self._maybe_summarize(chat_cache, transfer)
-        if len(chat_cache) == 6 and not chat["has_title"]:
+        if self.needs_title(chat_id):
             self.orchestrator.generate_title(chat_cache, chat_id)
         return
 
-    
\ No newline at end of file
+    # ============================================================
+    #                    FOLLOW-UPS
+    # ============================================================
+    def queue_follow_ups(self, chat_id: int):
+        """Hand summary/title work to the background queue; False when there is none."""
+        if self.follow_ups is None:
+            return False
+        if self.needs_summary(chat_id):
+            self.follow_ups.submit("summary", chat_id, lambda should_stop: self.summarize(chat_id, should_stop))
+        if self.needs_title(chat_id):
+            self.follow_ups.submit("title", chat_id, lambda should_stop: self.title(chat_id, should_stop))
+        return True
+
+    def _complete_follow_up(self, messages: list, system_prompt: str, chat_id: int, should_stop):
+        """Streamed so a preempting turn can stop it at the next token."""
+        def on_token(phase, token, token_chat_id):
+            if should_stop():
+                raise JobCancelled()
+
+        results = self.orchestrator.llm.complete(
+            "instruct", messages, system_prompt, chat_id, stream=True, on_token=on_token
+        )
+        if should_stop():
+            raise JobCancelled()
+        return results
+
+    def summarize(self, chat_id: int, should_stop=lambda: False):
+        """Run every pending summary step for a chat on this thread."""
+        if self.hierarchical_summaries():
+            # One fold plus at most one condense per level
+            for _ in range(self._summary_settings().get("max_levels", 3) + 1):
+                job = self.next_summary_job(chat_id)
+                if job is None:
+                    return
+                results = self._complete_follow_up(job["messages"], "", chat_id, should_stop)
+                if not results["success"]:
+                    return
+                self.store_summary(results["text"], {"chat_id": chat_id, "summary_job": job})
+            return
+
+        to_summarize = self.messages_to_summarize(self.get_messages(chat_id))
+        if not to_summarize:
+            return
+        summary_messages = self.orchestrator.build_summary_messages(to_summarize)
+        results = self._complete_follow_up(summary_messages, "", chat_id, should_stop)
+        if results["success"]:
+            self.store_summary(results["text"], {"chat_id": chat_id})
+
+    def title(self, chat_id: int, should_stop=lambda: False):
+        meta = self.chat_meta(chat_id)
+        if not meta or meta["has_title"]:
+            return
+        results = self._complete_follow_up(self.get_messages(chat_id), TITLE_PROMPT, chat_id, should_stop)
+        self.on_title_results(results, chat_id)
@@ -0,0 +1,470 @@
+import os
+import re
+import json
+import time
+import threading
+from backend.databases.connection_pool import ConnectionPool
+from backend.databases.migrations import FILE_MIGRATIONS, migrate
+
+
+# Files whose bytes are text; everything else is only indexed by name
+TEXT_EXTENSIONS = {
+    ".txt", ".md", ".rst", ".org", ".tex", ".log", ".csv", ".tsv", ".json", ".yaml", ".yml",
+    ".toml", ".ini", ".cfg", ".conf", ".xml", ".html", ".htm", ".py", ".js", ".ts", ".qml",
+    ".c", ".h", ".cpp", ".hpp", ".java", ".go", ".rs", ".rb", ".php", ".sh", ".sql", ".css",
+}
+MARKUP_EXTENSIONS = {".html", ".htm", ".xml"}
+_TAGS = re.compile(r"<[^>]+>")
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _under(path, root):
+    return path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+
+
+def extract_text(path, max_bytes):
+    """Text of a text-like file (first `max_bytes`), or None when it isn't one."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in TEXT_EXTENSIONS:
+        return None
+    with open(path, "rb") as f:
+        data = f.read(max_bytes)
+    if b"\0" in data[:4096]:
+        return None
+    text = data.decode("utf-8", errors="ignore")
+    if extension in MARKUP_EXTENSIONS:
+        text = _TAGS.sub(" ", text)
+    return text
+
+
+class FileIndex:
+    """
+    Persistent index of file names under tool_settings.search_files.search_path.
+
+    Lives in its own SQLite file (files.db) and is built by a daemon
+    thread. Searches are a trigram FTS lookup, so any 3+ character
+    substring of a name is found without touching the filesystem.
+
+    Rescans compare each directory's mtime with the indexed one. An
+    unchanged directory costs one stat(), and its sub-directories come
+    from the index. A changed one is listed, and its files are diffed
+    against the index. Creating, deleting or renaming a file changes the
+    directory's mtime; a file that only grew keeps its old size until its
+    directory changes.
+
+    With index_contents, each scan is followed by a content pass: new
+    or modified text files (TEXT_EXTENSIONS, up to max_file_size_mb, the
+    first content_max_kb of each) go into an FTS5 table ranked by BM25.
+    A file's content is re-read only when its mtime moved on.
+
+    restricted_paths are never indexed, and are filtered again at query
+    time, as are max_file_size_mb and can_search_sub_directories, so
+    narrowing a setting applies to the next search. The scope a scan ran
+    with (search_path, sub-directories, restricted and hidden paths) is
+    stored in scan_state; when it changes, every directory is listed
+    again so newly reachable subtrees are picked up. Until a full scan
+    of the current scope finishes, `ready()` is False and callers fall
+    back to walking the filesystem.
+    """
+
+    def __init__(self, db_path, settings, idle_seconds=None, batch_dirs=200):
+        self.settings = settings
+        self.idle_seconds = idle_seconds
+        self.batch_dirs = batch_dirs
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.pool = ConnectionPool(db_path, self._configure)
+        migrate(self.pool, FILE_MIGRATIONS, name="files.db")
+
+        self._stop = threading.Event()
+        self._rescan = threading.Event()
+        self._thread = None
+        self._scanned_scope = None
+
+        self.scans = 0
+        self.last_scan = None
+
+    def _configure(self, conn):
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA busy_timeout = 5000")
+
+    def _settings(self):
+        return self.settings.get_settings()["tool_settings"]["search_files"]
+
+    # ============================================================
+    #                    LIFECYCLE
+    # ============================================================
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="omni-file-index", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._rescan.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        self.pool.close()
+
+    def request_rescan(self):
+        self._rescan.set()
+
+    def ready(self):
+        scope = self._scope(self._settings())
+        if self._scanned_scope == scope:
+            return True
+        # Settings changed since the last scan; don't wait for rescan_every_s
+        if self._scanned_scope is not None:
+            self.request_rescan()
+        return False
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.scan()
+            except Exception as e:
+                print(f"⚠️  File index scan failed: {e}")
+            self._rescan.wait(self._settings().get("rescan_every_s", 600))
+            self._rescan.clear()
+
+    def _wait_for_idle(self):
+        # Scans yield to turns; the index only has to be fresh, not instant
+        if self.idle_seconds is None:
+            return
+        while not self._stop.is_set() and self.idle_seconds() < 1.0:
+            self._stop.wait(0.5)
+
+    # ============================================================
+    #                    SCANNING
+    # ============================================================
+    def _restricted(self, path, restricted):
+        return any(_under(path, r) for r in restricted)
+
+    @staticmethod
+    def _scope(search_settings):
+        """The settings that decide which directories a scan reaches."""
+        return {
+            "root": os.path.abspath(os.path.expanduser(search_settings.get("search_path", "~"))),
+            "recursive": bool(search_settings.get("can_search_sub_directories", True)),
+            "restricted": sorted(os.path.abspath(os.path.expanduser(p)) for p in search_settings.get("restricted_paths", [])),
+            "hidden": bool(search_settings.get("index_hidden_dirs", False))
+        }
+
+    def scan(self):
+        """Bring the index in line with the filesystem; returns what changed."""
+        search_settings = self._settings()
+        scope = self._scope(search_settings)
+        root, restricted = scope["root"], scope["restricted"]
+        recursive, include_hidden = scope["recursive"], scope["hidden"]
+        # Editing a file leaves its directory's mtime alone; contents need the files stat'ed
+        stat_files = search_settings.get("index_contents", True)
+
+        started = time.perf_counter()
+        result = {"dirs": 0, "listed": 0, "added": 0, "updated": 0, "removed": 0}
+
+        # Anything outside the current root (an old search_path) or restricted goes
+        with self.pool.writer() as conn:
+            # Unchanged directories only yield the children indexed last time,
+            # so subtrees a narrower scope skipped are found by listing again
+            stored = conn.execute("SELECT value FROM scan_state WHERE key = 'scope'").fetchone()
+            if stored is None or json.loads(stored["value"]) != scope:
+                conn.execute("UPDATE dirs SET mtime_ns = 0")
+                conn.execute(
+                    "INSERT OR REPLACE INTO scan_state (key, value) VALUES ('scope', ?)",
+                    (json.dumps(scope),)
+                )
+
+            stale = [
+                r["path"] for r in conn.execute("SELECT path FROM dirs WHERE parent_id IS NULL")
+                if r["path"] != root
+            ]
+            for path in stale + [p for p in restricted if _under(p, root)]:
+                result["removed"] += self._remove_tree(conn, path)
+            if not os.path.isdir(root):
+                result["removed"] += self._remove_tree(conn, root)
+                return result
+
+        stack = [(root, None)]
+        while stack and not self._stop.is_set():
+            self._wait_for_idle()
+            with self.pool.writer() as conn:
+                for _ in range(self.batch_dirs):
+                    if not stack:
+                        break
+                    path, parent_id = stack.pop()
+                    result["dirs"] += 1
+                    for child in self._scan_dir(conn, path, parent_id, result, stat_files):
+                        if not recursive:
+                            break
+                        if self._restricted(child[0], restricted):
+                            continue
+                        if not include_hidden and os.path.basename(child[0]).startswith("."):
+                            result["removed"] += self._remove_tree(conn, child[0])
+                            continue
+                        stack.append(child)
+
+        if not self._stop.is_set():
+            self._scanned_scope = scope
+            self.scans += 1
+            result["ms"] = round((time.perf_counter() - started) * 1000, 1)
+            if search_settings.get("index_contents", True):
+                result["contents"] = self.index_contents()
+            self.last_scan = result
+        return result
+
+    def index_contents(self, batch_files=200):
+        """Read every new or modified file's text into file_contents; returns counts."""
+        search_settings = self._settings()
+        max_size = int(search_settings.get("max_file_size_mb", 20) * 1024 * 1024)
+        max_bytes = int(search_settings.get("content_max_kb", 1024) * 1024)
+        started = time.perf_counter()
+        result = {"checked": 0, "indexed": 0, "bytes": 0}
+
+        last_id = 0
+        while not self._stop.is_set():
+            self._wait_for_idle()
+            pending = self.pool.reader().execute("""
+                SELECT id, path, size, mtime_ns FROM files
+                WHERE content_mtime_ns IS NOT mtime_ns AND id > ?
+                ORDER BY id LIMIT ?
+            """, (last_id, batch_files)).fetchall()
+            if not pending:
+                break
+            last_id = pending[-1]["id"]
+
+            # Reads happen outside the write lock; the batch is written at once
+            texts = []
+            for r in pending:
+                text = None
+                if r["size"] <= max_size:
+                    try:
+                        text = extract_text(r["path"], max_bytes)
+                    except OSError:
+                        pass
+                texts.append((r["id"], r["mtime_ns"], text))
+
+            with self.pool.writer() as conn:
+                for file_id, mtime_ns, text in texts:
+                    conn.execute("DELETE FROM file_contents WHERE rowid = ?", (file_id,))
+                    if text:
+                        conn.execute("INSERT INTO file_contents (rowid, body) VALUES (?, ?)", (file_id, text))
+                        result["indexed"] += 1
+                        result["bytes"] += len(text)
+                    # Files that moved on since they were read stay pending
+                    conn.execute(
+                        "UPDATE files SET content_mtime_ns = ? WHERE id = ? AND mtime_ns = ?",
+                        (mtime_ns, file_id, mtime_ns)
+                    )
+            result["checked"] += len(pending)
+
+        result["ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+    def _scan_dir(self, conn, path, parent_id, result, stat_files=False):
+        """
+        Sync one directory; returns [(sub-directory path, this dir's id)].
+        A directory whose mtime hasn't moved isn't listed again; with
+        `stat_files` its indexed files are still stat'ed for edits.
+        """
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            result["removed"] += self._remove_tree(conn, path)
+            return []
+
+        row = conn.execute("SELECT id, mtime_ns FROM dirs WHERE path = ?", (path,)).fetchone()
+        if row is not None and row["mtime_ns"] == mtime_ns:
+            if stat_files:
+                self._stat_files(conn, row["id"], result)
+            return [
+                (child["path"], row["id"])
+                for child in conn.execute("SELECT path FROM dirs WHERE parent_id = ?", (row["id"],))
+            ]
+
+        try:
+            with os.scandir(path) as entries:
+                listing = list(entries)
+        except OSError:
+            return []
+        result["listed"] += 1
+
+        if row is None:
+            dir_id = conn.execute(
+                "INSERT INTO dirs (path, parent_id, mtime_ns) VALUES (?, ?, ?)",
+                (path, parent_id, mtime_ns)
+            ).lastrowid
+        else:
+            dir_id = row["id"]
+            conn.execute("UPDATE dirs SET mtime_ns = ? WHERE id = ?", (mtime_ns, dir_id))
+
+        files, subdirs = {}, []
+        for entry in listing:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    files[entry.name] = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                continue
+
+        indexed = {
+            r["name"]: (r["id"], r["size"], r["mtime_ns"])
+            for r in conn.execute("SELECT id, name, size, mtime_ns FROM files WHERE dir_id = ?", (dir_id,))
+        }
+        added = [
+            (dir_id, name, os.path.join(path, name), size, mtime)
+            for name, (size, mtime) in files.items() if name not in indexed
+        ]
+        changed = [
+            (size, mtime, indexed[name][0])
+            for name, (size, mtime) in files.items()
+            if name in indexed and indexed[name][1:] != (size, mtime)
+        ]
+        gone = [(file_id,) for name, (file_id, _, _) in indexed.items() if name not in files]
+        conn.executemany("INSERT INTO files (dir_id, name, path, size, mtime_ns) VALUES (?, ?, ?, ?, ?)", added)
+        conn.executemany("UPDATE files SET size = ?, mtime_ns = ? WHERE id = ?", changed)
+        conn.executemany("DELETE FROM files WHERE id = ?", gone)
+        result["added"] += len(added)
+        result["updated"] += len(changed)
+        result["removed"] += len(gone)
+
+        present = set(subdirs)
+        for child in conn.execute("SELECT path FROM dirs WHERE parent_id = ?", (dir_id,)).fetchall():
+            if child["path"] not in present:
+                result["removed"] += self._remove_tree(conn, child["path"])
+
+        return [(subdir, dir_id) for subdir in subdirs]
+
+    def _stat_files(self, conn, dir_id, result):
+        changed = []
+        for r in conn.execute("SELECT id, path, size, mtime_ns FROM files WHERE dir_id = ?", (dir_id,)).fetchall():
+            try:
+                stat = os.stat(r["path"], follow_symlinks=False)
+            except OSError:
+                continue  # Gone files change the directory's mtime and are dropped by the next listing
+            if (stat.st_size, stat.st_mtime_ns) != (r["size"], r["mtime_ns"]):
+                changed.append((stat.st_size, stat.st_mtime_ns, r["id"]))
+        conn.executemany("UPDATE files SET size = ?, mtime_ns = ? WHERE id = ?", changed)
+        result["updated"] += len(changed)
+
+    @staticmethod
+    def _remove_tree(conn, path):
+        """Drop a directory and everything indexed under it; returns files removed."""
+        # Range scan on the path index: every path under `path` sorts between these
+        low, high = path.rstrip(os.sep) + os.sep, path.rstrip(os.sep) + chr(ord(os.sep) + 1)
+        removed = conn.execute(
+            "DELETE FROM files WHERE path >= ? AND path < ?", (low, high)
+        ).rowcount
+        conn.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (path, low, high))
+        return max(removed, 0)
+
+    # ============================================================
+    #                    SEARCH
+    # ============================================================
+    def search(self, query: str, limit=None):
+        """
+        Paths whose name contains `query` (case-insensitive), exact names
+        first; queries under 3 characters match name prefixes.
+        """
+        search_settings = self._settings()
+        limit = limit or search_settings.get("max_results", 50)
+        query = query.strip()
+        if not query:
+            return []
+        root, restricted, filters, params = self._query_filters(search_settings)
+
+        cursor = self.pool.reader().cursor()
+        exact = cursor.execute(
+            f"SELECT f.path FROM files f WHERE f.name = ? COLLATE NOCASE AND {filters}",
+            [query, *params]
+        )
+        if len(query) >= 3:
+            phrase = '"' + query.replace('"', '""') + '"'
+            partial = self.pool.reader().execute(f"""
+                SELECT f.path FROM files_fts
+                JOIN files f ON f.id = files_fts.rowid
+                WHERE files_fts MATCH ? AND {filters}
+            """, [phrase, *params])
+        else:
+            # Too short for trigrams (and a substring that short matches everything): name prefix
+            partial = self.pool.reader().execute(f"""
+                SELECT f.path FROM files f
+                WHERE f.name >= ? COLLATE NOCASE AND f.name < ? COLLATE NOCASE AND {filters}
+            """, [query, query + chr(0x10FFFF), *params])
+
+        matches, seen = [], set()
+        for rows in (exact, partial):
+            for (path,) in rows:
+                if path in seen or not _under(path, root) or self._restricted(path, restricted):
+                    continue
+                seen.add(path)
+                matches.append(path)
+                if len(matches) >= limit:
+                    return matches
+        return matches
+
+    def search_contents(self, query: str, limit=None):
+        """
+        [{"path", "snippet", "score"}] for files whose text has every word
+        of `query` (stemmed), best BM25 first.
+        """
+        search_settings = self._settings()
+        limit = limit or search_settings.get("max_results", 50)
+        words = _WORD.findall(query)
+        if not words:
+            return []
+        root, restricted, filters, params = self._query_filters(search_settings)
+        match = " ".join('"' + word.replace('"', '""') + '"' for word in words)
+
+        rows = self.pool.reader().execute(f"""
+            SELECT f.path, snippet(file_contents, 0, '[', ']', '…', 12) AS snippet,
+                   bm25(file_contents) AS score
+            FROM file_contents
+            JOIN files f ON f.id = file_contents.rowid
+            WHERE file_contents MATCH ? AND {filters}
+            ORDER BY score
+            LIMIT ?
+        """, [match, *params, limit * 2])
+
+        hits = []
+        for r in rows:
+            if not _under(r["path"], root) or self._restricted(r["path"], restricted):
+                continue
+            hits.append({"path": r["path"], "snippet": " ".join(r["snippet"].split()), "score": -r["score"]})
+            if len(hits) >= limit:
+                break
+        return hits
+
+    def _query_filters(self, search_settings):
+        """(root, restricted, SQL filter on files f, its params) for the current settings."""
+        root = os.path.abspath(os.path.expanduser(search_settings.get("search_path", "~")))
+        restricted = [os.path.abspath(os.path.expanduser(p)) for p in search_settings.get("restricted_paths", [])]
+        max_size = int(search_settings.get("max_file_size_mb", 20) * 1024 * 1024)
+
+        filters, params = "f.size <= ?", [max_size]
+        if not search_settings.get("can_search_sub_directories", True):
+            filters += " AND f.dir_id = (SELECT id FROM dirs WHERE path = ?)"
+            params.append(root)
+        return root, restricted, filters, params
+
+    # ============================================================
+    #                    METRICS
+    # ============================================================
+    def stats(self):
+        conn = self.pool.reader()
+        return {
+            "files": conn.execute("SELECT COUNT(*) FROM files").fetchone()[0],
+            "dirs": conn.execute("SELECT COUNT(*) FROM dirs").fetchone()[0],
+            "contents": conn.execute("SELECT COUNT(*) FROM file_contents").fetchone()[0],
+            "ready": self.ready(),
+            "scans": self.scans,
+            "last_scan": self.last_scan
+        }
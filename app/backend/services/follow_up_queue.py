@@ -0,0 +1,134 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class FollowUpQueue:
+    """
+    Low-priority LLM work (chat summaries and titles), kept off the
+    interactive path.
+
+    Jobs run one at a time on a daemon thread, and only once no turn has
+    been running or waiting for `idle_after_s` (per `idle_seconds()`).
+    A job is keyed (kind, chat_id) and reads the chat when it runs, so
+    submitting a key that is already queued is coalesced into it.
+
+    A job is `fn(should_stop)`. preempt(), called when a turn arrives,
+    makes should_stop() true: the job raises JobCancelled at its next
+    streamed token, which frees the model, and goes back to the front of
+    the queue.
+    """
+
+    def __init__(self, idle_seconds, idle_after_s=1.0):
+        self.idle_seconds = idle_seconds
+        self.idle_after_s = idle_after_s
+
+        self._jobs = OrderedDict()
+        self._cond = threading.Condition()
+        self._cancel = threading.Event()
+        self._running = None
+        self._stopping = False
+        self._thread = None
+
+        self.submitted = 0
+        self.coalesced = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.failed = 0
+        self.last_ms = None
+
+    # ============================================================
+    #                    LIFECYCLE
+    # ============================================================
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="omni-follow-ups", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        with self._cond:
+            self._stopping = True
+            self._cancel.set()
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    # ============================================================
+    #                    JOBS
+    # ============================================================
+    def submit(self, kind, chat_id, fn):
+        """Queue `fn` unless the same (kind, chat_id) is already waiting."""
+        key = (kind, chat_id)
+        with self._cond:
+            if key in self._jobs:
+                self.coalesced += 1
+                return False
+            self._jobs[key] = fn
+            self.submitted += 1
+            self._cond.notify()
+            return True
+
+    def preempt(self):
+        """Stop the running job at its next token; it is retried when idle again."""
+        with self._cond:
+            if self._running is not None:
+                self._cancel.set()
+
+    def should_stop(self):
+        return self._cancel.is_set()
+
+    def _idle(self):
+        return self.idle_seconds() >= self.idle_after_s
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopping and not (self._jobs and self._idle()):
+                    # Idleness is polled; new jobs wake the thread at once
+                    self._cond.wait(timeout=0.05 if self._jobs else None)
+                if self._stopping:
+                    return
+                key, fn = self._jobs.popitem(last=False)
+                self._running = key
+                self._cancel.clear()
+
+            started = time.perf_counter()
+            outcome = "completed"
+            try:
+                fn(self.should_stop)
+            except JobCancelled:
+                outcome = "cancelled"
+            except Exception as e:
+                outcome = "failed"
+                print(f"⚠️  Follow-up {key[0]} for chat {key[1]} failed: {e}")
+
+            with self._cond:
+                self._running = None
+                setattr(self, outcome, getattr(self, outcome) + 1)
+                self.last_ms = round((time.perf_counter() - started) * 1000, 3)
+                if outcome == "cancelled" and not self._stopping and key not in self._jobs:
+                    self._jobs[key] = fn
+                    self._jobs.move_to_end(key, last=False)
+
+    # ============================================================
+    #                    METRICS
+    # ============================================================
+    def stats(self):
+        with self._cond:
+            return {
+                "queued": len(self._jobs),
+                "running": list(self._running) if self._running else None,
+                "submitted": self.submitted,
+                "coalesced": self.coalesced,
+                "completed": self.completed,
+                "cancelled": self.cancelled,
+                "failed": self.failed,
+                "last_ms": self.last_ms
+            }
@@ -0,0 +1,208 @@
+import time
+import threading
+
+
+class MaintenanceScheduler:
+    """
+    Background upkeep for the two databases, on its own daemon thread.
+
+    Every check: queued memory access boosts are written in one UPDATE.
+    When the app has been idle for `idle_after_s` (no turn running or
+    started, per `idle_seconds()`):
+        memory_every_s    time-based decay, then prune/archive
+        consolidate_every_s
+                          fold near-duplicate memories together and link
+                          related ones (see MemoryConsolidator)
+        database_every_s  ANALYZE, VACUUM when fragmented, WAL checkpoint,
+                          vector store compaction
+        integrity_every_s full integrity_check of system.db
+        backup_every_s    online backup generation of system.db, measured
+                          from the newest backup on disk so restarts don't
+                          trigger extra ones
+
+    Jobs never start while a turn is in flight, but one that is already
+    running finishes before the next turn's writes get the lock.
+    """
+
+    def __init__(self, settings, system_db, user_db, idle_seconds=None, consolidator=None):
+        self.settings = settings
+        self.system_db = system_db
+        self.user_db = user_db
+        self.consolidator = consolidator
+        self.idle_seconds = idle_seconds or (lambda: float("inf"))
+
+        self._stop = threading.Event()
+        self._thread = None
+
+        # First idle window after startup runs both
+        self.last_memory = float("-inf")
+        self.last_consolidate = float("-inf")
+        self.last_database = float("-inf")
+
+        self.runs = {"access": 0, "memory": 0, "consolidate": 0, "database": 0, "integrity": 0, "backup": 0}
+        self.boosted = 0
+        self.decayed = 0
+        self.pruned = 0
+        self.merged = 0
+        self.failures = 0
+        self.last_result = {}
+
+    def _config(self):
+        return self.settings.get_settings().get("maintenance", {})
+
+    # ============================================================
+    #                    LIFECYCLE
+    # ============================================================
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="omni-maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        # Don't lose boosts queued since the last check
+        try:
+            self.user_db.flush_access(**self._boost_args())
+        except Exception as e:
+            print(f"⚠️  Maintenance: access flush on stop failed: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self._config().get("check_interval_s", 30)):
+            self.tick()
+
+    # ============================================================
+    #                    JOBS
+    # ============================================================
+    def tick(self, now=None):
+        config = self._config()
+        if not config.get("enabled", True):
+            return
+        now = time.monotonic() if now is None else now
+
+        self._job("access", self._flush_access)
+
+        if self.idle_seconds() < config.get("idle_after_s", 60):
+            return
+
+        if now - self.last_memory >= config.get("memory_every_s", 3600):
+            self.last_memory = now
+            self._job("memory", self._memory)
+
+        if not self._still_idle(config):
+            return
+
+        if self.consolidator is not None and now - self.last_consolidate >= config.get("consolidate_every_s", 3600):
+            self.last_consolidate = now
+            self._job("consolidate", self._consolidate)
+
+        if not self._still_idle(config):
+            return
+
+        if now - self.last_database >= config.get("database_every_s", 21600):
+            self.last_database = now
+            self._job("database", self._database)
+
+        if not self._still_idle(config):
+            return
+
+        integrity_age = self.system_db.integrity_age()
+        if integrity_age is None or integrity_age >= config.get("integrity_every_s", 604800):
+            self._job("integrity", self.system_db.integrity_check)
+
+        if not self._still_idle(config):
+            return
+
+        backup_age = self.system_db.backups.age()
+        if backup_age is None or backup_age >= config.get("backup_every_s", 21600):
+            self._job("backup", self._backup)
+
+    def _still_idle(self, config):
+        return not self._stop.is_set() and self.idle_seconds() >= config.get("idle_after_s", 60)
+
+    def _job(self, name, fn):
+        try:
+            result = fn()
+            self.runs[name] += 1
+            if result:
+                self.last_result[name] = result
+        except Exception as e:
+            self.failures += 1
+            print(f"⚠️  Maintenance {name} failed: {e}")
+
+    def _boost_args(self):
+        config = self._config()
+        return {
+            "boost": config.get("access_boost", 1.1),
+            "max_score": config.get("max_decay_score", 2.0)
+        }
+
+    def _flush_access(self):
+        boosted = self.user_db.flush_access(**self._boost_args())
+        self.boosted += boosted
+        return {"boosted": boosted} if boosted else None
+
+    def _memory(self):
+        config = self._config()
+        decayed = self.user_db.decay_memories(config.get("decay_half_life_days", 30))
+        pruned = self.user_db.prune_memories(
+            config.get("prune_below", 0.05),
+            archive=config.get("prune_mode", "archive") != "delete"
+        )
+        self.decayed += decayed
+        self.pruned += pruned
+        print(f"🧹 Maintenance: decayed {decayed} memories, pruned {pruned}")
+        return {"decayed": decayed, "pruned": pruned}
+
+    def _consolidate(self):
+        config = self._config()
+        result = self.consolidator.run(
+            duplicate_similarity=config.get("duplicate_similarity", 0.92),
+            link_similarity=config.get("link_similarity", 0.8),
+            max_links=config.get("max_links_per_memory", 5),
+            use_model=config.get("merge_with_model", False)
+        )
+        self.merged += result["merged"]
+        if result["merged"] or result["linked"]:
+            print(f"🧹 Maintenance: merged {result['merged']} duplicate memories, linked {result['linked']}")
+        return result
+
+    def _database(self):
+        ratio = self._config().get("vacuum_free_ratio", 0.2)
+        result = {
+            "system": self.system_db.optimize(ratio),
+            "user": self.user_db.optimize(ratio)
+        }
+        print(f"🧹 Maintenance: databases optimized {result}")
+        return result
+
+    def _backup(self):
+        config = self._config()
+        path = self.system_db.backup(
+            config.get("backup_pages_per_step", 256),
+            keep_last=config.get("backup_keep_last", 3),
+            keep_daily=config.get("backup_keep_daily", 7),
+            keep_weekly=config.get("backup_keep_weekly", 4)
+        )
+        if path:
+            print(f"💾 Maintenance: backed up system.db to {path}")
+        return self.system_db.backups.stats()
+
+    # ============================================================
+    #                    METRICS
+    # ============================================================
+    def stats(self):
+        return {
+            "runs": dict(self.runs),
+            "boosted": self.boosted,
+            "decayed": self.decayed,
+            "pruned": self.pruned,
+            "merged": self.merged,
+            "failures": self.failures,
+            "idle_s": round(min(self.idle_seconds(), 1e9), 3),
+            "last_result": self.last_result
+        }
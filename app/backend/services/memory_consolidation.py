@@ -0,0 +1,149 @@
+import time
+import numpy as np
+
+# ai_state key: memories up to this id have already been compared
+CONSOLIDATED_THROUGH = "memory_consolidated_through"
+
+
+class MemoryConsolidator:
+    """
+    Folds near-duplicate memories together and links related ones.
+
+    Memories of one type are compared by cosine similarity. Only memories
+    added since the last run are compared (against every memory of their
+    type), so a run costs new x total dot products; the first run
+    compares everything.
+
+        >= duplicate_similarity  same cluster; the cluster is merged into
+                                 its strongest memory (pinned first, then
+                                 importance * decay_score, then oldest)
+        >= link_similarity       "related" link, at most `max_links` per
+                                 new memory
+
+    With `merge_text` (list of contents -> merged text or None) and
+    `embed` the keeper's content is rewritten from the whole cluster and
+    re-embedded; otherwise it keeps its own text. Merged memories are
+    archived with merged_into set, never deleted.
+    """
+
+    def __init__(self, user_db, merge_text=None, embed=None):
+        self.user_db = user_db
+        self.merge_text = merge_text
+        self.embed = embed
+
+    def run(self, types=("summary", "fact"), duplicate_similarity=0.92, link_similarity=0.8,
+            max_links=5, use_model=False, block=1024):
+        started = time.perf_counter()
+        through = int(self.user_db.get_state(CONSOLIDATED_THROUGH) or 0)
+        result = {"compared": 0, "merged": 0, "rewritten": 0, "linked": 0}
+        newest = through
+
+        for type_ in types:
+            rows, matrix = self.user_db.memory_vectors(type_, newer_than=through)
+            if not rows:
+                continue
+            ids = np.array([r["id"] for r in rows], dtype=np.int64)
+            newest = max(newest, int(ids[-1]))
+            fresh = np.flatnonzero(ids > through)
+            if len(fresh) == 0:
+                continue
+            result["compared"] += len(fresh)
+
+            duplicates, related = self._pairs(matrix, fresh, duplicate_similarity, link_similarity, max_links, block)
+            merged_into = self._merge_clusters(rows, matrix, duplicates, duplicate_similarity, use_model, result)
+
+            # Links that pointed at a merged memory now point at its keeper
+            links = {
+                (int(ids[merged_into.get(i, i)]), int(ids[merged_into.get(j, j)]))
+                for i, j in related
+            }
+            result["linked"] += self.user_db.link_memories(links, "related")
+
+        if newest > through:
+            self.user_db.set_state(CONSOLIDATED_THROUGH, str(newest))
+        result["ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return result
+
+    # ============================================================
+    #                    SIMILARITY
+    # ============================================================
+    @staticmethod
+    def _pairs(matrix, fresh, duplicate_similarity, link_similarity, max_links, block):
+        """
+        Row-index pairs (i, j), i > j when both are fresh, split into
+        duplicates and related; related keeps each fresh row's best
+        `max_links`.
+        """
+        is_fresh = np.zeros(len(matrix), dtype=bool)
+        is_fresh[fresh] = True
+        duplicates, related = [], []
+
+        for start in range(0, len(fresh), block):
+            rows = fresh[start:start + block]
+            sims = matrix[rows] @ matrix.T
+            for offset, i in enumerate(rows):
+                scores = sims[offset]
+                # Each fresh/fresh pair once; never a row with itself
+                scores[i:][is_fresh[i:]] = -1.0
+                candidates = np.flatnonzero(scores >= link_similarity)
+                if len(candidates) == 0:
+                    continue
+                duplicates.extend((i, j) for j in candidates[scores[candidates] >= duplicate_similarity])
+
+                linkable = candidates[scores[candidates] < duplicate_similarity]
+                if len(linkable) > max_links:
+                    linkable = linkable[np.argpartition(-scores[linkable], max_links - 1)[:max_links]]
+                related.extend((i, j) for j in linkable)
+
+        return duplicates, related
+
+    # ============================================================
+    #                    MERGING
+    # ============================================================
+    def _merge_clusters(self, rows, matrix, duplicates, duplicate_similarity, use_model, result):
+        """Merge each duplicate cluster; returns {merged row: keeper row}."""
+        parent = {}
+
+        def find(i):
+            parent.setdefault(i, i)
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i, j in duplicates:
+            parent[find(i)] = find(j)
+
+        clusters = {}
+        for i in parent:
+            clusters.setdefault(find(i), []).append(i)
+
+        merged_into = {}
+        for members in clusters.values():
+            keeper = max(members, key=lambda i: (
+                rows[i]["pinned"], rows[i]["importance"] * rows[i]["decay_score"], -rows[i]["id"]
+            ))
+            # Chains can join memories that aren't alike; only fold true duplicates of the keeper
+            folded = [
+                i for i in members
+                if i != keeper
+                and not rows[i]["pinned"]
+                and float(matrix[i] @ matrix[keeper]) >= duplicate_similarity
+            ]
+            if not folded:
+                continue
+
+            content, embedding = None, None
+            if use_model and self.merge_text is not None and self.embed is not None:
+                content = self.merge_text([rows[i]["content"] for i in [keeper, *folded]])
+                if content:
+                    embedding = self.embed(content)
+                    result["rewritten"] += 1
+
+            result["merged"] += self.user_db.merge_memories(
+                rows[keeper]["id"], [rows[i]["id"] for i in folded], content, embedding
+            )
+            for i in folded:
+                merged_into[i] = keeper
+
+        return merged_into
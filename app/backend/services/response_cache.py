@@ -0,0 +1,137 @@
+import re
+import json
+import time
+import hashlib
+import numpy as np
+from backend.databases import vector_codec
+
+# Answers to these go stale with the clock
+VOLATILE = re.compile(
+    r"\b(now|current(ly)?|today|tonight|tomorrow|yesterday|what time|time is it|date|day of the week|"
+    r"this (morning|afternoon|evening|week|month|year)|(last|next) (week|month|year)|"
+    r"latest|recent(ly)?|news|weather|forecast)\b",
+    re.IGNORECASE
+)
+
+
+class ResponseCache:
+    """
+    Answers to repeated and near-duplicate prompts, kept in user.db.
+
+    An entry is keyed by a hash of the context the answer depended on
+    (flow, identity, system prompt, recent history and, for the thinking
+    flow, versions of the document and memory sets it retrieves from)
+    and matched by the embedding of the normalized prompt: an exact
+    normalized match, or cosine >= `similarity`, within the same context
+    is a hit. Entries live `ttl_s` from creation (`fast_ttl_s`
+    for the fast flow); past `max_entries` or `max_mb` the least recently
+    used go first. Prompts whose answer depends on when they're asked
+    (time, dates, news, weather...) are never cached.
+
+    Settings are read from response_cache_settings on every call, so
+    they can be changed at runtime.
+    """
+
+    def __init__(self, user_db, embed, settings):
+        self.user_db = user_db
+        self.embed = embed
+        self.settings = settings
+
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.last_lookup_ms = None
+
+    def _settings(self):
+        return self.settings.get_settings().get("response_cache_settings", {})
+
+    def enabled(self):
+        return self._settings().get("enabled", True)
+
+    # ============================================================
+    #                    KEYS
+    # ============================================================
+    @staticmethod
+    def cacheable(prompt: str) -> bool:
+        return not VOLATILE.search(prompt)
+
+    @staticmethod
+    def normalize(prompt: str) -> str:
+        prompt = re.sub(r"\s+", " ", prompt.strip().lower())
+        return prompt.rstrip(" ?!.")
+
+    @staticmethod
+    def context_key(context: dict) -> str:
+        payload = json.dumps(context, sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    # ============================================================
+    #                    LOOKUP / STORE
+    # ============================================================
+    def _ttl(self, flow):
+        cache_settings = self._settings()
+        ttl = cache_settings.get("ttl_s", 604800)
+        if flow == "fast":
+            ttl = min(ttl, cache_settings.get("fast_ttl_s", 3600))
+        return ttl
+
+    def lookup(self, prompt: str, context_key: str, flow: str = None):
+        """
+        (hit, probe): hit is {"id", "text", "similarity"} or None; pass
+        probe to store() so a miss isn't embedded twice.
+        """
+        started = time.perf_counter()
+        cache_settings = self._settings()
+        normalized = self.normalize(prompt)
+        embedding = np.asarray(self.embed(normalized), dtype=np.float32).reshape(-1)
+        probe = {"prompt": normalized, "embedding": embedding}
+
+        rows = self.user_db.cached_prompts(context_key, time.time() - self._ttl(flow))
+        match = next(((r["id"], 1.0) for r in rows if r["prompt"] == normalized), None)
+        if match is None and rows:
+            ranked = vector_codec.search(
+                embedding, [(r["id"], r["embedding"], r["embedding_format"]) for r in rows], 1
+            )
+            if ranked and ranked[0][1] >= cache_settings.get("similarity", 0.95):
+                match = (ranked[0][0], float(ranked[0][1]))
+
+        hit = None
+        if match is not None:
+            text = self.user_db.cached_response(match[0])
+            if text is not None:
+                hit = {"id": match[0], "text": text, "similarity": match[1]}
+                self.user_db.touch_cached_response(hit["id"], time.time())
+
+        if hit is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+        self.last_lookup_ms = round((time.perf_counter() - started) * 1000, 3)
+        return hit, probe
+
+    def store(self, probe: dict, context_key: str, text: str, flow: str):
+        cache_settings = self._settings()
+        now = time.time()
+        self.user_db.add_cached_response(context_key, flow, probe["prompt"], probe["embedding"], text, now)
+        self.stored += 1
+        self.user_db.evict_cached_responses(
+            now - cache_settings.get("ttl_s", 604800),
+            cache_settings.get("max_entries", 2000),
+            cache_settings.get("max_mb", 16) * 1024 * 1024
+        )
+
+    def clear(self):
+        self.user_db.clear_cached_responses()
+
+    # ============================================================
+    #                    METRICS
+    # ============================================================
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "stored": self.stored,
+            "last_lookup_ms": self.last_lookup_ms
+        }
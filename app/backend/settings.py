@@ -44,13 +44,35 @@ class Settings(QObject):
             },
             "generate_settings": {
                 "streamer": True,
+                "pipeline_prefill": True, # Prefill thinking prompt while RAG/memory run
+                "background_follow_ups": True, # Summaries/titles queued until no turn is running
+                "follow_up_idle_s": 1.0,
+                "router": "embedding", # embedding (nearest intent centroid) or keywords
+                "router_margins": {"thinking": 0.0}, # Added to a flow's similarity; negative keeps borderline prompts on fast
+                "adaptive_routing": True, # Thinking turns fall back to fast when the model is missing or busy
+                "latency_slo_ms": 30000, # Estimated turn latency above which thinking is degraded
                 "use_emojis": False, # Planned
                 # "stream_when": "thinking, instruct, or both"
             },
+            "response_cache_settings": {
+                "enabled": True, # Reuse answers to repeated and near-duplicate prompts
+                "similarity": 0.95, # Cosine between normalized prompts that counts as the same question
+                "ttl_s": 604800,
+                "fast_ttl_s": 3600, # Fast answers lean on the conversation more than on documents
+                "max_entries": 2000,
+                "max_mb": 16
+            },
             "rag_settings": {
                 "enabled": True,
-                "weight": 0.7,
+                "hybrid": True, # Fuse BM25 keyword ranking with embeddings
+                "weight": 0.7, # Share of the fused score given to embeddings
+                "rrf_k": 60,
                 "rerank": True,
+                "rerank_method": "auto", # cross_encoder when a reranker model is configured, else mmr
+                "rerank_candidates": 20, # Over-fetched from the fused ranking
+                "rerank_batch_size": 16,
+                "rerank_budget_ms": 150, # Unscored candidates keep their fused order
+                "mmr_lambda": 0.7, # 1.0 = relevance only, lower = more diverse
                 "min_score": 0.3
             },
             "embedding_settings": {
@@ -61,22 +83,60 @@ class Settings(QObject):
             },
             "max_tasks": {
                 "ai_tasks": 3,
+                "ai_queue": 16, # Turns allowed to wait for an ai_tasks slot
                 "system_tasks": 2,
                 "async_tasks": 1
             },
             "summary_settings": {
                 "max_messages": 8,
                 "keep_fresh": 3, # Out of "max_message" keep (amount) fresh
-                "summary_token_threshold": 2500
+                "summary_token_threshold": 2500,
+                "mode": "hierarchical", # hierarchical (rolling, stored per chat) | replace
+                "level_max_tokens": 512, # A summary level over this is condensed into the next
+                "max_levels": 3
+            },
+            "maintenance": {
+                "enabled": True,
+                "check_interval_s": 30,
+                "idle_after_s": 60, # No turn running or started for this long
+                "memory_every_s": 3600, # Decay + prune
+                "database_every_s": 21600, # ANALYZE, WAL checkpoint, VACUUM when fragmented
+                "decay_half_life_days": 30,
+                "access_boost": 1.1, # Per retrieval hit
+                "max_decay_score": 2.0,
+                "prune_below": 0.05, # importance * decay_score
+                "prune_mode": "archive", # archive | delete
+                "consolidate_every_s": 3600, # Merge near-duplicate memories, link related ones
+                "duplicate_similarity": 0.92, # Cosine at or above this is the same memory
+                "link_similarity": 0.8, # Cosine at or above this gets a "related" link
+                "max_links_per_memory": 5,
+                "merge_with_model": False, # Rewrite merged memories with the instruct model
+                "vacuum_free_ratio": 0.2,
+                "integrity_every_s": 604800, # Full integrity_check; startup only quick_checks after a crash
+                "backup_every_s": 21600,
+                "backup_pages_per_step": 256, # Online backup copies this many pages between yields
+                "backup_keep_last": 3,
+                "backup_keep_daily": 7,
+                "backup_keep_weekly": 4
+            },
+            "cache_settings": {
+                "max_cached_messages": 2000, # Across all chats kept in memory
+                "max_cached_mb": 8
             },
             "tool_settings": {
+                "max_parallel": 4, # Tool calls from one response run at once
+                "timeout_s": 10, # Per call; a tool's own timeout_s overrides it
                 "search_files": {
                     "active": True,
                     "max_results": 10,
                     "search_path": os.path.expanduser("~"),
                     "restricted_paths": [],
                     "max_file_size_mb": 20,
-                    "can_search_sub_directories": True
+                    "can_search_sub_directories": True,
+                    "index_hidden_dirs": False, # Dot-directories (.cache, .git...) stay out of the file index
+                    "rescan_every_s": 600,
+                    "index_contents": True, # Text files are also searchable by what they contain
+                    "content_max_kb": 1024 # Only the start of larger files is indexed
                 },
                 "web_search": {
                     "active": True,
@@ -86,7 +146,8 @@ class Settings(QObject):
             "ui": {
                 "theme": "light", # light mode
                 "font-size": 14,
-                "markdown": True
+                "markdown": True,
+                "message_page_size": 50 # Messages loaded per scroll-back page
             },
             "error_popups": True,
             "debug": {
@@ -1,10 +1,59 @@
 import os
 from backend.settings import Settings
 
-def search_files(query: str, settings: Settings):
+def search_files(query: str, settings: Settings, index=None):
+    """
+    Files under search_path whose name contains `query`, then files whose
+    text matches it (best first), with a snippet of the match in
+    "snippets".
+
+    Served from the FileIndex once it has scanned search_path; until then
+    (or without one) the directory tree is walked, by name only.
+    """
     search_settings = settings.get_settings()["tool_settings"]["search_files"]
     max_results = search_settings.get("max_results", 50)
-    search_path = search_settings.get("search_path", os.path.expanduser("~"))
+    snippets = {}
+
+    if index is not None and index.ready():
+        matches = index.search(query, max_results)
+        if len(matches) < max_results and search_settings.get("index_contents", True):
+            named = set(matches)
+            for hit in index.search_contents(query, max_results):
+                if hit["path"] in named:
+                    continue
+                matches.append(hit["path"])
+                snippets[hit["path"]] = hit["snippet"]
+                if len(matches) >= max_results:
+                    break
+    else:
+        matches = _walk(query, search_settings, max_results)
+
+    if len(matches) >= max_results:
+        return {
+            "success": True,
+            "message": f"Showing first {max_results} file(s)",
+            "data": matches,
+            "snippets": snippets
+        }
+    if matches:
+        return {
+            "success": True,
+            "message": f"Found {len(matches)} file(s)",
+            "data": matches,
+            "snippets": snippets
+        }
+    else:
+        return {
+            "success": False,
+            "message": "No files found matching query"
+        }
+
+def _walk(query, search_settings, max_results):
+    search_path = os.path.abspath(os.path.expanduser(search_settings.get("search_path", "~")))
+    restricted = tuple(
+        os.path.abspath(os.path.expanduser(p)) for p in search_settings.get("restricted_paths", [])
+    )
+    max_size = search_settings.get("max_file_size_mb", 20) * 1024 * 1024
     can_search_sub_directories = search_settings.get(
         "can_search_sub_directories", True
     )
@@ -12,29 +61,23 @@ def search_files(query: str, settings: Settings):
     query_lower = query.lower()
 
     for root, dirs, files in os.walk(search_path):
-        if can_search_sub_directories and dirs:
+        if not can_search_sub_directories:
             dirs[:] = []
+        else:
+            dirs[:] = [d for d in dirs if not _restricted(os.path.join(root, d), restricted)]
         for f in files:
             if query_lower in f.lower():
-                matches.append(os.path.join(root, f))
+                path = os.path.join(root, f)
+                try:
+                    if os.path.getsize(path) > max_size:
+                        continue
+                except OSError:
+                    continue
+                matches.append(path)
 
                 if len(matches) >= max_results:
-                    return {
-                        "success": True,
-                        "message": f"Showing first {max_results} file(s)",
-                        "data": matches
-                    }
+                    return matches
+    return matches
 
-
-
-    if matches:
-        return {
-            "success": True,
-            "message": f"Found {len(matches)} file(s)",
-            "data": matches
-        }
-    else:
-        return {
-            "success": False,
-            "message": "No files found matching query"
-        }
\ No newline at end of file
+def _restricted(path, restricted):
+    return any(path == r or path.startswith(r.rstrip(os.sep) + os.sep) for r in restricted)
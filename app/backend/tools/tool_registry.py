@@ -18,6 +18,27 @@ def get_available_tools():
                 }
             }
         },
+        {
+            "type": "function",
+            "function": {
+                "name": "search_history",
+                "description": "Search past chat messages and notes for something the user said or saved earlier.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "query": {
+                            "type": "string",
+                            "description": "Words to look for in past chats and notes"
+                        },
+                        "limit": {
+                            "type": "integer",
+                            "description": "Maximum number of results (default 8)"
+                        }
+                    },
+                    "required": ["query"]
+                }
+            }
+        },
         {
             "type": "function",
             "function": {
@@ -0,0 +1,8 @@
+"""
+Benchmarks for the storage and retrieval paths.
+
+Run from app/, e.g. `python -m benchmarks.query_plans --messages 1000000`.
+Each script builds its own corpus in a temporary directory, prints
+timings and exits non-zero when an assertion about the plan or the
+results fails.
+"""
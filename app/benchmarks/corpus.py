@@ -0,0 +1,58 @@
+import time
+import random
+import statistics
+
+# A Zipf-ish vocabulary: a few common words, a long tail of rare ones
+COMMON = (
+    "the a to and of i you it is in that for on with my this can me what how do be "
+    "have not was are just so but at about like an your if or will would there"
+).split()
+TOPICS = (
+    "invoice budget lease landlord deposit refund meeting agenda dentist appointment recipe "
+    "lasagna kubernetes migration backup server password router printer vacation flight hotel "
+    "passport insurance mortgage salary taxes receipt garden tomato bicycle marathon guitar"
+).split()
+
+
+def sentence(rng, words=24):
+    out = []
+    for _ in range(words):
+        r = rng.random()
+        if r < 0.6:
+            out.append(rng.choice(COMMON))
+        elif r < 0.8:
+            out.append(rng.choice(TOPICS))
+        else:
+            out.append(f"w{int(rng.paretovariate(1.2)) % 50000}")
+    return " ".join(out)
+
+
+def seed_messages(conn, table, chat_column, chats, messages, seed=1, batch=20000):
+    """
+    `messages` rows spread over `chats` chats in `table`, with created_at
+    one second apart so the order columns matter. Returns rows/s.
+    """
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    base = 1_700_000_000
+    for start in range(0, messages, batch):
+        rows = [
+            (i % chats + 1, "user" if i % 2 == 0 else "assistant", sentence(rng),
+             time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(base + i)))
+            for i in range(start, min(start + batch, messages))
+        ]
+        conn.executemany(
+            f"INSERT INTO {table} ({chat_column}, role, content, created_at) VALUES (?, ?, ?, ?)", rows
+        )
+    return messages / (time.perf_counter() - started)
+
+
+def timed(fn, runs=20):
+    """(p50 ms, p99 ms, last result) over `runs` calls."""
+    samples, result = [], None
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[min(len(samples) - 1, int(len(samples) * 0.99))], result
@@ -0,0 +1,144 @@
+"""
+Content search over local files (FileIndex, files.db schema v2) against
+reading and grepping every file, plus indexing throughput.
+
+Builds a tree of text, Markdown, HTML, source and binary files and
+checks that:
+    - only text-like files are indexed, with HTML tags stripped;
+    - restricted_paths never show up;
+    - an edit in place is picked up by the next scan;
+    - a query for a planted letter ranks it first.
+
+    python -m benchmarks.file_search [--dirs 100] [--files-per-dir 50]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+from backend.settings import Settings
+from backend.databases.system_db import SystemDatabase
+from backend.services.file_index import FileIndex
+from backend.tools.search_files import search_files
+
+VOCAB = [f"w{i}" for i in range(5000)] + (
+    "quarterly budget invoice lease deposit meeting agenda kubernetes migration "
+    "tax refund receipt dentist appointment recipe lasagna"
+).split()
+EXTENSIONS = [".txt", ".md", ".html", ".py", ".pdf", ".bin"]
+QUERIES = ["security deposit", "quarterly budget", "kubernetes migration", "dentist appointment",
+           "lasagna recipe", "tax refund receipt", "w17 w4000"]
+LETTER = "Dear landlord, the security deposit refund for the lease is still outstanding."
+
+
+def build_tree(root, dirs, files_per_dir, rng):
+    for d in range(dirs):
+        path = os.path.join(root, f"d{d}")
+        os.makedirs(path)
+        for f in range(files_per_dir):
+            extension = rng.choice(EXTENSIONS)
+            body = " ".join(rng.choice(VOCAB) for _ in range(rng.randint(200, 1500)))
+            with open(os.path.join(path, f"file_{d}_{f}{extension}"), "wb") as fh:
+                if extension == ".html":
+                    fh.write(f"<html><body><p>{body}</p></body></html>".encode())
+                elif extension == ".bin":
+                    fh.write(b"\0\1\2" + body.encode())
+                else:
+                    fh.write(body.encode())
+    with open(os.path.join(root, "d0", "landlord_letter.txt"), "w") as fh:
+        fh.write(LETTER)
+    os.makedirs(os.path.join(root, "secret"))
+    with open(os.path.join(root, "secret", "deposit.txt"), "w") as fh:
+        fh.write("security deposit, restricted copy")
+
+
+def grep(root, query):
+    words = query.lower().split()
+    hits = []
+    for directory, _, files in os.walk(root):
+        for name in files:
+            with open(os.path.join(directory, name), "rb") as fh:
+                text = fh.read().decode("utf-8", "ignore").lower()
+            if all(word in text for word in words):
+                hits.append(name)
+    return hits
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dirs", type=int, default=100)
+    parser.add_argument("--files-per-dir", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    tmp = tempfile.mkdtemp(prefix="omni-bench-")
+    root = os.path.join(tmp, "tree")
+    build_tree(root, args.dirs, args.files_per_dir, rng)
+    total_mb = sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(root) for f in fs) / 1e6
+
+    settings = Settings(None, {}, SystemDatabase(os.path.join(tmp, "system.db")))
+    search_settings = settings.get_settings()["tool_settings"]["search_files"]
+    search_settings.update(search_path=root, restricted_paths=[os.path.join(root, "secret")], max_results=10)
+    index = FileIndex(os.path.join(tmp, "files.db"), settings)
+    failures = []
+
+    grep_ms = []
+    for query in QUERIES[:3]:
+        started = time.perf_counter()
+        grep(root, query)
+        grep_ms.append((time.perf_counter() - started) * 1000)
+
+    scan = index.scan()
+    contents = scan["contents"]
+    seconds = contents["ms"] / 1000
+    print(f"{args.dirs * args.files_per_dir + 2} files, {total_mb:.1f} MB")
+    print(f"first scan: names {scan['ms']:.0f} ms; contents {contents['indexed']}/{contents['checked']} files "
+          f"in {contents['ms']:.0f} ms = {contents['checked'] / seconds:.0f} files/s, {contents['bytes'] / 1e6 / seconds:.1f} MB/s")
+    scan = index.scan()
+    print(f"rescan, nothing changed: names {scan['ms']:.1f} ms, contents {scan['contents']['checked']} files")
+
+    edited = [os.path.join(root, f"d{d}", name) for d in (1, 2, 3)
+              for name in sorted(os.listdir(os.path.join(root, f"d{d}"))) if name.endswith(".txt")][:3]
+    for path in edited:
+        with open(path, "a") as fh:
+            fh.write(" zebracorn")
+    scan = index.scan()
+    print(f"rescan, {len(edited)} files edited: names {scan['ms']:.1f} ms, "
+          f"contents {scan['contents']['indexed']} re-indexed in {scan['contents']['ms']:.1f} ms")
+    if sorted(h["path"] for h in index.search_contents("zebracorn")) != sorted(edited):
+        failures.append("edits in place were not re-indexed")
+
+    latencies = []
+    for _ in range(300):
+        query = rng.choice(QUERIES + [" ".join(rng.sample(VOCAB[:5000], 2))])
+        started = time.perf_counter()
+        index.search_contents(query, 10)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    print(f"content query p50 {statistics.median(latencies):.2f} ms p99 {latencies[int(len(latencies) * 0.99)]:.2f} ms"
+          f" | read + grep every file {statistics.median(grep_ms):.0f} ms")
+
+    top = index.search_contents("security deposit refund")
+    if not top or os.path.basename(top[0]["path"]) != "landlord_letter.txt":
+        failures.append(f"planted letter not ranked first: {top[:1]}")
+    if any("secret" in hit["path"] for hit in index.search_contents("security deposit")):
+        failures.append("restricted path in results")
+    if any(hit["path"].endswith((".bin", ".pdf")) for hit in index.search_contents("quarterly budget", 50)):
+        failures.append("binary files indexed")
+    if index.search_contents("html body"):
+        failures.append("HTML tags indexed as text")
+    result = search_files("lasagna", settings, index)
+    if not result["success"] or not result.get("snippets"):
+        failures.append("search_files returned no content matches")
+
+    index.close()
+    if failures:
+        print("\n".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Full-text search over chat history (system.db schema v2, FTS5) against
+the LIKE scan it replaced, at a million messages.
+
+Checks that every hit contains the query terms, that hits come back
+best bm25 first, and that the plan goes through the FTS index.
+
+    python -m benchmarks.history_search [--messages 1000000] [--chats 10000] [--notes 10000]
+"""
+import os
+import re
+import sys
+import random
+import argparse
+import tempfile
+
+from backend.databases.system_db import SystemDatabase
+from benchmarks.corpus import seed_messages, sentence, timed
+
+QUERIES = [
+    "lisbon",                  # 25 planted messages
+    "lisbon itinerary",        # two terms, implicit AND
+    "lisb",                    # partially typed; the last term is a prefix
+    "landlord refund",         # topic words, thousands of hits to rank
+    "deposit",                 # one topic word, the worst realistic case
+    "zzzunknown",              # no hits
+]
+PLANTED = "our lisbon itinerary: tram 28, belem on tuesday, then the night train to porto"
+
+
+def like_scan(conn, query):
+    # What search did before: every row read, matches unranked
+    terms = query.split()
+    sql = "SELECT COUNT(*) FROM messages WHERE " + " AND ".join("content LIKE ?" for _ in terms)
+    return conn.execute(sql, [f"%{t}%" for t in terms]).fetchone()[0]
+
+
+def contains_terms(text, query):
+    # Porter stems and the trailing prefix match: each term's stem starts some word
+    words = re.findall(r"\w+", text.lower())
+    return all(any(word.startswith(term[:4]) for word in words) for term in query.lower().split())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--chats", type=int, default=10_000)
+    parser.add_argument("--notes", type=int, default=10_000)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="omni-bench-")
+    db = SystemDatabase(os.path.join(tmp, "system.db"))
+    rng = random.Random(2)
+    with db.pool.writer() as conn:
+        conn.executemany("INSERT INTO chats (title) VALUES (?)", [(f"chat {i}",) for i in range(args.chats)])
+        rate = seed_messages(conn, "messages", "chat_id", args.chats, args.messages)
+        conn.executemany(
+            "INSERT INTO messages (chat_id, role, content) VALUES (?, 'user', ?)",
+            [(rng.randrange(args.chats) + 1, PLANTED) for _ in range(25)]
+        )
+        conn.executemany(
+            "INSERT INTO notes (title, content) VALUES (?, ?)",
+            [(sentence(rng, 4), sentence(rng, 60)) for _ in range(args.notes)]
+        )
+    size_mb = os.path.getsize(os.path.join(tmp, "system.db")) / 1e6
+    print(f"{args.messages} messages + {args.notes} notes indexed at {rate:.0f} messages/s, system.db {size_mb:.0f} MB")
+
+    conn = db.pool.reader()
+    fts_plan = [row[3] for row in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT rowid FROM messages_fts WHERE messages_fts MATCH 'deposit' ORDER BY bm25(messages_fts) LIMIT 20"
+    )]
+    failures = []
+    if not any("VIRTUAL TABLE INDEX" in d for d in fts_plan):
+        failures.append(f"FTS plan: {fts_plan}")
+
+    for query in QUERIES:
+        p50, p99, hits = timed(lambda: db.search_history(query), runs=20)
+        like_p50, _, matches = timed(lambda: like_scan(conn, query), runs=3)
+        print(f"{query!r:20} {len(hits):3} hits  fts p50 {p50:7.2f} ms p99 {p99:7.2f} ms  | LIKE scan {like_p50:7.1f} ms ({matches} rows)")
+
+        scores = [h["score"] for h in hits]
+        if scores != sorted(scores):
+            failures.append(f"{query!r}: hits not ordered by bm25")
+        if query.startswith("lisb") and len(hits) < 20:
+            failures.append(f"{query!r}: planted messages not found ({len(hits)} hits)")
+        for hit in hits:
+            if hit["type"] == "message":
+                text = conn.execute("SELECT content FROM messages WHERE id = ?", (hit["id"],)).fetchone()[0]
+            else:
+                text = " ".join(conn.execute("SELECT title, content FROM notes WHERE id = ?", (hit["id"],)).fetchone())
+            if not contains_terms(text, query):
+                failures.append(f"{query!r}: hit {hit['type']} {hit['id']} lacks the query terms")
+                break
+
+    db.close()
+    if failures:
+        print("\n".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
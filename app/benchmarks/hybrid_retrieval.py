@@ -0,0 +1,112 @@
+"""
+Recall and latency of RAGPipeline.retrieve, dense-only against hybrid
+BM25 + dense fusion (user.db schema v2, rag_settings.hybrid).
+
+No embedding model is needed: every chunk gets its own random concept
+vector, and a table embedder answers queries from precomputed vectors.
+    paraphrase queries  near the target's vector, no words in common
+    identifier queries  name the chunk's file, nearly orthogonal to it
+Hybrid has to keep paraphrase recall and recover the identifiers.
+
+    python -m benchmarks.hybrid_retrieval [--chunks 5000] [--queries 200] [--dim 384]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+import numpy as np
+
+from backend.settings import Settings
+from backend.ai.rag_pipeline import RAGPipeline
+from backend.databases import vector_codec
+from backend.databases.system_db import SystemDatabase
+from backend.databases.user_db import UserDatabase
+
+
+class TableEmbedder:
+    def __init__(self):
+        self.table = {}
+
+    def embed(self, texts):
+        if isinstance(texts, str):
+            texts = [texts]
+        return np.array([self.table[t] for t in texts])
+
+
+def unit(v):
+    return (v / np.linalg.norm(v)).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    rand = random.Random(0)
+    vocab = [f"word{i}" for i in range(3000)]
+    tmp = tempfile.mkdtemp(prefix="omni-bench-")
+
+    user_db = UserDatabase(os.path.join(tmp, "user.db"))
+    document_id = user_db.create_document("bench")
+    concepts = [unit(rng.normal(size=args.dim)) for _ in range(args.chunks)]
+    identifiers = [f"cfg_loader_{i}.py" for i in range(args.chunks)]
+    with user_db.pool.writer() as conn:
+        conn.executemany(
+            "INSERT INTO document_chunks (document_id, content, embedding, embedding_format, chunk_index) VALUES (?, ?, ?, ?, ?)",
+            [
+                (document_id, " ".join(rand.choices(vocab, k=60)) + f" see {identifiers[i]} for details",
+                 vector_codec.encode(concepts[i], user_db.embedding_format), user_db.embedding_format, i)
+                for i in range(args.chunks)
+            ]
+        )
+    user_db.close()
+    # Reopened so the vector store picks the bulk insert up
+    user_db = UserDatabase(os.path.join(tmp, "user.db"))
+    chunk_ids = [r[0] for r in user_db.pool.reader().execute("SELECT id FROM document_chunks ORDER BY chunk_index")]
+
+    embedder = TableEmbedder()
+    queries = []
+    for target in rand.sample(range(args.chunks), args.queries):
+        query = f"explain the idea behind item q{target}"
+        embedder.table[query] = unit(concepts[target] + rng.normal(size=args.dim) * 0.08)
+        queries.append(("paraphrase", query, chunk_ids[target]))
+        query = f"where is {identifiers[target]} loaded"
+        embedder.table[query] = unit(concepts[target] * 0.1 + rng.normal(size=args.dim) * 0.1)
+        queries.append(("identifier", query, chunk_ids[target]))
+
+    settings = Settings(None, {}, SystemDatabase(os.path.join(tmp, "system.db")))
+    rag_settings = settings.get_settings()["rag_settings"]
+    top_k = settings.get_settings()["embedding_settings"].get("top_k", 5)
+    rag = RAGPipeline(user_db, embedder, settings)
+
+    recall = {}
+    for label, hybrid, weight in (("dense only", False, 0.7), ("hybrid w=0.7", True, 0.7), ("hybrid w=0.5", True, 0.5)):
+        rag_settings.update(hybrid=hybrid, weight=weight)
+        found = {"paraphrase": 0, "identifier": 0}
+        latencies = []
+        for kind, query, target in queries:
+            started = time.perf_counter()
+            chunks = rag.retrieve(query)
+            latencies.append((time.perf_counter() - started) * 1000)
+            found[kind] += any(chunk["id"] == target for chunk in chunks)
+        recall[label] = {kind: hits / args.queries for kind, hits in found.items()}
+        print(
+            f"{label:13} recall@{top_k} paraphrase {recall[label]['paraphrase']:.2f} "
+            f"identifier {recall[label]['identifier']:.2f}  p50 {statistics.median(latencies):.1f} ms"
+        )
+
+    user_db.close()
+    dense, hybrid = recall["dense only"], recall["hybrid w=0.7"]
+    if hybrid["identifier"] < 0.9 or hybrid["paraphrase"] < dense["paraphrase"] - 0.02:
+        print("Hybrid retrieval lost recall")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Accuracy of the embedding intent router (IntentRouter) against the
+keyword lists it replaced, on a labeled set of held-out prompts: none
+of them is an exemplar the centroids were built from.
+
+Reports accuracy, how many prompts took the two-model thinking flow
+(and how many of those shouldn't have), route latency and centroid
+build time. Exits 1 if the embedding router is less accurate than the
+keywords or sends more prompts to thinking by mistake.
+
+    python -m benchmarks.intent_routing [--model models/embeddings/bge-small-en-v1.5]
+    python -m benchmarks.intent_routing --hashed        # no model: hashed n-gram features
+"""
+import os
+import re
+import sys
+import time
+import hashlib
+import argparse
+import tempfile
+
+import numpy as np
+
+from backend.ai.orchestrator import Orchestrator
+from backend.ai.intent_router import IntentRouter
+
+# 85 prompts: 40 fast, 25 thinking, 20 tool
+LABELED = [
+    # fast
+    ("fast", "hey there"),
+    ("fast", "thanks a lot"),
+    ("fast", "what's the time in Tokyo?"),
+    ("fast", "can you tell me your name?"),
+    ("fast", "what is the capital of Japan?"),
+    ("fast", "translate thank you to French"),
+    ("fast", "give me an antonym for cold"),
+    ("fast", "tell me a fun fact"),
+    ("fast", "how do you spell rhythm?"),
+    ("fast", "what's 20% of 150?"),
+    ("fast", "define entropy in one line"),
+    ("fast", "good night"),
+    ("fast", "ok thanks"),
+    ("fast", "can you make that shorter?"),
+    ("fast", "recommend a book for the weekend"),
+    ("fast", "write a short poem about the sea"),
+    ("fast", "convert 10 pounds to kilograms"),
+    ("fast", "what is a verb?"),
+    ("fast", "how are you?"),
+    ("fast", "who wrote Hamlet?"),
+    ("fast", "what does CPU stand for?"),
+    ("fast", "can you name three colors?"),
+    ("fast", "what year did the Berlin wall fall?"),
+    ("fast", "say hi to my friend"),
+    ("fast", "what is my name?"),
+    ("fast", "can you help me?"),
+    ("fast", "what time does the sun set usually?"),
+    ("fast", "nice, that works"),
+    ("fast", "give me a random number"),
+    ("fast", "what's the plural of mouse?"),
+    ("fast", "can you repeat that?"),
+    ("fast", "what is the boiling point of water?"),
+    ("fast", "good afternoon!"),
+    ("fast", "tell me a riddle"),
+    ("fast", "what's the square root of 144?"),
+    ("fast", "who is the president of France?"),
+    ("fast", "how many days in a leap year?"),
+    ("fast", "summarize that in one sentence"),
+    ("fast", "what does LOL mean?"),
+    ("fast", "can you use fewer words?"),
+    # thinking
+    ("thinking", "compare Rust and Go for building a network service and recommend one"),
+    ("thinking", "design a database schema for a multi-tenant SaaS app"),
+    ("thinking", "debug why my Node server leaks memory under load"),
+    ("thinking", "analyze the pros and cons of index funds versus picking stocks"),
+    ("thinking", "prove that there are infinitely many primes"),
+    ("thinking", "plan a two week trip to Japan on a budget"),
+    ("thinking", "explain step by step how garbage collection works in Java"),
+    ("thinking", "optimize this Python loop that processes a million rows"),
+    ("thinking", "help me structure my thesis on renewable energy policy"),
+    ("thinking", "why does my Docker container keep restarting and how do I fix it?"),
+    ("thinking", "evaluate whether I should refinance my mortgage given rates"),
+    ("thinking", "derive the formula for compound interest"),
+    ("thinking", "what are the trade-offs between REST and GraphQL for a mobile app?"),
+    ("thinking", "solve: if 3x + 5 = 2x - 7, what is x and why?"),
+    ("thinking", "refactor this function to remove duplication and explain"),
+    ("thinking", "architect a real-time chat system for a million users"),
+    ("thinking", "figure out why my tests pass locally but fail in CI"),
+    ("thinking", "write a detailed project plan for migrating to the cloud"),
+    ("thinking", "reason about what would happen if the moon disappeared"),
+    ("thinking", "compare three laptops for machine learning work and pick the best"),
+    ("thinking", "analyze the time complexity of quicksort in the worst case"),
+    ("thinking", "how should I design rate limiting for a public API?"),
+    ("thinking", "walk me through setting up a CI pipeline with caching"),
+    ("thinking", "predict the impact of remote work on city real estate"),
+    ("thinking", "debug this race condition in my Go worker pool"),
+    # tool
+    ("tool", "search my files for the lease agreement"),
+    ("tool", "find the PDF named budget_2024"),
+    ("tool", "look for documents mentioning the quarterly review"),
+    ("tool", "open my notes from the standup"),
+    ("tool", "where did I save the tax forms?"),
+    ("tool", "search the web for the weather in Paris tomorrow"),
+    ("tool", "look up the latest news on electric cars"),
+    ("tool", "find all word documents in my downloads"),
+    ("tool", "search for photos from my birthday"),
+    ("tool", "locate the nginx config file"),
+    ("tool", "find the presentation I edited yesterday"),
+    ("tool", "search online for flight prices to Rome"),
+    ("tool", "which of my files mention docker?"),
+    ("tool", "look through my desktop for the screenshot"),
+    ("tool", "search my computer for csv files"),
+    ("tool", "find the invoice from the plumber"),
+    ("tool", "browse the web for reviews of noise cancelling headphones"),
+    ("tool", "search files named notes"),
+    ("tool", "find my passport scan"),
+    ("tool", "look up who won the game last night"),
+]
+
+STOPWORDS = set("a an the to of for in on and or is are my me i you it this that with be do does what how can".split())
+
+
+class HashedEmbedder:
+    """Word, bigram and prefix features hashed into 512 dims; a stand-in when no model is available."""
+    model_name = "hashed-ngrams-512"
+    dim = 512
+
+    def embed(self, texts):
+        if isinstance(texts, str):
+            texts = [texts]
+        out = []
+        for text in texts:
+            words = re.findall(r"[a-z0-9']+", text.lower())
+            features = [(w, 0.3 if w in STOPWORDS else 1.0) for w in words]
+            features += [(a + "_" + b, 0.7) for a, b in zip(words, words[1:])]
+            features += [("p:" + w[:5], 0.6) for w in words if len(w) > 4]
+            vector = np.zeros(self.dim, np.float32)
+            for feature, weight in features:
+                h = int(hashlib.md5(feature.encode()).hexdigest(), 16)
+                vector[h % self.dim] += weight * (1 if (h >> 20) & 1 else -1)
+            norm = np.linalg.norm(vector)
+            out.append(vector / norm if norm else vector)
+        return np.array(out)
+
+
+def summarize(name, routed):
+    labels = [label for label, _ in LABELED]
+    accuracy = np.mean([a == b for a, b in zip(routed, labels)])
+    thinking = sum(flow == "thinking" for flow in routed)
+    wrong = sum(flow == "thinking" and label != "thinking" for flow, label in zip(routed, labels))
+    print(f"{name:26} acc {accuracy:.2f}  thinking runs {thinking:2} ({wrong} wrong)")
+    return accuracy, wrong
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="models/embeddings/bge-small-en-v1.5")
+    parser.add_argument("--hashed", action="store_true", help="use hashed n-gram features instead of a model")
+    parser.add_argument("--thinking-margin", type=float, default=-0.02)
+    args = parser.parse_args()
+
+    if args.hashed:
+        embedder = HashedEmbedder()
+    else:
+        from backend.ai.embeddings_engine import EmbeddingEngine
+        embedder = EmbeddingEngine({"model": args.model})
+
+    # The keyword checks only read the prompt
+    keywords = Orchestrator.__new__(Orchestrator)
+    def keyword_route(prompt):
+        if keywords.tool_needed(prompt):
+            return "tool"
+        if keywords.need_thinking(prompt):
+            return "thinking"
+        return "fast"
+
+    cache_path = os.path.join(tempfile.mkdtemp(prefix="omni-bench-"), "intent_centroids.npz")
+    started = time.perf_counter()
+    IntentRouter(embedder, cache_path=cache_path).centroids()
+    cold_ms = (time.perf_counter() - started) * 1000
+    router = IntentRouter(embedder, cache_path=cache_path)
+    started = time.perf_counter()
+    router.centroids()
+    cached_ms = (time.perf_counter() - started) * 1000
+
+    embeddings = embedder.embed([prompt for _, prompt in LABELED])
+    routed, latencies = [], []
+    for (_, prompt), embedding in zip(LABELED, embeddings):
+        started = time.perf_counter()
+        routed.append(router.route(prompt, embedding=embedding))
+        latencies.append((time.perf_counter() - started) * 1000)
+    margin = {"thinking": args.thinking_margin}
+    leaning = [router.route(prompt, embedding=e, margins=margin) for (_, prompt), e in zip(LABELED, embeddings)]
+
+    print(f"{len(LABELED)} prompts, embedder {embedder.model_name}")
+    keyword_accuracy, keyword_wrong = summarize("keyword router", [keyword_route(p) for _, p in LABELED])
+    accuracy, wrong = summarize("embedding router", routed)
+    summarize(f"embedding, thinking {args.thinking_margin:+.2f}", leaning)
+    print(f"route after embedding p50 {np.percentile(latencies, 50):.3f} ms; centroids {cold_ms:.1f} ms cold, {cached_ms:.1f} ms from disk")
+
+    if accuracy < keyword_accuracy or wrong > keyword_wrong:
+        print("The embedding router does worse than the keyword lists")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
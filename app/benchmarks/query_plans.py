@@ -0,0 +1,104 @@
+"""
+EXPLAIN QUERY PLAN checks for the hot chat, message and log queries
+(the indexes added by system.db/user.db schema v1), with timings.
+
+Every query is captured from the real SystemDatabase/UserDatabase
+method through a trace callback, so the plan checked is the plan of the
+SQL that ships. A plan has to use the named index and must not sort
+through a temporary B-tree.
+
+    python -m benchmarks.query_plans [--messages 1000000] [--chats 10000] [--logs 200000]
+"""
+import os
+import sys
+import argparse
+import tempfile
+
+from backend.databases.system_db import SystemDatabase
+from backend.databases.user_db import UserDatabase
+from benchmarks.corpus import seed_messages, timed
+
+
+def captured_sql(conn, call):
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        call()
+    finally:
+        conn.set_trace_callback(None)
+    return [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+
+
+def plan(conn, sql):
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+
+
+def check(name, conn, call, index, runs=20):
+    statements = captured_sql(conn, call)
+    details = [d for sql in statements for d in plan(conn, sql)]
+    p50, p99, _ = timed(call, runs)
+    ok = any(f"USING INDEX {index}" in d or f"USING COVERING INDEX {index}" in d for d in details) \
+        and not any("TEMP B-TREE" in d for d in details)
+    print(f"{'ok  ' if ok else 'FAIL'} {name:34} p50 {p50:8.2f} ms  p99 {p99:8.2f} ms  | {' / '.join(details)}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--chats", type=int, default=10_000)
+    parser.add_argument("--logs", type=int, default=200_000)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="omni-bench-")
+    system_db = SystemDatabase(os.path.join(tmp, "system.db"))
+    user_db = UserDatabase(os.path.join(tmp, "user.db"), vector_store=False)
+
+    with system_db.pool.writer() as conn:
+        conn.executemany(
+            "INSERT INTO chats (title, created_at) VALUES (?, datetime(1700000000 + ?, 'unixepoch'))",
+            [(f"chat {i}", i * 60) for i in range(args.chats)]
+        )
+        rate = seed_messages(conn, "messages", "chat_id", args.chats, args.messages)
+        conn.executemany(
+            "INSERT INTO logs (level, message, created_at) VALUES (?, ?, datetime(1700000000 + ?, 'unixepoch'))",
+            [(("INFO", "INFO", "INFO", "WARNING", "ERROR")[i % 5], f"log line {i}", i) for i in range(args.logs)]
+        )
+    print(f"system.db: {args.messages} messages, {args.chats} chats, {args.logs} logs ({rate:.0f} messages/s)")
+
+    with user_db.pool.writer() as conn:
+        conn.executemany("INSERT INTO conversations (title) VALUES (?)", [(f"c{i}",) for i in range(args.chats)])
+        seed_messages(conn, "messages", "conversation_id", args.chats, args.messages)
+    for db in (system_db, user_db):
+        with db.pool.writer() as conn:
+            conn.execute("ANALYZE")
+
+    system_conn = system_db.pool.reader()
+    user_conn = user_db.pool.reader()
+    middle = args.chats // 2
+    newest = system_conn.execute("SELECT MAX(id) FROM messages WHERE chat_id = ?", (middle,)).fetchone()[0]
+
+    results = [
+        check("get_messages_by_chat", system_conn,
+              lambda: system_db.get_messages_by_chat(middle), "idx_messages_chat_created"),
+        check("get_messages_page (newest)", system_conn,
+              lambda: system_db.get_messages_page(middle), "idx_messages_chat_created"),
+        check("get_messages_page (before_id)", system_conn,
+              lambda: system_db.get_messages_page(middle, before_id=newest), "idx_messages_chat_created"),
+        check("get_chats", system_conn, system_db.get_chats, "idx_chats_created", runs=5),
+        check("get_logs(level)", system_conn,
+              lambda: system_db.get_logs("ERROR"), "idx_logs_level_created", runs=5),
+        check("get_logs()", system_conn, system_db.get_logs, "idx_logs_created", runs=3),
+        check("get_conversation_messages", user_conn,
+              lambda: user_db.get_conversation_messages(middle), "idx_messages_conversation_created"),
+    ]
+
+    system_db.close()
+    user_db.close()
+    if not all(results):
+        print("A hot query lost its index (SCAN or TEMP B-TREE in the plan)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import os
+import sys
+import yaml
+import asyncio
+import argparse
+
+from backend.databases.user_db import UserDatabase as Database
+from backend.databases.system_db import SystemDatabase
+from backend.ai.model_manager import ModelManager
+from backend.settings import Settings
+from backend.ai.embeddings_engine import EmbeddingEngine
+from backend.ai.rag_pipeline import RAGPipeline
+from backend.ai.reranker import Reranker
+from backend.system.device_manager import DeviceManager
+from backend.ai.vision_manager import VisionManager
+from backend.server.api_server import ApiServer
+
+# ============================================================
+# ARG PARSER
+# ============================================================
+parser = argparse.ArgumentParser(description="Run the OmniManager backend without the Qt UI")
+parser.add_argument("--host", default="127.0.0.1", help="Use 0.0.0.0 to serve the LAN")
+parser.add_argument("--port", type=int, default=8765)
+parser.add_argument("--io-workers", type=int, default=4)
+args = parser.parse_args()
+
+# ============================================================
+# LOADING YAML CONFIG
+# ============================================================
+DEFAULT_CONFIG_PATH = os.path.join("config", "models.yaml")
+USER_CONFIG_PATH = os.path.expanduser("~/.local/share/omnimanager/models.yaml")
+
+def load_config():
+    path = USER_CONFIG_PATH if os.path.exists(USER_CONFIG_PATH) else DEFAULT_CONFIG_PATH
+    with open(path, "r") as f:
+        return yaml.safe_load(f)
+
+config = load_config()
+
+# ============================================================
+# SYSTEM CONFIG
+# ============================================================
+device_setting = config.get("system", {}).get("device", "auto")
+forced = None if device_setting == "auto" else device_setting
+
+device_manager = DeviceManager(forced_device=forced)
+device = device_manager.get_device()
+
+# ============================================================
+# SERVICES (same wiring as main.py, minus QApplication)
+# ============================================================
+def build_services():
+    db_paths = config.get("databases", {})
+
+    vision_manager = VisionManager(device)
+
+    embedding_engine = EmbeddingEngine(
+        next((m for m in config.get("models", []) if m.get("backend") == "embedding"), None)
+    )
+
+    system_db = SystemDatabase(
+        db_paths.get("system", os.path.expanduser("~/.local/share/omnimanager/system.db"))
+    )
+
+    user_db = Database(
+        db_paths.get("user", os.path.expanduser("~/.local/share/omnimanager/user.db")),
+        embedding_format=db_paths.get("embedding_storage", "float32"),
+        rescore=db_paths.get("embedding_rescore", 4),
+        vector_store=db_paths.get("vector_store", True)
+    )
+
+    settings = Settings(None, config, system_db)
+    settings.load_settings()
+
+    model_manager = ModelManager(vision_manager, settings)
+    model_manager.load_models_from_config(config)
+    settings.model_manager = model_manager
+
+    reranker_config = next((m for m in config.get("models", []) if m.get("backend") == "reranker"), None)
+    reranker = Reranker(
+        settings,
+        model_manager.get_model(reranker_config["name"]) if reranker_config else None
+    )
+    rag_pipeline = RAGPipeline(user_db, embedding_engine, settings, reranker)
+
+    return {
+        "settings": settings,
+        "system_db": system_db,
+        "user_db": user_db,
+        "model_manager": model_manager,
+        "rag_pipeline": rag_pipeline
+    }
+
+# ============================================================
+# RUN
+# ============================================================
+async def main():
+    print("🚀 Creating headless backend...")
+    server = ApiServer(build_services(), host=args.host, port=args.port, io_workers=args.io_workers)
+    try:
+        await server.serve_forever()
+    finally:
+        await server.stop()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        sys.exit(0)
@@ -24,6 +24,7 @@ from backend.settings import Settings
 from backend.ai.llm_engine import LLMEngine
 from backend.ai.embeddings_engine import EmbeddingEngine
 from backend.ai.rag_pipeline import RAGPipeline
+from backend.ai.reranker import Reranker
 from backend.ai.orchestrator import Orchestrator
 from backend.services.chat_service import ChatService
 from backend.system.device_manager import DeviceManager
@@ -144,7 +145,10 @@ def create_backend():
         )
 
         user_db = Database(
-            db_paths.get("user", os.path.expanduser("~/.local/share/omnimanager/system.db"))
+            db_paths.get("user", os.path.expanduser("~/.local/share/omnimanager/user.db")),
+            embedding_format=db_paths.get("embedding_storage", "float32"),
+            rescore=db_paths.get("embedding_rescore", 4),
+            vector_store=db_paths.get("vector_store", True)
         )
 
         settings = Settings(None, config, system_db)
@@ -154,7 +158,12 @@ def create_backend():
         model_manager.load_models_from_config(config)
         settings.model_manager = model_manager
 
-        rag_pipeline = RAGPipeline(user_db, embedding_engine, settings)
+        reranker_config = next((m for m in config.get("models", []) if m.get("backend") == "reranker"), None)
+        reranker = Reranker(
+            settings,
+            model_manager.get_model(reranker_config["name"]) if reranker_config else None
+        )
+        rag_pipeline = RAGPipeline(user_db, embedding_engine, settings, reranker)
 
         return {
             "current_tasks": current_tasks,
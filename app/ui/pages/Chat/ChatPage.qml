@@ -14,6 +14,11 @@ ColumnLayout {
     property bool thinking: false
     property bool tooling: false
 
+    // Windowed history: only the newest page is loaded when a chat opens,
+    // older pages are fetched as the list is scrolled to the top
+    property bool hasMore: false
+    property bool loadingOlder: false
+
     ListModel { id: messageModel }
 
     // Chat Log
@@ -26,7 +31,12 @@ ColumnLayout {
             Layout.fillHeight: true
             Layout.fillWidth: true
             model: messageModel
-            onCountChanged: messageList.positionViewAtEnd()
+            onCountChanged: {
+                if(!chatPage.loadingOlder) messageList.positionViewAtEnd()
+            }
+            onAtYBeginningChanged: {
+                if(atYBeginning) chatPage.loadOlderMessages()
+            }
 
             delegate: Text {
                 width: messageList.width
@@ -87,6 +97,7 @@ ColumnLayout {
         if(input === "") return
 
         messageModel.append({
+            id: 0,
             role: "You",
             content: inputField.text
         })
@@ -99,6 +110,8 @@ ColumnLayout {
         console.log("BEFORE LOADING MESSAGES ID:", chatPage.chatId)
         chatPage.chatId = chatId
         console.log("LOADING ID:", chatId, "CHAT ID NOW:", chatPage.chatId)
+        hasMore = false
+        loadingOlder = false
         if(chatId === -1) {
             messageModel.clear()
             return
@@ -106,22 +119,48 @@ ColumnLayout {
         backend.messageActions("get", chatId)
     }
 
+    function loadOlderMessages() {
+        if(!hasMore || loadingOlder || messageModel.count === 0) return
+        loadingOlder = true
+        backend.messageActions("page", chatPage.chatId, { before_id: messageModel.get(0).id })
+    }
+
     // Backend Connections
     Connections {
         target: backend
 
         // Loading
-        function onMessagesData(messages) {
+        function onMessagesData(page) {
             // console.log("\n\n\nLOADED MESSAGES\n\n\n")
-            if(!messages) return
-            messageModel.clear()
+            if(!page || page.chat_id !== chatPage.chatId) return
+            hasMore = page.has_more
+
+            // Newest window replaces the list
+            if(!page.before_id) {
+                messageModel.clear()
+                page.messages.forEach(m => {
+                    messageModel.append({
+                        id: m.id,
+                        role: m.role === "user" ? "You" : "Omni",
+                        content: m.content
+                    })
+                })
+                return
+            }
 
-            messages.forEach(m => {
-                messageModel.append({
+            // Older page goes on top; keep the previously first message in view
+            page.messages.forEach((m, i) => {
+                messageModel.insert(i, {
+                    id: m.id,
                     role: m.role === "user" ? "You" : "Omni",
                     content: m.content
                 })
             })
+            messageList.positionViewAtIndex(page.messages.length, ListView.Beginning)
+            let streamingIndex = ChatState.streamIndex(chatPage.chatId)
+            if(streamingIndex !== -1)
+                ChatState.setStreamIndex(chatPage.chatId, streamingIndex + page.messages.length)
+            loadingOlder = false
         }
 
         // Phases
@@ -173,6 +212,7 @@ ColumnLayout {
             if (streamingIndex === -1) {
                 console.log("INDEX === -1", streamingIndex)
                 messageModel.append({
+                    id: 0,
                     role: "Omni",
                     content: token
                 })
@@ -191,6 +231,7 @@ ColumnLayout {
             ChatState.setStreamTokens(chatPage.chatId, updated)
             console.log(`MESSAGES APPENDING: INDEX: ${streamingIndex} CONTENT: ${updated}`)
             messageModel.set(streamingIndex, {
+                id: 0,
                 role: "Omni",
                 content: updated,
                 streaming: true
@@ -213,11 +254,13 @@ ColumnLayout {
             if(result.success) {
                 console.log("RESULTS ON FINISHED, USE STREAM:", result.use_stream)
                 messageModel.append({
+                        id: 0,
                         role: "Omni",
                         content: result.text
                     })
             } else {
                 messageModel.append({
+                    id: 0,
                     role: "Omni",
                     content: "Error: " + result.error
                 })
@@ -13,6 +13,7 @@ ColumnLayout {
     
 
     ListModel { id: chatModel }
+    ListModel { id: searchModel }
 
     RowLayout {
         Layout.fillWidth: true
@@ -58,8 +59,87 @@ ColumnLayout {
         }
     }
 
+    TextField {
+        id: searchField
+        Layout.fillWidth: true
+        placeholderText: "Search chats and notes..."
+
+        onTextChanged: {
+            if(text.trim() === "") searchModel.clear()
+            else searchTimer.restart()
+        }
+        onAccepted: searchTimer.triggered()
+    }
+
+    // Wait for a pause in typing before searching
+    Timer {
+        id: searchTimer
+        interval: 250
+        onTriggered: {
+            let query = searchField.text.trim()
+            if(query !== "") backend.searchHistory(query)
+        }
+    }
+
+    ListView {
+        id: searchList
+        visible: searchField.text.trim() !== ""
+        Layout.fillWidth: true
+        Layout.fillHeight: true
+        clip: true
+        model: searchModel
+
+        delegate: Item {
+            width: searchList.width
+            height: 56
+
+            Rectangle {
+                anchors.fill: parent
+                color: hitArea.containsMouse ? '#333' : "#222"
+            }
+
+            MouseArea {
+                id: hitArea
+                anchors.fill: parent
+                hoverEnabled: true
+                onClicked: {
+                    // Notes open from the Notes page; message hits jump to their chat
+                    if(model.type !== "message") return
+                    searchField.text = ""
+                    root.currentId = model.chat_id
+                    for(let i = 0; i < chatModel.count; i++) {
+                        if(chatModel.get(i).id === model.chat_id) chatList.currentIndex = i
+                    }
+                    root.chatSelected(model.chat_id)
+                }
+            }
+
+            ColumnLayout {
+                anchors.fill: parent
+                anchors.margins: 6
+                spacing: 2
+
+                Text {
+                    Layout.fillWidth: true
+                    text: model.type === "message" ? model.title : "Note: " + model.title
+                    color: "#aaa"
+                    font.pixelSize: 11
+                    elide: Text.ElideRight
+                }
+                Text {
+                    Layout.fillWidth: true
+                    text: model.snippet
+                    textFormat: Text.StyledText
+                    color: "white"
+                    elide: Text.ElideRight
+                }
+            }
+        }
+    }
+
     ListView {
         id: chatList
+        visible: !searchList.visible
         currentIndex: -1
         Layout.fillWidth: true
         Layout.fillHeight: true
@@ -151,6 +231,22 @@ ColumnLayout {
     Connections {
         target: backend
 
+        function onSearchResults(data) {
+            // Drop answers to queries the user has already typed past
+            if(data.query !== searchField.text.trim()) return
+            searchModel.clear()
+            data.results.forEach(hit => {
+                // Snippets mark matches with **; show them bold, everything else as text
+                let snippet = hit.snippet.replace(/&/g, "&amp;").replace(/</g, "&lt;").replace(/>/g, "&gt;")
+                searchModel.append({
+                    type: hit.type,
+                    chat_id: hit.chat_id || 0,
+                    title: hit.type === "message" ? hit.chat_title : hit.title,
+                    snippet: snippet.replace(/\*\*(.*?)\*\*/g, "<b>$1</b>")
+                })
+            })
+        }
+
         function onChatsData(chats) {
             chatModel.clear()
 